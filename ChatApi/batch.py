@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import asyncio
+import threading
+
+from ChatApi.trading_agent import aprompt_model
+from ChatApi.scheduler import scheduler, QueueFull
+from ChatApi.deadline import Deadline
+
+# Prompts of one model pair in flight at once, defaults to what the scheduler lets run
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "0")) or scheduler.max_active
+
+_lock = threading.Lock()
+stats = {"batches": 0, "items": 0, "errors": 0, "tool_calls": 0, "tool_executions": 0, "seconds": 0.0}
+
+
+def group_by_models(items: list) -> dict:
+    """Item indices per (tool_model, chat_model), in first seen order."""
+    groups = {}
+    for index, item in enumerate(items):
+        groups.setdefault((item.tool_model, item.chat_model), []).append(index)
+    return groups
+
+
+async def run_item(index: int, item, memo: dict, semaphore: asyncio.Semaphore) -> dict:
+    async with semaphore:
+        # Each item's deadline counts from when it gets a batch slot, not from when the batch arrived
+        deadline = Deadline.from_ms(item.deadline_ms)
+        try:
+            ticket = scheduler.admit((item.tool_model, item.chat_model), item.priority)
+        except QueueFull as e:
+            return {"index": index, "error": str(e)}
+        try:
+            async for _ in scheduler.wait(ticket):
+                pass
+            result = await aprompt_model(
+                item.prompt, item.tool_model, item.chat_model, item.speculative, ticket.threads, memo, deadline
+            )
+            return {"index": index, **result}
+        except Exception as e:
+            return {"index": index, "error": str(e)}
+        finally:
+            scheduler.release(ticket)
+
+
+async def run_batch(items: list, concurrency: int | None = None):
+    """Answer many chat requests, yielding one NDJSON line per item as it completes.
+
+    Model pairs run one after another so the models are not swapped back and forth,
+    prompts within a pair run with bounded parallelism, and identical tool calls across
+    the whole batch execute once for as long as their data is fresh. Failed calls are
+    run again by the next prompt that needs them.
+    """
+    started = time.monotonic()
+    memo = {}
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+    errors = tool_calls = 0
+
+    for indices in group_by_models(items).values():
+        tasks = [asyncio.ensure_future(run_item(i, items[i], memo, semaphore)) for i in indices]
+        try:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                errors += "error" in result
+                tool_calls += len(result.get("tool_calls", []))
+                yield json.dumps(result) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    with _lock:
+        stats["batches"] += 1
+        stats["items"] += len(items)
+        stats["errors"] += errors
+        stats["tool_calls"] += tool_calls
+        stats["tool_executions"] += len(memo)
+        stats["seconds"] += time.monotonic() - started
+
+
+def summary() -> dict:
+    with _lock:
+        out = dict(stats)
+        out["deduped"] = stats["tool_calls"] - stats["tool_executions"]
+        out["prompts_per_minute"] = 60 * stats["items"] / stats["seconds"] if stats["seconds"] else 0.0
+        return out
@@ -0,0 +1,147 @@
+import re
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# (prompt pattern, tool calls) pairs answered by the fake tool model, first match wins
+DEFAULT_SCRIPT = [
+    (r"(?i)apple", [{"name": "get_key_financial_metrics", "arguments": {"ticker": "AAPL"}}]),
+    (r"(?i)microsoft", [{"name": "get_balance_sheet", "arguments": {"ticker": "MSFT"}}]),
+    (r"(?i)nvidia|amd", [{"name": "get_historical_data", "arguments": {"ticker": "NVDA", "period": "1mo"}},
+                         {"name": "get_historical_data", "arguments": {"ticker": "AMD", "period": "1mo"}}]),
+]
+
+ANSWER = "Based on the data the company reported solid results with revenue and margins moving higher over the period. "
+
+
+class FakeOllama:
+    """Local stand-in for the Ollama HTTP API with scripted tool calls and a fixed token rate.
+
+    Tool model requests (any request carrying tools) return the scripted calls for the prompt
+    after tool_latency. Streamed, the calls go out one per chunk spread over that time the way
+    a model generates them one after another. Chat requests stream answer_tokens tokens at
+    token_rate tokens per second after a prefill delay proportional to the prompt size.
+    """
+
+    def __init__(self, script: list = None, token_rate: float = 50.0, answer_tokens: int = 40,
+                 tool_latency: float = 0.2, prefill_rate: float = 2000.0, port: int = 0):
+        self.script = [(re.compile(p), calls) for p, calls in (script or DEFAULT_SCRIPT)]
+        self.token_rate = token_rate
+        self.answer_tokens = answer_tokens
+        self.tool_latency = tool_latency
+        self.prefill_rate = prefill_rate
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def tool_calls(self, prompt: str) -> list[dict]:
+        for pattern, calls in self.script:
+            if pattern.search(prompt):
+                return [{"function": call} for call in calls]
+        return []
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._send_json({"models": []})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                fake.requests += 1
+                if self.path == "/api/generate":
+                    self._send_json({"model": body.get("model"), "created_at": now(), "response": "",
+                                     "done": True, "done_reason": "load"})
+                elif self.path == "/api/chat":
+                    self._chat(body)
+                else:
+                    self.send_error(404)
+
+            def _send_json(self, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chat(self, body: dict):
+                model = body.get("model")
+                messages = body.get("messages", [])
+                prompt = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+                prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+                started = time.perf_counter()
+
+                streamed = body.get("stream", True)
+                if body.get("tools"):
+                    calls = fake.tool_calls(prompt)
+                    if streamed:
+                        pieces = [{"role": "assistant", "content": "", "tool_calls": [call]} for call in calls]
+                        pieces = pieces or [{"role": "assistant", "content": ""}]
+                    else:
+                        time.sleep(fake.tool_latency)
+                        pieces = [{"role": "assistant", "content": "", "tool_calls": calls}]
+                    eval_count = 20
+                else:
+                    # Prefill scales with the prompt, roughly four characters a token
+                    time.sleep(prompt_chars / 4 / fake.prefill_rate)
+                    words = (ANSWER * (fake.answer_tokens // 20 + 1)).split(" ")[:fake.answer_tokens]
+                    pieces = [{"role": "assistant", "content": word + " "} for word in words]
+                    eval_count = len(pieces)
+                prefill_done = time.perf_counter()
+
+                final = {
+                    "model": model, "created_at": now(), "message": {"role": "assistant", "content": ""},
+                    "done": True, "done_reason": "stop", "prompt_eval_count": prompt_chars // 4,
+                    "eval_count": eval_count, "prompt_eval_duration": int((prefill_done - started) * 1e9),
+                }
+
+                if not streamed:
+                    message = {"role": "assistant", "content": "".join(p["content"] for p in pieces)}
+                    if body.get("tools"):
+                        message["tool_calls"] = pieces[0]["tool_calls"]
+                    time.sleep(eval_count / fake.token_rate if not body.get("tools") else 0)
+                    final.update(message=message, eval_duration=int((time.perf_counter() - prefill_done) * 1e9))
+                    self._send_json(final)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for piece in pieces:
+                    time.sleep(fake.tool_latency / len(pieces) if body.get("tools") else 1 / fake.token_rate)
+                    self.wfile.write(json.dumps({"model": model, "created_at": now(), "message": piece, "done": False}).encode() + b"\n")
+                    self.wfile.flush()
+                final["eval_duration"] = int((time.perf_counter() - prefill_done) * 1e9)
+                self.wfile.write(json.dumps(final).encode() + b"\n")
+
+        return Handler
+
+
+def now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
@@ -0,0 +1,210 @@
+import json
+import zlib
+import tempfile
+import functools
+from io import StringIO
+from pathlib import Path
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# Methods recorded per ticker, and what each is saved as
+RECORDED = {
+    "history": "frame",
+    "info": "json",
+    "news": "json",
+    "balance_sheet": "frame",
+    "income_stmt": "frame",
+    "cashflow": "frame",
+    "dividends": "series",
+}
+
+HISTORY_START = date(2015, 1, 1)
+
+
+def record(tickers: list[str], root: Path = FIXTURES_DIR):
+    """Save live yfinance responses for the tickers so benchmarks can replay them offline."""
+    for ticker in tickers:
+        live = yf.Ticker(ticker)
+        path = Path(root) / ticker.upper()
+        path.mkdir(parents=True, exist_ok=True)
+        responses = {
+            "history": live.history(start=HISTORY_START.isoformat(), interval="1d"),
+            "info": live.get_info(),
+            "news": live.get_news(),
+            "balance_sheet": live.get_balance_sheet(),
+            "income_stmt": live.get_income_stmt(),
+            "cashflow": live.get_cashflow(),
+            "dividends": live.get_dividends(period="max"),
+        }
+        for name, value in responses.items():
+            if RECORDED[name] == "json":
+                (path / f"{name}.json").write_text(json.dumps(value, default=str))
+            else:
+                (path / f"{name}.json").write_text(value.to_json(orient="split", date_format="iso"))
+
+
+def load(ticker: str, name: str, root: Path = FIXTURES_DIR):
+    path = Path(root) / ticker.upper() / f"{name}.json"
+    if not path.exists():
+        return None
+    if RECORDED[name] == "json":
+        return json.loads(path.read_text())
+    if RECORDED[name] == "series":
+        return pd.read_json(StringIO(path.read_text()), orient="split", typ="series")
+    frame = pd.read_json(StringIO(path.read_text()), orient="split")
+    if name == "history":
+        # to_json stores the index in UTC, yfinance returns exchange time
+        frame.index = frame.index.tz_convert("America/New_York").rename("Date")
+        return frame.astype(float)
+    frame.columns = pd.to_datetime(frame.columns)
+    return frame
+
+
+@functools.lru_cache(maxsize=None)
+def synthetic(ticker: str, name: str):
+    """Deterministic stand-in data for tickers without a recording, seeded by the ticker."""
+    rng = np.random.default_rng(zlib.crc32(ticker.upper().encode()))
+    base = rng.uniform(20, 500)
+
+    if name in ("history", "dividends"):
+        index = pd.bdate_range(HISTORY_START, date.today() + timedelta(days=1), tz="America/New_York", name="Date")
+        close = base * np.exp(np.cumsum(rng.normal(0.0003, 0.018, len(index))))
+        history = pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, 0.004, len(index))),
+            "High": close * (1 + np.abs(rng.normal(0, 0.01, len(index)))),
+            "Low": close * (1 - np.abs(rng.normal(0, 0.01, len(index)))),
+            "Close": close,
+            "Volume": rng.integers(1_000_000, 50_000_000, len(index)).astype(float),
+            "Dividends": np.where(np.arange(len(index)) % 63 == 0, round(base / 400, 2), 0.0),
+            "Stock Splits": 0.0,
+        }, index=index)
+        return history if name == "history" else history["Dividends"][history["Dividends"] > 0]
+
+    if name == "info":
+        return {
+            "currentPrice": round(base, 2), "marketCap": int(base * 1e9), "trailingPE": round(rng.uniform(10, 60), 2),
+            "forwardPE": round(rng.uniform(10, 50), 2), "priceToBook": round(rng.uniform(1, 20), 2),
+            "totalRevenue": int(base * 4e8), "profitMargins": round(rng.uniform(0.05, 0.4), 4),
+            "dividendYield": round(rng.uniform(0, 3), 2), "targetMeanPrice": round(base * 1.1, 2),
+        }
+
+    if name == "news":
+        return [{"content": {
+            "id": f"{ticker}-{i}", "title": f"{ticker.upper()} headline {i}", "summary": "Synthetic article summary.",
+            "pubDate": (date.today() - timedelta(days=i)).isoformat(), "provider": {"displayName": "Fixture"},
+            "contentType": "STORY",
+        }} for i in range(8)]
+
+    # Statements, four annual reports
+    columns = pd.to_datetime([f"{date.today().year - i}-06-30" for i in range(1, 5)])
+    scale = base * 1e8 * rng.uniform(0.8, 1.2, len(columns))
+    items = {
+        "balance_sheet": {
+            "TotalAssets": 3.0, "CurrentAssets": 1.2, "CashAndCashEquivalents": 0.4, "Inventory": 0.1,
+            "CurrentLiabilities": 0.9, "TotalDebt": 0.7, "StockholdersEquity": 1.5,
+            "TotalLiabilitiesNetMinorityInterest": 1.5,
+        },
+        "income_stmt": {
+            "TotalRevenue": 2.0, "CostOfRevenue": 0.9, "GrossProfit": 1.1, "OperatingIncome": 0.6,
+            "EBITDA": 0.8, "EBIT": 0.65, "InterestExpense": 0.05, "NetIncome": 0.45,
+        },
+        "cashflow": {
+            "OperatingCashFlow": 0.7, "CapitalExpenditure": -0.2, "FreeCashFlow": 0.5,
+            "InvestingCashFlow": -0.3, "FinancingCashFlow": -0.25,
+        },
+    }[name]
+    return pd.DataFrame({c: {k: v * s for k, v in items.items()} for c, s in zip(columns, scale)})
+
+
+def scale_prices(history: pd.DataFrame, factor: float) -> pd.DataFrame:
+    history = history.copy()
+    history[["Open", "High", "Low", "Close"]] *= factor
+    return history
+
+
+@functools.lru_cache(maxsize=None)
+def spliced_history(ticker: str, root: Path = FIXTURES_DIR) -> pd.DataFrame:
+    """Recorded history with synthetic rows either side, scaled to meet it, so any range has data.
+
+    Recordings cover a short window, the prompts ask for anything up to years back.
+    """
+    recorded = load(ticker, "history", root)
+    generated = synthetic(ticker, "history")
+    if recorded is None or recorded.empty:
+        return generated
+    before = generated[generated.index < recorded.index[0]]
+    after = generated[generated.index > recorded.index[-1]]
+    parts = [recorded]
+    if len(before):
+        parts.insert(0, scale_prices(before, recorded["Close"].iloc[0] / before["Close"].iloc[-1]))
+    if len(after):
+        parts.append(scale_prices(after, recorded["Close"].iloc[-1] / after["Close"].iloc[0]))
+    return pd.concat(parts)
+
+
+def response(ticker: str, name: str, root: Path = FIXTURES_DIR):
+    if name == "history":
+        return spliced_history(ticker.upper(), Path(root))
+    recorded = load(ticker, name, root)
+    return recorded if recorded is not None else synthetic(ticker, name)
+
+
+class FixtureTicker:
+    """Drop in for yf.Ticker serving recorded (or synthetic) responses."""
+
+    def __init__(self, ticker: str, root: Path = FIXTURES_DIR):
+        self.ticker = ticker.upper()
+        self.root = root
+
+    def history(self, period: str = None, start: str = None, end: str = None, interval: str = "1d") -> pd.DataFrame:
+        history = response(self.ticker, "history", self.root)
+        if start:
+            history = history[history.index >= pd.Timestamp(start, tz=history.index.tz)]
+        if end:
+            history = history[history.index < pd.Timestamp(end, tz=history.index.tz)]
+        return history
+
+    def get_info(self) -> dict:
+        return response(self.ticker, "info", self.root)
+
+    def get_news(self) -> list:
+        return response(self.ticker, "news", self.root)
+
+    def get_balance_sheet(self) -> pd.DataFrame:
+        return response(self.ticker, "balance_sheet", self.root)
+
+    def get_income_stmt(self) -> pd.DataFrame:
+        return response(self.ticker, "income_stmt", self.root)
+
+    def get_cashflow(self) -> pd.DataFrame:
+        return response(self.ticker, "cashflow", self.root)
+
+    def get_dividends(self, period: str = "max") -> pd.Series:
+        return response(self.ticker, "dividends", self.root)
+
+
+def download(tickers, start: str = None, end: str = None, interval: str = "1d", **kwargs) -> pd.DataFrame:
+    tickers = [tickers] if isinstance(tickers, str) else tickers
+    return pd.concat({t.upper(): FixtureTicker(t).history(start=start, end=end) for t in tickers}, axis=1)
+
+
+def fixture_providers() -> list:
+    """The configured market data providers without a snapshot, so only the fixtures answer.
+
+    A bundle installed on the machine would otherwise come first and results would depend on it.
+    """
+    from ChatApi.market_data import build_provider
+    return build_provider(snapshot_dir=Path(tempfile.mkdtemp(prefix="bench-snapshot-"))).providers
+
+
+def install():
+    """Route yfinance through the fixtures for the rest of the process."""
+    from ChatApi.market_data import provider
+    yf.Ticker = FixtureTicker
+    yf.download = download
+    provider.replace(fixture_providers())
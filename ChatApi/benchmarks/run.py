@@ -0,0 +1,253 @@
+"""Offline performance benchmark for the trading agent.
+
+Runs the agent against a local fake Ollama server and recorded yfinance fixtures, so results
+only move when the code does. Example:
+
+    python -m ChatApi.benchmarks.run --targets prompt_model,api_stream --requests 40 --concurrency 4
+
+Each run is saved under ChatApi/benchmarks/results/ and compared with the previous saved run.
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ChatApi.benchmarks import fixtures
+from ChatApi.benchmarks.fake_ollama import FakeOllama
+
+RESULTS_DIR = Path(__file__).parent / "results"
+TARGETS = ["prompt_model", "stream_response", "api_chat", "api_stream"]
+
+# Mix of prompts the intent router answers and prompts that need the (fake) tool model
+PROMPTS = [
+    "What is the current price of Nvidia",
+    "Give me the latest news for Tesla",
+    "Can you calculate ASML's debt to equity for 2024 using the balance sheet?",
+    "Compare NVDA, AMD and INTC over the last 6 months",
+    "What dividends did Coca-Cola pay in the last year",
+    "How has Apple been doing lately?",
+    "Is Microsoft in a strong financial position?",
+    "Which looks better right now, Nvidia or AMD?",
+]
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 4), "p95": round(float(p95), 4), "p99": round(float(p99), 4)}
+
+
+def timed_events(events):
+    """Consume SSE style events, returning (time to first text token, event count)."""
+    started, ttft, count = time.perf_counter(), None, 0
+    for event in events:
+        count += 1
+        if ttft is None and '"type": "text"' in event and '"content": ""' not in event:
+            ttft = time.perf_counter() - started
+    return ttft, count
+
+
+class Runner:
+    def __init__(self, tool_model: str, chat_model: str, base_url: str | None = None):
+        self.tool_model = tool_model
+        self.chat_model = chat_model
+        self.base_url = base_url
+
+    def body(self, prompt: str) -> dict:
+        return {"tool_model": self.tool_model, "chat_model": self.chat_model, "prompt": prompt}
+
+    def prompt_model(self, prompt: str) -> float | None:
+        from ChatApi.trading_agent import prompt_model
+        prompt_model(prompt, self.tool_model, self.chat_model)
+        return None
+
+    def stream_response(self, prompt: str) -> float | None:
+        from ChatApi.trading_agent import stream_response
+        ttft, _ = timed_events(stream_response(prompt, self.tool_model, self.chat_model))
+        return ttft
+
+    def api_chat(self, prompt: str) -> float | None:
+        import httpx
+        response = httpx.post(f"{self.base_url}/agent/trading/chat", json=self.body(prompt), timeout=120)
+        response.raise_for_status()
+        return None
+
+    def api_stream(self, prompt: str) -> float | None:
+        import httpx
+        with httpx.stream("POST", f"{self.base_url}/agent/trading/chat/stream", json=self.body(prompt), timeout=120) as response:
+            response.raise_for_status()
+            ttft, _ = timed_events(line for line in response.iter_lines() if line)
+        return ttft
+
+
+def run_target(runner: Runner, target: str, requests: int, concurrency: int, warmup: int) -> dict:
+    call = getattr(runner, target)
+    for i in range(warmup):
+        call(PROMPTS[i % len(PROMPTS)])
+
+    def one(i: int) -> dict:
+        started = time.perf_counter()
+        try:
+            ttft = call(PROMPTS[i % len(PROMPTS)])
+            return {"latency": time.perf_counter() - started, "ttft": ttft, "error": None}
+        except Exception as e:
+            return {"latency": time.perf_counter() - started, "ttft": None, "error": repr(e)}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [s for s in samples if s["error"] is None]
+    return {
+        "requests": requests,
+        "errors": len(samples) - len(ok),
+        "first_error": next((s["error"] for s in samples if s["error"]), None),
+        "requests_per_second": round(len(ok) / elapsed, 3),
+        "latency_seconds": percentiles([s["latency"] for s in ok]),
+        "ttft_seconds": percentiles([s["ttft"] for s in ok if s["ttft"] is not None]),
+    }
+
+
+def reset_state():
+    # Every target starts from empty caches so targets are comparable
+    from ChatApi.data_cache import cache
+    from ChatApi.ohlcv_store import store
+    from ChatApi.decision_cache import decision_cache
+    from ChatApi.response_cache import response_cache
+    cache.clear()
+    decision_cache.clear()
+    response_cache.clear()
+    store.root = Path(tempfile.mkdtemp(prefix="bench-ohlcv-"))
+
+
+def start_api() -> tuple[str, object]:
+    import socket
+    import uvicorn
+    from ChatApi.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def git_revision() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(result: dict, results_dir: Path = RESULTS_DIR, kind: str = "run") -> tuple[Path, dict | None]:
+    """Write the run and return it with the previous saved run of the same kind, if any."""
+    results_dir.mkdir(parents=True, exist_ok=True)
+    previous = sorted(results_dir.glob(f"{kind}-*.json"))
+    path = results_dir / f"{kind}-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{result['revision']}.json"
+    path.write_text(json.dumps(result, indent=2))
+    return path, json.loads(previous[-1].read_text()) if previous else None
+
+
+def change(new: float | None, old: float | None) -> str:
+    if new is None or not old:
+        return ""
+    return f" ({(new - old) / old * 100:+.1f}%)"
+
+
+def report(result: dict, previous: dict | None) -> str:
+    lines = [f"revision {result['revision']}" + (f", compared with {previous['revision']}" if previous else "")]
+    for target, stats in result["targets"].items():
+        old = (previous or {}).get("targets", {}).get(target, {})
+        latency, old_latency = stats["latency_seconds"], old.get("latency_seconds", {})
+        ttft, old_ttft = stats["ttft_seconds"], old.get("ttft_seconds", {})
+        lines.append(
+            f"{target:16} {stats['requests_per_second']:8.2f} req/s{change(stats['requests_per_second'], old.get('requests_per_second'))}"
+            f"  latency p50 {latency.get('p50', 0):.3f}s{change(latency.get('p50'), old_latency.get('p50'))}"
+            f" p95 {latency.get('p95', 0):.3f}s{change(latency.get('p95'), old_latency.get('p95'))}"
+            f" p99 {latency.get('p99', 0):.3f}s"
+            + (f"  ttft p50 {ttft['p50']:.3f}s{change(ttft['p50'], old_ttft.get('p50'))} p95 {ttft['p95']:.3f}s" if ttft else "")
+            + (f"  errors {stats['errors']} e.g. {stats['first_error']}" if stats["errors"] else "")
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Comma separated, any of " + ", ".join(TARGETS))
+    parser.add_argument("--requests", type=int, default=40, help="Measured requests per target")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per target")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Fake chat model tokens per second")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--tool-latency", type=float, default=0.2, help="Fake tool model seconds per call")
+    parser.add_argument("--tool-model", default="granite4:350m")
+    parser.add_argument("--chat-model", default="granite4:1b")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Serve repeated prompts from the response cache, off so the pipeline itself is measured")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets {sorted(unknown)}")
+
+    fake = FakeOllama(token_rate=args.token_rate, answer_tokens=args.answer_tokens, tool_latency=args.tool_latency).start()
+    # Read by the ollama client when the model registry builds its clients
+    os.environ["OLLAMA_HOST"] = fake.host
+    fixtures.install()
+
+    from ChatApi.model_registry import registry
+    from ChatApi.response_cache import response_cache
+    registry.clear()
+    response_cache.enabled = args.response_cache
+
+    base_url, server = start_api() if any(t.startswith("api_") for t in targets) else (None, None)
+    runner = Runner(args.tool_model, args.chat_model, base_url)
+
+    result = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "targets": {},
+    }
+    try:
+        for target in targets:
+            reset_state()
+            result["targets"][target] = run_target(runner, target, args.requests, args.concurrency, args.warmup)
+    finally:
+        if server:
+            server.should_exit = True
+        fake.stop()
+
+    previous = None
+    if not args.no_save:
+        path, previous = save(result, args.results_dir)
+        print(f"saved {path}")
+    print(report(result, previous))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Cold start benchmark for the API server.
+
+Measures, each in a fresh interpreter:
+    import      seconds to import ChatApi.main
+    first       seconds from launching uvicorn to the first answered request
+    ready       seconds from launching uvicorn to /ready returning 200
+
+    python -m ChatApi.benchmarks.startup --runs 5 --max-import-seconds 1.5
+
+Exits non zero when the median import time is over the limit or main pulls in a heavy module.
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import os
+import json
+import time
+import socket
+import argparse
+import subprocess
+import statistics
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from ChatApi.benchmarks.fake_ollama import FakeOllama
+from ChatApi.benchmarks.run import RESULTS_DIR, git_revision, save, change
+
+ROOT = Path(__file__).parent.parent.parent
+
+# Must not be loaded by importing ChatApi.main
+HEAVY_MODULES = ["langchain", "langchain_ollama", "langchain_core", "yfinance", "pandas", "numpy", "ollama"]
+
+IMPORT_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import ChatApi.main
+elapsed = time.perf_counter() - started
+heavy = sorted({m.split(".")[0] for m in sys.modules} & set(json.loads(sys.argv[1])))
+print(json.dumps({"seconds": elapsed, "heavy": heavy}))
+"""
+
+
+def measure_import() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE, json.dumps(HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_server(ollama_host: str, timeout: float = 120) -> dict:
+    port = free_port()
+    env = dict(os.environ, OLLAMA_HOST=ollama_host)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ChatApi.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    first = None
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5) as response:
+                    status = json.loads(response.read())
+                    first = first or time.perf_counter() - started
+                    return {"first": first, "ready": time.perf_counter() - started, "stages": status["stages"]}
+            except urllib.error.HTTPError as e:
+                # 503 while warming up, the server is already answering
+                first = first or time.perf_counter() - started
+                e.close()
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"server not ready after {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(values: list[float]) -> dict:
+    return {"median": round(statistics.median(values), 4), "min": round(min(values), 4), "max": round(max(values), 4)}
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--skip-server", action="store_true", help="Only measure the import")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    imports = [measure_import() for _ in range(args.runs)]
+    result = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "import_seconds": summarize([i["seconds"] for i in imports]),
+        "heavy_modules": imports[0]["heavy"],
+    }
+    if not args.skip_server:
+        with FakeOllama(tool_latency=0) as fake:
+            servers = [measure_server(fake.host) for _ in range(args.runs)]
+        result["first_response_seconds"] = summarize([s["first"] for s in servers])
+        result["ready_seconds"] = summarize([s["ready"] for s in servers])
+        result["warmup_stages"] = servers[-1]["stages"]
+
+    previous = None
+    if not args.no_save:
+        path, previous = save(result, args.results_dir, kind="startup")
+        print(f"saved {path}")
+
+    print(f"revision {result['revision']}" + (f", compared with {previous['revision']}" if previous else ""))
+    for key in ("import_seconds", "first_response_seconds", "ready_seconds"):
+        if key in result:
+            old = (previous or {}).get(key, {}).get("median")
+            print(f"{key:24} median {result[key]['median']:.3f}s{change(result[key]['median'], old)}"
+                  f"  min {result[key]['min']:.3f}s  max {result[key]['max']:.3f}s")
+
+    failed = False
+    if result["heavy_modules"]:
+        print(f"FAIL importing ChatApi.main loads {', '.join(result['heavy_modules'])}")
+        failed = True
+    if args.max_import_seconds and result["import_seconds"]["median"] > args.max_import_seconds:
+        print(f"FAIL median import {result['import_seconds']['median']:.3f}s over {args.max_import_seconds}s")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+import pandas as pd
+
+# Time to live in seconds for each class of market data
+TTLS = {
+    "quote": float(os.getenv("CACHE_TTL_QUOTE", 5 * 60)),
+    "news": float(os.getenv("CACHE_TTL_NEWS", 60 * 60)),
+    "history": float(os.getenv("CACHE_TTL_HISTORY", 15 * 60)),
+    "dividends": float(os.getenv("CACHE_TTL_DIVIDENDS", 24 * 60 * 60)),
+    "statement": float(os.getenv("CACHE_TTL_STATEMENT", 3 * 24 * 60 * 60)),
+}
+
+TOOL_TTL_CLASS = {
+    "get_key_financial_metrics": "quote",
+    "get_latest_news": "news",
+    "get_historical_data": "history",
+    "get_historical_data_multi": "history",
+    "get_dividends": "dividends",
+    "get_balance_sheet": "statement",
+    "get_income_statement": "statement",
+    "get_cash_flow_statement": "statement",
+    "get_financial_ratios": "statement",
+}
+
+MAX_BYTES = int(os.getenv("DATA_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Expiries (time.monotonic()) of the data read by the current request, see tracking()
+_touched = contextvars.ContextVar("touched", default=None)
+
+
+def ttl_for(tool: str) -> float:
+    return TTLS[TOOL_TTL_CLASS.get(tool, "quote")]
+
+
+def normalize_ticker(ticker: str) -> str:
+    return ticker.strip().upper()
+
+
+def normalize_args(args: dict) -> tuple:
+    normalized = {}
+    for key, value in args.items():
+        if value is None or key == "ticker":
+            continue
+        if isinstance(value, str):
+            value = value.strip().lower()
+        elif isinstance(value, list):
+            value = tuple(value)
+        normalized[key] = value
+    return tuple(sorted(normalized.items()))
+
+
+def make_key(tool: str, ticker: str, args: dict | None = None) -> tuple:
+    return (tool, normalize_ticker(ticker), normalize_args(args or {}))
+
+
+def touch(expires: float):
+    """Note that the current request used data that is valid until expires."""
+    touched = _touched.get()
+    if touched is not None:
+        touched.append(expires)
+
+
+@contextmanager
+def tracking():
+    """Collect the expiry of all data read in this context, yields the list they are appended to.
+
+    Anything derived from that data, such as a whole answer, is only valid until the earliest.
+    """
+    expiries = []
+    token = _touched.set(expiries)
+    try:
+        yield expiries
+    finally:
+        _touched.reset(token)
+
+
+def sizeof(value) -> int:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (dict, list)):
+        return len(json.dumps(value, default=str).encode())
+    return sys.getsizeof(value)
+
+
+class DataCache:
+    """Size bounded LRU cache with per entry expiry and single-flight loading.
+
+    An expired entry can still be served while it is refreshed in the background: the
+    revalidate hook, set by the refresher, is asked first and returns True when it takes
+    the refresh off the request path. Otherwise the request fetches, and falls back to the
+    expired entry when the fetch fails.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # revalidate(key, ttl, fetch, stale_for) -> bool
+        self.revalidate = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+        self.stale_errors = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry["size"]
+
+    def get(self, key):
+        """Return a fresh cached value or None without fetching."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires"] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry["value"]
+
+    def put(self, key, value, ttl: float) -> float:
+        """Store the value for ttl seconds, returns when it expires."""
+        size = sizeof(value)
+        expires = time.monotonic() + ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return expires
+            self._entries[key] = {"value": value, "size": size, "expires": expires}
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return expires
+
+    def ttl_left(self, key) -> float | None:
+        """Seconds until the entry expires, negative once stale, None when not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry["expires"] - time.monotonic()
+
+    @contextmanager
+    def forced(self):
+        """Fetch on this thread even when a fresh entry exists, keeping the old value if the fetch fails."""
+        self._local.forced = True
+        try:
+            yield
+        finally:
+            self._local.forced = False
+
+    def get_or_fetch(self, key, ttl: float, fetch):
+        forced = getattr(self._local, "forced", False)
+        stale = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not forced:
+                stale_for = time.monotonic() - entry["expires"]
+                if stale_for < 0:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    touch(entry["expires"])
+                    return entry["value"]
+                stale = entry
+
+        # Called outside the lock, the hook may start a refresh that writes back to the cache
+        if stale is not None and self.revalidate is not None and self.revalidate(key, ttl, fetch, stale_for):
+            with self._lock:
+                self.stale_hits += 1
+            touch(stale["expires"])
+            return stale["value"]
+
+        with self._lock:
+            # The stale entry stays until the fetch succeeds, it is the last good value if it fails
+            if stale is not None:
+                self.expirations += 1
+
+            # Concurrent misses for the same key wait on the first caller's fetch
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            value, expires = future.result()
+            touch(expires)
+            return value
+
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if stale is not None:
+                    self.stale_errors += 1
+            if stale is None:
+                future.set_exception(e)
+                raise
+            print(f"Serving stale {key} after fetch failed: {e}")
+            # Already expired, so nothing derived from it is cached
+            future.set_result((stale["value"], stale["expires"]))
+            touch(stale["expires"])
+            return stale["value"]
+
+        expires = self.put(key, value, ttl)
+        touch(expires)
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result((value, expires))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced + self.stale_hits
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_hits": self.stale_hits,
+                "stale_errors": self.stale_errors,
+                "hit_rate": (self.hits + self.coalesced + self.stale_hits) / lookups if lookups else 0.0
+            }
+
+
+cache = DataCache()
+
+
+def cached(tool: str, ticker: str, args: dict, fetch):
+    """Fetch market data through the shared cache using the TTL class of the tool."""
+    return cache.get_or_fetch(make_key(tool, ticker, args), ttl_for(tool), fetch)
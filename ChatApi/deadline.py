@@ -0,0 +1,62 @@
+import os
+import time
+import threading
+
+# Share of each deadline held back for the chat model, tool selection and tools must finish before it
+CHAT_RESERVE = float(os.getenv("DEADLINE_CHAT_RESERVE", "0.4"))
+
+# Stages a deadline can cut short, and what the response reports for each
+PARTS = ("tool_selection", "tool", "answer")
+
+_lock = threading.Lock()
+stats = {"requests": 0, "met": 0, **{part: 0 for part in PARTS}}
+
+
+class Deadline:
+    """Latency budget of one request on the monotonic clock.
+
+    The budget is split in two: tool selection and tool calls must finish by tools_at,
+    the rest is the chat model's. Whatever misses its slice is recorded in skipped so the
+    response can say which parts of the answer are missing.
+    """
+
+    def __init__(self, seconds: float, reserve: float = CHAT_RESERVE):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.at = self.started + seconds
+        self.tools_at = self.at - seconds * reserve
+        self.skipped = []
+        self._finished = False
+
+    @classmethod
+    def from_ms(cls, deadline_ms: int | None) -> "Deadline | None":
+        return cls(deadline_ms / 1000) if deadline_ms else None
+
+    def remaining(self, stage: str = "answer") -> float:
+        at = self.at if stage == "answer" else self.tools_at
+        return max(0.0, at - time.monotonic())
+
+    def timeout(self, default: float, stage: str = "answer") -> float:
+        return min(default, self.remaining(stage))
+
+    def expired(self, stage: str = "answer") -> bool:
+        return self.remaining(stage) <= 0
+
+    def skip(self, part: str, **details):
+        self.skipped.append({"part": part, **details})
+
+    def finish(self) -> list[dict]:
+        """Count the request once and return what was skipped."""
+        if not self._finished:
+            self._finished = True
+            with _lock:
+                stats["requests"] += 1
+                stats["met"] += not self.skipped
+                for skipped in self.skipped:
+                    stats[skipped["part"]] += 1
+        return self.skipped
+
+
+def summary() -> dict:
+    with _lock:
+        return dict(stats)
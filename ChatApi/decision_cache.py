@@ -0,0 +1,223 @@
+import os
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+from ChatApi.intent_router import DATE_PATTERNS
+from ChatApi.symbol_index import index as symbol_index, tokenize
+
+DECISION_CACHE_ENABLED = os.getenv("DECISION_CACHE_ENABLED", "1") == "1"
+MAX_ENTRIES = int(os.getenv("DECISION_CACHE_SIZE", "1024"))
+# Decisions are relearned after this long so a changed model or tool set is picked up
+TTL = float(os.getenv("DECISION_CACHE_TTL", 6 * 60 * 60))
+# The model has to make the same choice this many times before it is replayed
+MIN_AGREEMENT = int(os.getenv("DECISION_CACHE_MIN_AGREEMENT", "2"))
+# Share of the template's observations that agreed, templates the model flip flops on are never replayed
+MIN_CONFIDENCE = float(os.getenv("DECISION_CACHE_MIN_CONFIDENCE", "0.75"))
+
+YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+# Any year left in an argument came from the clock or the model, not from a masked slot
+HAS_YEAR = re.compile(r"(?:19|20)\d{2}")
+SYMBOL_SPLIT = re.compile(r"[^A-Z0-9.^=-]+")
+
+
+class Slot:
+    """Placeholder in a stored decision, filled from the slots of the prompt it is replayed for."""
+
+    __slots__ = ("kind", "n")
+
+    def __init__(self, kind: str, n: int):
+        self.kind = kind
+        self.n = n
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Slot) and (self.kind, self.n) == (other.kind, other.n)
+
+    def __hash__(self) -> int:
+        return hash((self.kind, self.n))
+
+    def __repr__(self) -> str:
+        return f"<{self.kind}{self.n}>"
+
+
+def normalize(prompt: str) -> tuple[str, dict[str, list]]:
+    """Prompt template with dates, years and tickers masked, and the values masked in order.
+
+    Other numbers stay in the template, the model turns them into arguments like "6mo"
+    which cannot be substituted back, so "last 3 months" and "last 6 months" are different
+    templates.
+    """
+    slots = {"date": [], "year": [], "ticker": []}
+
+    def mask_date(convert):
+        def replace(match):
+            try:
+                value = convert(match).isoformat()
+            except ValueError:
+                return match.group(0)
+            slots["date"].append(value)
+            return f" __date{len(slots['date']) - 1}__ "
+        return replace
+
+    for pattern, convert in DATE_PATTERNS:
+        prompt = pattern.sub(mask_date(convert), prompt)
+
+    def mask_year(match):
+        slots["year"].append(int(match.group(1)))
+        return f"__year{len(slots['year']) - 1}__"
+
+    prompt = YEAR.sub(mask_year, prompt)
+
+    tokens = tokenize(prompt)
+    words, i = [], 0
+    for start, end, ticker in symbol_index.scan(tokens):
+        words.extend(t.lower() for t in tokens[i:start])
+        if ticker not in slots["ticker"]:
+            slots["ticker"].append(ticker)
+        words.append(f"__ticker{slots['ticker'].index(ticker)}__")
+        i = end
+    words.extend(t.lower() for t in tokens[i:])
+    return " ".join(words), slots
+
+
+def generalize(value, slots: dict[str, list]):
+    """Replace argument values taken from the prompt with their slot, None when the value
+    depends on the prompt in a way that cannot be substituted."""
+    if isinstance(value, list):
+        out = [generalize(v, slots) for v in value]
+        return None if any(v is None for v in out) else out
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int) and value in slots["year"]:
+        return Slot("year", slots["year"].index(value))
+    if isinstance(value, str):
+        if value in slots["date"]:
+            return Slot("date", slots["date"].index(value))
+        if value.isdigit() and int(value) in slots["year"]:
+            return Slot("year", slots["year"].index(int(value)))
+        ticker = symbol_index.resolve(value) or value.strip().lstrip("$").upper()
+        if ticker in slots["ticker"]:
+            return Slot("ticker", slots["ticker"].index(ticker))
+        if set(SYMBOL_SPLIT.split(value.upper())) & set(slots["ticker"]):
+            return None
+    if HAS_YEAR.search(str(value)):
+        return None
+    return value
+
+
+def fill(value, slots: dict[str, list]):
+    if isinstance(value, Slot):
+        return slots[value.kind][value.n]
+    if isinstance(value, list):
+        return [fill(v, slots) for v in value]
+    return value
+
+
+class DecisionCache:
+    """Tool calls the tool model chose for a prompt template, replayed for prompts of the same shape.
+
+    A prompt is reduced to a template by masking its dates, years and tickers, and the
+    chosen calls are stored with those values swapped for slots. A decision is replayed only
+    once the model has made it MIN_AGREEMENT times and at least MIN_CONFIDENCE of the time,
+    and only when every argument is either fixed or taken from a slot.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL, min_agreement: int = MIN_AGREEMENT,
+                 min_confidence: float = MIN_CONFIDENCE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_agreement = min_agreement
+        self.min_confidence = min_confidence
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.learned = 0
+        self.uncacheable = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, prompt: str, tool_model: str = "") -> list[dict]:
+        """Tool calls for the prompt when its template has a confident decision, else an empty list."""
+        template, slots = normalize(prompt)
+        key = (tool_model, template)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry["learned_at"] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None or entry["agree"] < self.min_agreement or entry["agree"] / entry["seen"] < self.min_confidence:
+                self.misses += 1
+                return []
+            self._entries.move_to_end(key)
+            self.hits += 1
+            shape = entry["shape"]
+        return [
+            {
+                "name": name,
+                "args": {arg: fill(value, slots) for arg, value in args.items()},
+                "id": f"cache-{uuid.uuid4().hex[:8]}",
+                "type": "tool_call"
+            }
+            for name, args in shape
+        ]
+
+    def learn(self, prompt: str, tool_calls: list[dict], tool_model: str = "") -> bool:
+        """Record the calls the model chose, False when they cannot be replayed for another prompt."""
+        if not tool_calls:
+            return False
+        template, slots = normalize(prompt)
+        shape = []
+        for tool_call in tool_calls:
+            args = {key: generalize(value, slots) for key, value in tool_call["args"].items()}
+            if any(v is None and tool_call["args"][k] is not None for k, v in args.items()):
+                with self._lock:
+                    self.uncacheable += 1
+                return False
+            shape.append((tool_call["name"], args))
+
+        key = (tool_model, template)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {"shape": shape, "agree": 0, "seen": 0, "learned_at": time.monotonic()}
+            elif entry["shape"] != shape:
+                entry["shape"], entry["agree"] = shape, 0
+            entry["agree"] += 1
+            entry["seen"] += 1
+            entry["learned_at"] = time.monotonic()
+            self._entries.move_to_end(key)
+            self.learned += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": DECISION_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "replayable": sum(
+                    e["agree"] >= self.min_agreement and e["agree"] / e["seen"] >= self.min_confidence
+                    for e in self._entries.values()
+                ),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "learned": self.learned,
+                "uncacheable": self.uncacheable,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+decision_cache = DecisionCache()
@@ -1,10 +1,107 @@
 import pandas as pd
+import numpy as np
 import json
 
-import yfinance as yf
-
 from langchain.tools import tool
 
+from ChatApi.data_cache import cached, normalize_ticker
+from ChatApi.ohlcv_store import store
+from ChatApi.market_data import provider, AS_OF
+from ChatApi import metrics_engine
+from ChatApi.instrumentation import timed
+from ChatApi.serializers import compact_time_series, compact_statement, format_number, estimate_tokens, TOKEN_BUDGET
+
+# --------------------------------------------------------------
+# Cached upstream fetches, shared by the tools below
+# --------------------------------------------------------------
+
+def download_history(ticker: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+    return provider.history(ticker, start, end, interval)
+
+@timed("fetch_seconds")
+def fetch_history(ticker: str, period: str = "1d", start: str = None) -> pd.DataFrame:
+    # Served from the on-disk store, only missing dates go upstream
+    return store.get(ticker, period, start, fetch=download_history)
+
+def download_history_multi(tickers: list[str], start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+    # One batched request for every ticker, columns are (ticker, field)
+    return provider.history_multi(tickers, start, end, interval)
+
+@timed("fetch_seconds")
+def fetch_history_multi(tickers: list[str], period: str = "1d", start: str = None) -> dict[str, pd.DataFrame]:
+    return store.get_many(tickers, period, start, fetch_many=download_history_multi)
+
+def compare_history(frames: dict[str, pd.DataFrame]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Align closes on one date index and compute the usual comparisons for every ticker at once.
+
+    Returns:
+        tuple: (summary with one row per ticker, aligned closes with one column per ticker)
+    """
+    closes = pd.concat({t: f["Close"] for t, f in frames.items()}, axis=1).sort_index()
+    highs = pd.concat({t: f["High"] for t, f in frames.items()}, axis=1)
+    lows = pd.concat({t: f["Low"] for t, f in frames.items()}, axis=1)
+
+    first = closes.bfill().iloc[0]
+    last = closes.ffill().iloc[-1]
+    daily = np.log(closes.ffill()).diff()
+    summary = pd.DataFrame({
+        "First": first,
+        "Last": last,
+        "Return%": (last / first - 1) * 100,
+        "High": highs.max(),
+        "Low": lows.min(),
+        # Annualised from daily log returns
+        "Volatility%": daily.std() * np.sqrt(252) * 100,
+        "MaxDrawdown%": (closes.ffill() / closes.ffill().cummax() - 1).min() * 100,
+    })
+    return summary, closes
+
+@timed("fetch_seconds")
+def fetch_news(ticker: str) -> list:
+    ticker = normalize_ticker(ticker)
+    return cached("get_latest_news", ticker, {}, lambda: provider.news(ticker))
+
+@timed("fetch_seconds")
+def fetch_info(ticker: str) -> dict:
+    ticker = normalize_ticker(ticker)
+    return cached("get_key_financial_metrics", ticker, {}, lambda: provider.info(ticker))
+
+@timed("fetch_seconds")
+def fetch_balance_sheet(ticker: str) -> pd.DataFrame:
+    ticker = normalize_ticker(ticker)
+    return cached("get_balance_sheet", ticker, {}, lambda: provider.statement(ticker, "balance_sheet"))
+
+@timed("fetch_seconds")
+def fetch_income_stmt(ticker: str) -> pd.DataFrame:
+    ticker = normalize_ticker(ticker)
+    return cached("get_income_statement", ticker, {}, lambda: provider.statement(ticker, "income_stmt"))
+
+@timed("fetch_seconds")
+def fetch_cashflow(ticker: str) -> pd.DataFrame:
+    ticker = normalize_ticker(ticker)
+    return cached("get_cash_flow_statement", ticker, {}, lambda: provider.statement(ticker, "cashflow"))
+
+@timed("fetch_seconds")
+def fetch_ratios(ticker: str) -> pd.DataFrame:
+    # Whole catalog for all reported periods, computed once per ticker and cached like a statement
+    ticker = normalize_ticker(ticker)
+    return cached(
+        "get_financial_ratios", ticker, {},
+        lambda: metrics_engine.compute_ratios(fetch_balance_sheet(ticker), fetch_income_stmt(ticker), fetch_cashflow(ticker))
+    )
+
+@timed("fetch_seconds")
+def fetch_dividends(ticker: str, time_period: str = "1mo") -> pd.Series:
+    ticker = normalize_ticker(ticker)
+    return cached(
+        "get_dividends", ticker, {"time_period": time_period},
+        lambda: provider.dividends(ticker, time_period)
+    )
+
+# --------------------------------------------------------------
+# Tools
+# --------------------------------------------------------------
+
 @tool
 def get_historical_data(ticker: str, period: str = "1d", start: str = None) -> str:
     """Get historical market price data for a given ticker symbol.
@@ -17,9 +114,34 @@ def get_historical_data(ticker: str, period: str = "1d", start: str = None) -> s
     Returns:
         str: Historical market data as a string in tabular format.
     """
-    dat = yf.Ticker(ticker)
-    hist = dat.history(period=period, start=start)
-    return hist.to_csv(index=True)
+    hist = fetch_history(ticker, period, start)
+    return compact_time_series(hist, "get_historical_data")
+
+@tool
+def get_historical_data_multi(tickers: list[str], period: str = "1mo", start: str = None) -> str:
+    """Get and compare historical closing prices for several ticker symbols at once.
+    Use this instead of get_historical_data when a question involves more than one company.
+
+    Args:
+        tickers (list[str]): The ticker symbols of the companies e.g. ["NVDA", "AMD", "INTC"].
+        period (str): The period over which to fetch data. Valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max. Default: 1mo.
+        start (str): The start date for fetching historical data in 'YYYY-MM-DD' format. Optional.
+
+    Returns:
+        str: A per ticker summary (return, high, low, volatility, max drawdown) followed by the aligned closing prices.
+    """
+    frames = {t: f for t, f in fetch_history_multi(tickers, period, start).items() if not f.empty}
+    if not frames:
+        return "No data"
+
+    summary, closes = compare_history(frames)
+    summary_lines = ["Ticker|" + "|".join(summary.columns)] + [
+        "|".join([ticker] + [format_number(v) for v in row])
+        for ticker, row in zip(summary.index, summary.itertuples(index=False, name=None))
+    ]
+    summary_text = "\n".join(summary_lines)
+    budget = max(100, TOKEN_BUDGET - estimate_tokens(summary_text))
+    return summary_text + "\n\nClose\n" + compact_time_series(closes, "get_historical_data_multi", token_budget=budget)
 
 @tool
 def get_latest_news(ticker: str) -> str:
@@ -29,8 +151,7 @@ def get_latest_news(ticker: str) -> str:
         ticker (str): The ticker symbol of the company e.g. "MSFT".
     """
 
-    dat = yf.Ticker(ticker)
-    news_list = dat.get_news()
+    news_list = fetch_news(ticker)
     
     extracted_news = []
     
@@ -44,6 +165,8 @@ def get_latest_news(ticker: str) -> str:
             'pubDate': content.get('pubDate'),
             'provider': content.get('provider', {}).get('displayName'),
             'contentType': content.get('contentType'),
+            # Only set when the article came from an offline snapshot
+            AS_OF: article.get(AS_OF),
         }
         
         # Remove None values
@@ -61,8 +184,7 @@ def get_key_financial_metrics(ticker: str) -> str:
     Args:
         ticker (str): The ticker symbol of the company e.g. "MSFT".
     """
-    dat = yf.Ticker(ticker)
-    full_data = dat.get_info()
+    full_data = fetch_info(ticker)
 
     # Define the keys we want to get
     important_keys = [
@@ -83,7 +205,9 @@ def get_key_financial_metrics(ticker: str) -> str:
         # Dividends
         "dividendRate", "dividendYield", "payoutRatio",
         # Analyst Data
-        "targetMeanPrice"
+        "targetMeanPrice",
+        # Export time when served from an offline snapshot
+        AS_OF
     ]
     
     # Extract only the keys that exist in the full data
@@ -107,8 +231,7 @@ def get_balance_sheet(ticker: str) -> str:
     Returns:
         str: The balance sheet of the company as a string in tabular format.
     """
-    dat = yf.Ticker(ticker)
-    return dat.get_balance_sheet().to_csv(index=True)
+    return compact_statement(fetch_balance_sheet(ticker), "get_balance_sheet")
 
 @tool
 def get_income_statement(ticker: str) -> str:
@@ -121,8 +244,7 @@ def get_income_statement(ticker: str) -> str:
     Returns:
         str: The income statement of the company as a string in tabular format.
     """
-    dat = yf.Ticker(ticker)
-    return dat.get_income_stmt().to_csv(index=True)
+    return compact_statement(fetch_income_stmt(ticker), "get_income_statement")
 
 @tool
 def get_cash_flow_statement(ticker: str) -> str:
@@ -135,8 +257,27 @@ def get_cash_flow_statement(ticker: str) -> str:
     Returns:
         str: The cash flow statement of the company as a string in tabular format.
     """
-    dat = yf.Ticker(ticker)
-    return dat.get_cashflow().to_csv(index=True)
+    return compact_statement(fetch_cashflow(ticker), "get_cash_flow_statement")
+
+@tool
+def get_financial_ratios(ticker: str, ratios: list[str] = None, year: int = None) -> str:
+    """Get financial ratios and margins computed from a company's balance sheet, income statement and cash flow statement.
+    Use this instead of the full statements when a question asks for a ratio, margin or return.
+
+    Args:
+        ticker (str): The ticker symbol of the company e.g. "MSFT".
+        ratios (list[str]): The ratios to return. Optional, default all. Valid ratios: current_ratio, quick_ratio, cash_ratio,
+            working_capital, debt_to_equity, debt_to_assets, equity_ratio, net_debt, interest_coverage, gross_margin,
+            operating_margin, ebitda_margin, net_margin, fcf_margin, return_on_equity, return_on_assets, free_cash_flow,
+            capital_expenditure, cash_conversion, capex_to_revenue.
+        year (int): The fiscal year to report e.g. 2024. Optional, default all reported years.
+
+    Returns:
+        str: The ratios for each reported period in tabular format, margins and returns in percent.
+    """
+    selected = metrics_engine.select(fetch_ratios(ticker), ratios, year)
+    selected = selected.rename(index=metrics_engine.label)
+    return compact_statement(selected, "get_financial_ratios")
 
 @tool
 def get_dividends(ticker: str, time_period: str = "1mo") -> str:
@@ -149,5 +290,4 @@ def get_dividends(ticker: str, time_period: str = "1mo") -> str:
     Returns:
         str: The dividends of the company as a string in tabular format.
     """
-    dat = yf.Ticker(ticker)
-    return dat.get_dividends(period=time_period).to_csv(index=True)
\ No newline at end of file
+    return compact_time_series(fetch_dividends(ticker, time_period), "get_dividends")
\ No newline at end of file
@@ -0,0 +1,155 @@
+import os
+import time
+import bisect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+
+# Checked first thing on every observation, nothing else runs when switched off
+ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+TOKENS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATES = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# name: (help, buckets)
+METRICS = {
+    "tool_selection_seconds": ("Time to pick tool calls, by source (router or model)", SECONDS),
+    "tool_dispatch_seconds": ("Time from the start of a streamed tool selection until each call is dispatched", SECONDS),
+    "tool_seconds": ("Wall time of one tool call including fetch and serialization", SECONDS),
+    "fetch_seconds": ("Time spent in an upstream or cached data fetch", SECONDS),
+    "serialize_seconds": ("Time spent serializing a tool output", SECONDS),
+    "tool_output_bytes": ("Size of a tool output passed to the chat model", BYTES),
+    "tool_output_tokens": ("Estimated tokens of a tool output passed to the chat model", TOKENS),
+    "chat_ttft_seconds": ("Chat model time to first token", SECONDS),
+    "chat_seconds": ("Chat model total generation time", SECONDS),
+    "chat_tokens_per_second": ("Chat model generation speed", RATES),
+}
+
+# Per request samples for the timings stream event, None when the request did not ask
+_request_samples = contextvars.ContextVar("request_samples", default=None)
+_null = nullcontext()
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][slot] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+
+histograms = {name: Histogram(buckets) for name, (_, buckets) in METRICS.items()}
+
+
+def observe(name: str, value: float, **labels):
+    if not ENABLED:
+        return
+    histograms[name].observe(value, tuple(sorted(labels.items())))
+    samples = _request_samples.get()
+    if samples is not None:
+        samples.append({"name": name, **labels, "value": round(value, 4)})
+
+
+@contextmanager
+def _timer(name: str, labels: dict):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timer(name: str, **labels):
+    return _timer(name, labels) if ENABLED else _null
+
+
+def timed(name: str, **labels):
+    """Decorator recording the wrapped function's duration, labelled with its name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _timer(name, {"source": func.__name__, **labels}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_chat(model: str, started: float, first_token_at: float | None, output_tokens: int):
+    """Record a streamed generation from its perf_counter timestamps."""
+    if not ENABLED:
+        return
+    finished = time.perf_counter()
+    observe("chat_seconds", finished - started, model=model)
+    if first_token_at is not None:
+        observe("chat_ttft_seconds", first_token_at - started, model=model)
+        if output_tokens and finished > first_token_at:
+            observe("chat_tokens_per_second", output_tokens / (finished - first_token_at), model=model)
+
+
+def observe_chat_message(model: str, message, started: float):
+    """Record a non streamed generation, using Ollama's own durations when it reports them."""
+    if not ENABLED:
+        return
+    observe("chat_seconds", time.perf_counter() - started, model=model)
+    meta = getattr(message, "response_metadata", None) or {}
+    if meta.get("eval_count") and meta.get("eval_duration"):
+        # Durations are nanoseconds, prompt evaluation (plus any load) is what precedes the first token
+        observe("chat_ttft_seconds", ((meta.get("load_duration") or 0) + (meta.get("prompt_eval_duration") or 0)) / 1e9, model=model)
+        observe("chat_tokens_per_second", meta["eval_count"] / (meta["eval_duration"] / 1e9), model=model)
+
+
+def output_tokens(chunk, text: str) -> int:
+    # The final Ollama chunk carries the real count, fall back to the character estimate
+    usage = getattr(chunk, "usage_metadata", None) or {}
+    return usage.get("output_tokens") or max(1, len(text) // 4)
+
+
+@contextmanager
+def collect():
+    """Gather this request's samples, yields the list they are appended to."""
+    samples = [] if ENABLED else None
+    token = _request_samples.set(samples)
+    try:
+        yield samples
+    finally:
+        _request_samples.reset(token)
+
+
+def format_labels(labels: tuple, extra: dict | None = None) -> str:
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render() -> str:
+    """All histograms in the Prometheus text exposition format."""
+    lines = []
+    for name, (help_text, _) in METRICS.items():
+        histogram = histograms[name]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        with histogram._lock:
+            series = {labels: dict(s, counts=list(s["counts"])) for labels, s in histogram.series.items()}
+        for labels, s in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(list(histogram.buckets) + ["+Inf"], s["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(labels, {'le': bound})} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {s['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {s['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,247 @@
+import os
+import re
+import uuid
+import threading
+from datetime import date, datetime, timedelta
+
+from ChatApi.ohlcv_store import add_period
+from ChatApi.symbol_index import index as symbol_index
+
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1") == "1"
+
+# Routes below this confidence fall back to the tool selection model
+MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.8"))
+
+PERIODS = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y"]
+
+MONTHS = "january|february|march|april|may|june|july|august|september|october|november|december|" \
+         "jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec"
+
+DATE_PATTERNS = [
+    (re.compile(r"\b(\d{4}-\d{2}-\d{2})\b"), lambda m: date.fromisoformat(m.group(1))),
+    (re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({MONTHS})\.?,?\s+(\d{{4}})\b", re.I),
+     lambda m: parse_date(m.group(1), m.group(2), m.group(3))),
+    (re.compile(rf"\b({MONTHS})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b", re.I),
+     lambda m: parse_date(m.group(2), m.group(1), m.group(3))),
+]
+
+RELATIVE_PERIOD = re.compile(
+    r"\b(?:last|past|previous|over)\s+(?:the\s+)?(\d+\s*)?(day|days|d|week|weeks|wk|month|months|mo|year|years|y)\b", re.I
+)
+
+YEAR_TO_DATE = re.compile(r"\b(?:this year|year[ -]to[ -]date|ytd)\b", re.I)
+
+YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+
+# Time words left over when no range could be parsed, the question is about a span the router cannot pin down
+TIME_CUE = re.compile(
+    r"\b(?:(?:19|20)\d{2}|yesterday|ago|since|weeks?|months?|quarters?|years?|ytd|january|february|march|april|"
+    r"june|july|august|september|october|november|december)\b", re.I
+)
+
+# Price words that ask for the current quote, "open", "low" and the like need a range
+CURRENT_PRICE = re.compile(r"\b(?:price|prices|trading at)\b", re.I)
+
+# Below MIN_CONFIDENCE, for routes that are only a guess
+UNSURE = 0.5
+
+# Ratio questions are answered by the metrics engine instead of a full statement
+RATIO_PHRASES = [
+    (re.compile(r"\bcurrent ratio\b", re.I), "current_ratio"),
+    (re.compile(r"\bquick ratio\b", re.I), "quick_ratio"),
+    (re.compile(r"\bcash ratio\b", re.I), "cash_ratio"),
+    (re.compile(r"\bdebt[ -]to[ -]equity\b", re.I), "debt_to_equity"),
+    (re.compile(r"\bdebt[ -]to[ -]assets\b", re.I), "debt_to_assets"),
+    (re.compile(r"\binterest coverage\b", re.I), "interest_coverage"),
+    (re.compile(r"\bgross (?:profit )?margin\b", re.I), "gross_margin"),
+    (re.compile(r"\boperating (?:profit )?margin\b", re.I), "operating_margin"),
+    (re.compile(r"\bebitda margin\b", re.I), "ebitda_margin"),
+    (re.compile(r"\b(?:net (?:profit )?margin|(?<!gross )(?<!operating )profit margin)\b", re.I), "net_margin"),
+    (re.compile(r"\b(?:free cash flow|fcf) margin\b", re.I), "fcf_margin"),
+    (re.compile(r"\b(?:return on equity|ROE)\b"), "return_on_equity"),
+    (re.compile(r"\b(?:return on assets|ROA)\b"), "return_on_assets"),
+    (re.compile(r"\bcash conversion\b", re.I), "cash_conversion"),
+]
+
+FISCAL_YEAR = re.compile(r"\b(?:for|in|of|during|fy)\s*((?:19|20)\d{2})\b", re.I)
+
+# Each intent maps to a tool, checked in order, more specific phrasing first
+INTENTS = [
+    ("news", "get_latest_news", re.compile(r"\b(news|headlines?|articles?)\b", re.I)),
+    ("dividends", "get_dividends", re.compile(r"\b(dividends?|payouts?)\b", re.I)),
+    ("balance_sheet", "get_balance_sheet", re.compile(
+        r"\b(balance sheet|total assets|current ratio|debt to equity|debt-to-equity|total liabilities|shareholders'? equity)\b", re.I)),
+    ("income_statement", "get_income_statement", re.compile(
+        r"\b(income statement|total revenue|gross profit|gross margin|net income|operating income|profit margin)\b", re.I)),
+    ("cash_flow", "get_cash_flow_statement", re.compile(
+        r"\b(cash ?flow statement|cash flows?|capital expenditures?|capex|free cash flow)\b", re.I)),
+    ("price", None, re.compile(r"\b(price|prices|trading at|close|closing|open|high|highest|low|lowest|perform\w*|compare|returns?|trend)\b", re.I)),
+    ("metrics", "get_key_financial_metrics", re.compile(
+        r"\b(market cap\w*|valuation|p/?e|pe ratio|price to book|target price|analyst target|metrics)\b", re.I)),
+]
+
+_lock = threading.Lock()
+stats = {"requests": 0, "fallback": 0, "routes": {}}
+
+
+def parse_date(day: str, month: str, year: str) -> date:
+    month = month.lower().rstrip(".")[:3]
+    return datetime.strptime(f"{int(day)} {month} {year}", "%d %b %Y").date()
+
+
+def extract_dates(prompt: str) -> list[date]:
+    found = []
+    for pattern, convert in DATE_PATTERNS:
+        for match in pattern.finditer(prompt):
+            try:
+                found.append((match.start(), convert(match)))
+            except ValueError:
+                continue
+    return [d for _, d in sorted(found)]
+
+
+def relative_period(prompt: str) -> str | None:
+    match = RELATIVE_PERIOD.search(prompt)
+    if not match:
+        return None
+    n = int(match.group(1) or 1)
+    unit = match.group(2).lower()
+    if unit.startswith("d"):
+        days = n
+    elif unit.startswith("w"):
+        days = n * 7
+    elif unit.startswith("mo"):
+        days = n * 30
+    else:
+        days = n * 365
+    # Smallest yfinance period that covers the requested span
+    for period in PERIODS:
+        if add_period(date.today(), period) - date.today() >= timedelta(days=days):
+            return period
+    return "max"
+
+
+def period_covering(start: date, end: date) -> str:
+    for period in PERIODS:
+        if add_period(start, period) > end:
+            return period
+    return "max"
+
+
+def history_args(prompt: str) -> dict | None:
+    dates = extract_dates(prompt)
+    if dates:
+        start, end = dates[0], dates[-1]
+        return {"start": start.isoformat(), "period": period_covering(start, end)}
+    if YEAR_TO_DATE.search(prompt):
+        return {"period": "ytd"}
+    years = [int(y) for y in YEAR.findall(prompt)]
+    if years:
+        # A calendar year is start + 1y, the tool's range excludes its end
+        start, end = date(min(years), 1, 1), date(max(years), 12, 31)
+        return {"start": start.isoformat(), "period": period_covering(start, end)}
+    period = relative_period(prompt)
+    if period:
+        return {"period": period}
+    return None
+
+
+def ratio_args(prompt: str) -> dict | None:
+    ratios = list(dict.fromkeys(ratio for pattern, ratio in RATIO_PHRASES if pattern.search(prompt)))
+    if not ratios:
+        return None
+    args = {"ratios": ratios}
+    year = FISCAL_YEAR.search(prompt)
+    if year:
+        args["year"] = int(year.group(1))
+    return args
+
+
+def make_call(name: str, args: dict) -> dict:
+    return {"name": name, "args": args, "id": f"route-{uuid.uuid4().hex[:8]}", "type": "tool_call"}
+
+
+def classify(prompt: str) -> tuple[list[dict], str, float]:
+    """Map a prompt to tool calls without a model.
+
+    Returns:
+        tuple: (tool_calls, route_name, confidence)
+    """
+    tickers = symbol_index.extract_tickers(prompt)
+    if not tickers:
+        return [], "no_ticker", 0.0
+
+    matched = [(name, tool) for name, tool, pattern in INTENTS if pattern.search(prompt)]
+    statement_intents = [m for m in matched if m[0] in ("balance_sheet", "income_statement", "cash_flow")]
+    # A statement question mentioning a price-like word is still a statement question
+    if statement_intents:
+        matched = [m for m in matched if m[0] not in ("price", "metrics")]
+    # A ratio question only needs the computed ratio, not the statement it comes from
+    ratios = ratio_args(prompt)
+    if ratios:
+        matched = [("ratios", "get_financial_ratios")] + [
+            m for m in matched if m[0] not in ("balance_sheet", "income_statement", "cash_flow", "price", "metrics")
+        ]
+    if not matched:
+        return [], "unknown", 0.0
+
+    calls, unsure = [], False
+    for name, tool in matched:
+        if name == "price":
+            args = history_args(prompt)
+            if args is None:
+                tool, args = "get_key_financial_metrics", {}
+                # The quote only answers a current price question, leave anything else to the model
+                unsure = bool(TIME_CUE.search(prompt)) or not CURRENT_PRICE.search(prompt)
+            else:
+                tool = "get_historical_data"
+        elif name == "dividends":
+            args = {"time_period": relative_period(prompt) or "1y"}
+        elif name == "ratios":
+            args = ratios
+        else:
+            args = {}
+        if tool == "get_historical_data" and len(tickers) > 1:
+            # One batched download for a multi company price question
+            calls.append(make_call("get_historical_data_multi", {"tickers": tickers, **args}))
+            continue
+        for ticker in tickers:
+            call = make_call(tool, {"ticker": ticker, **args})
+            if not any(c["name"] == call["name"] and c["args"] == call["args"] for c in calls):
+                calls.append(call)
+
+    route = "+".join(name for name, _ in matched)
+    confidence = 1.0 if len(matched) == 1 else 0.9
+    if len(tickers) > 1:
+        confidence -= 0.1
+    if unsure:
+        confidence = min(confidence, UNSURE)
+    return calls, route, confidence
+
+
+def route(prompt: str) -> list[dict]:
+    """Return tool calls for a confidently recognised prompt, or an empty list to use the model."""
+    if not ROUTER_ENABLED:
+        return []
+    calls, route_name, confidence = classify(prompt)
+    with _lock:
+        stats["requests"] += 1
+        if calls and confidence >= MIN_CONFIDENCE:
+            stats["routes"][route_name] = stats["routes"].get(route_name, 0) + 1
+            return calls
+        stats["fallback"] += 1
+        return []
+
+
+def summary() -> dict:
+    with _lock:
+        requests = stats["requests"]
+        return {
+            "requests": requests,
+            "fallback": stats["fallback"],
+            "hit_rate": (requests - stats["fallback"]) / requests if requests else 0.0,
+            "routes": {
+                name: {"hits": hits, "rate": hits / requests}
+                for name, hits in sorted(stats["routes"].items())
+            }
+        }
@@ -4,15 +4,39 @@ from pathlib import Path
 # Add parent directory (OnDeviceAgent) to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+import asyncio
+from typing import Literal
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 
-from ChatApi.trading_agent import prompt_model, stream_response
+# Only light modules at import time, langchain, yfinance and pandas load in the warm-up task
+from ChatApi import instrumentation, sse
+from ChatApi.scheduler import scheduler, QueueFull
+from ChatApi.deadline import Deadline
+from ChatApi.warmup import Warmup
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+async def refresh_hot_tickers():
+    await app.state.warmup.imports()
+    from ChatApi.refresher import refresher, REFRESH_ENABLED
+    if REFRESH_ENABLED:
+        await refresher.run()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start serving straight away, /ready reports when the agent and models are loaded
+    app.state.warmup.start()
+    refresh = asyncio.ensure_future(refresh_hot_tickers())
+    yield
+    refresh.cancel()
+    await app.state.warmup.stop()
+
+app = FastAPI(lifespan=lifespan)
+app.state.warmup = Warmup()
 
 # Add CORS middleware - IMPORTANT!
 app.add_middleware(
@@ -27,14 +51,190 @@ class ChatRequest(BaseModel):
     tool_model: str
     chat_model: str
     prompt: str
+    speculative: bool | None = None
+    priority: Literal["high", "normal", "low"] = "normal"
+    timings: bool = False
+    # Answer within this many milliseconds of arrival, skipping whatever does not fit
+    deadline_ms: int | None = None
+    # Window for merging text chunks into one frame, 0 sends every chunk, unset uses SSE_FLUSH_MS
+    flush_ms: int | None = None
+    # Continue a conversation created with POST /agent/trading/sessions
+    session_id: str | None = None
+
+def find_session(session_id: str | None):
+    if session_id is None:
+        return None
+    from ChatApi.sessions import session_store, SessionNotFound
+    try:
+        return session_store.get(session_id)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session {session_id}")
+
+def claim(session):
+    # Before admission, a second turn on a busy session would otherwise sit on a model slot waiting for the first
+    if session is None:
+        return
+    from ChatApi.sessions import SessionBusy
+    try:
+        session.claim()
+    except SessionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def release(session):
+    if session is not None:
+        session.release()
+
+def admit(request: ChatRequest):
+    try:
+        return scheduler.admit((request.tool_model, request.chat_model), request.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
 @app.post("/agent/trading/chat")
 async def trading_agent_chat(request: ChatRequest) -> dict:
-    return prompt_model(request.prompt, request.tool_model, request.chat_model)
+    deadline = Deadline.from_ms(request.deadline_ms)
+    agent = await app.state.warmup.imports()
+    session = find_session(request.session_id)
+    # A cached answer needs no model, it is served without waiting for a slot
+    cached = agent.cached_response(request.prompt, request.tool_model, request.chat_model, deadline) if session is None else None
+    if cached is not None:
+        return cached
+    claim(session)
+    try:
+        ticket = admit(request)
+        try:
+            async for _ in scheduler.wait(ticket):
+                pass
+            return await agent.aprompt_model(
+                request.prompt, request.tool_model, request.chat_model, request.speculative, ticket.threads,
+                deadline=deadline, lookup=False, session=session
+            )
+        finally:
+            scheduler.release(ticket)
+    finally:
+        release(session)
 
-@app.post("/agent/trading/chat/stream")
-async def trading_agent_chat_stream(request: ChatRequest) -> StreamingResponse:
+async def scheduled_stream(request: ChatRequest, ticket, agent, deadline: Deadline | None = None, session=None):
+    try:
+        async for position in scheduler.wait(ticket):
+            yield {"type": "queue", "position": position}
+        async for event in agent.astream_events(
+            request.prompt, request.tool_model, request.chat_model, request.speculative, ticket.threads,
+            request.timings, deadline, lookup=False, session=session
+        ):
+            yield event
+    finally:
+        scheduler.release(ticket)
+
+class BatchRequest(BaseModel):
+    requests: list[ChatRequest]
+    concurrency: int | None = None
+
+@app.post("/agent/trading/chat/batch")
+async def trading_agent_chat_batch(request: BatchRequest) -> StreamingResponse:
+    await app.state.warmup.imports()
+    from ChatApi import batch
+    # One JSON line per prompt, in completion order, each tagged with its index in the request
     return StreamingResponse(
-        stream_response(request.prompt, request.tool_model, request.chat_model),
-        media_type="text/plain"
-    )
\ No newline at end of file
+        batch.run_batch(request.requests, request.concurrency),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/agent/trading/chat/stream")
+async def trading_agent_chat_stream(request: ChatRequest, http_request: Request) -> StreamingResponse:
+    # The clock starts on arrival so time spent loading and queued counts against the deadline
+    deadline = Deadline.from_ms(request.deadline_ms)
+    agent = await app.state.warmup.imports()
+    session = find_session(request.session_id)
+    cached = agent.lookup_response(request.prompt, request.tool_model, request.chat_model) if session is None else None
+    ticket = None
+    if cached is not None:
+        # Replayed straight away, the recorded tool events and text without a model slot
+        events = agent.areplay_events(cached, request.timings, deadline)
+    else:
+        # Claim and admit before streaming starts so a busy session or a full queue is still a plain 409 or 429
+        claim(session)
+        try:
+            ticket = admit(request)
+        except HTTPException:
+            release(session)
+            raise
+        # Stopping on disconnect also releases the ticket, so the slot goes to the next request at once
+        events = scheduled_stream(request, ticket, agent, deadline, session)
+
+    def close():
+        # Released again when the response ends, the generator never runs if the client left before it started
+        if ticket is not None:
+            scheduler.release(ticket)
+        release(session)
+
+    return sse.EventStreamResponse(
+        sse.stream(events, http_request.is_disconnected, sse.FlushPolicy.from_ms(request.flush_ms), sse.KEEPALIVE),
+        on_close=close
+    )
+
+@app.post("/agent/trading/sessions")
+async def create_session() -> dict:
+    agent = await app.state.warmup.imports()
+    # History is kept server side, follow-ups only send their own prompt with the session_id
+    return agent.new_session().summary()
+
+@app.get("/agent/trading/sessions/{session_id}")
+async def get_session(session_id: str) -> dict:
+    await app.state.warmup.imports()
+    return find_session(session_id).summary()
+
+@app.delete("/agent/trading/sessions/{session_id}")
+async def delete_session(session_id: str) -> dict:
+    await app.state.warmup.imports()
+    from ChatApi.sessions import session_store, SessionNotFound
+    try:
+        session_store.delete(session_id)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session {session_id}")
+    return {"session_id": session_id, "deleted": True}
+
+@app.get("/agent/trading/stats")
+async def trading_agent_stats() -> dict:
+    await app.state.warmup.imports()
+    from ChatApi import serializers, intent_router, prefetch, batch, deadline, tool_selector
+    from ChatApi.model_registry import registry
+    from ChatApi.data_cache import cache
+    from ChatApi.ohlcv_store import store
+    from ChatApi.market_data import provider
+    from ChatApi.refresher import refresher
+    from ChatApi.decision_cache import decision_cache
+    from ChatApi.response_cache import response_cache
+    from ChatApi.sessions import session_store
+    from ChatApi.symbol_index import index as symbol_index
+    return {
+        "models": registry.stats(),
+        "warm_up": app.state.warmup.status(),
+        "data_cache": cache.stats(),
+        "response_cache": response_cache.stats(),
+        "sessions": session_store.stats(),
+        "ohlcv_store": store.stats(),
+        "market_data": provider.stats(),
+        "refresher": refresher.stats(),
+        "serializers": serializers.summary(),
+        "router": intent_router.summary(),
+        "decision_cache": decision_cache.stats(),
+        "tool_selector": tool_selector.summary(),
+        "symbol_index": symbol_index.stats(),
+        "prefetch": prefetch.summary(),
+        "scheduler": scheduler.stats(),
+        "batch": batch.summary(),
+        "deadlines": deadline.summary(),
+        "sse": sse.summary()
+    }
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    # Prometheus text exposition format
+    return PlainTextResponse(instrumentation.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    # 503 until warm-up finishes so load balancers and the UI can wait on it
+    status = app.state.warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
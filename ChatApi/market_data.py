@@ -0,0 +1,388 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import os
+import json
+import shutil
+import argparse
+import threading
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from ChatApi.data_cache import normalize_ticker
+from ChatApi.ohlcv_store import OHLCVStore, resolve_range, _lock_for
+
+# Local bundle consulted before the network, e.g. unpacked with `python -m ChatApi.market_data import`
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", Path.home() / ".ondeviceagent" / "snapshot"))
+
+# Providers tried in order, "snapshot" is skipped when no bundle is installed
+MARKET_DATA_PROVIDERS = os.getenv("MARKET_DATA_PROVIDERS", "snapshot,yfinance")
+
+# Seconds after export before each kind of snapshot data is only used when every other provider fails,
+# 0 never. Quotes and news go out of date within the day, exported history only holds completed days
+SNAPSHOT_MAX_AGES = {
+    "info": float(os.getenv("SNAPSHOT_MAX_AGE_INFO", 15 * 60)),
+    "news": float(os.getenv("SNAPSHOT_MAX_AGE_NEWS", 60 * 60)),
+    "dividends": float(os.getenv("SNAPSHOT_MAX_AGE_DIVIDENDS", 24 * 60 * 60)),
+    "statement": float(os.getenv("SNAPSHOT_MAX_AGE_STATEMENT", 7 * 24 * 60 * 60)),
+    "history": float(os.getenv("SNAPSHOT_MAX_AGE_HISTORY", "0")),
+}
+
+# Key added to snapshot metrics and news articles with the export time, so answers can say how old they are
+AS_OF = "asOf"
+
+STATEMENTS = ["balance_sheet", "income_stmt", "cashflow"]
+
+
+class DataUnavailable(Exception):
+    """A provider cannot answer. fallback holds stale or partial data usable as a last resort."""
+
+    def __init__(self, message: str, fallback=None):
+        super().__init__(message)
+        self.fallback = fallback
+
+
+class MarketDataProvider:
+    """Source of the market data behind the finance tools."""
+
+    name = "base"
+
+    def history(self, ticker: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        raise DataUnavailable(f"{self.name} has no price history")
+
+    def history_multi(self, tickers: list[str], start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        """Column stacked (ticker, field) frame for several tickers."""
+        return pd.concat({t: self.history(t, start, end, interval) for t in tickers}, axis=1)
+
+    def info(self, ticker: str) -> dict:
+        raise DataUnavailable(f"{self.name} has no metrics")
+
+    def news(self, ticker: str) -> list:
+        raise DataUnavailable(f"{self.name} has no news")
+
+    def statement(self, ticker: str, kind: str) -> pd.DataFrame:
+        raise DataUnavailable(f"{self.name} has no statements")
+
+    def dividends(self, ticker: str, period: str = "1mo") -> pd.Series:
+        raise DataUnavailable(f"{self.name} has no dividends")
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = "yfinance"
+
+    def history(self, ticker: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        return yf.Ticker(ticker).history(start=start, end=end, interval=interval)
+
+    def history_multi(self, tickers: list[str], start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        # One batched request for every ticker, columns are (ticker, field)
+        return yf.download(
+            tickers, start=start, end=end, interval=interval, group_by="ticker",
+            auto_adjust=True, actions=True, ignore_tz=False, progress=False, threads=True
+        )
+
+    def info(self, ticker: str) -> dict:
+        return yf.Ticker(ticker).get_info()
+
+    def news(self, ticker: str) -> list:
+        return yf.Ticker(ticker).get_news()
+
+    def statement(self, ticker: str, kind: str) -> pd.DataFrame:
+        return getattr(yf.Ticker(ticker), f"get_{kind}")()
+
+    def dividends(self, ticker: str, period: str = "1mo") -> pd.Series:
+        return yf.Ticker(ticker).get_dividends(period=period)
+
+
+class SnapshotProvider(MarketDataProvider):
+    """Read only bundle of a watchlist's data exported by export_bundle.
+
+    Layout:
+        manifest.json                 export time and what was captured per ticker
+        prices/<TICKER>_1d/           OHLCVStore series, memory mapped
+        statements/<TICKER>/<kind>.npy and .json   values memory mapped, labels in the json
+        info/<TICKER>.json, news/<TICKER>.json, dividends/<TICKER>.json
+    """
+
+    name = "snapshot"
+
+    def __init__(self, root: Path = SNAPSHOT_DIR, max_ages: dict | None = None):
+        self.root = Path(root)
+        self.max_ages = {**SNAPSHOT_MAX_AGES, **(max_ages or {})}
+        self.manifest = json.loads((self.root / "manifest.json").read_text())
+        self.exported_at = datetime.fromisoformat(self.manifest["exported_at"])
+        self.prices = OHLCVStore(self.root / "prices")
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, ticker: str, kind: str) -> dict:
+        entry = self.manifest["tickers"].get(normalize_ticker(ticker), {})
+        if kind not in entry:
+            raise DataUnavailable(f"{ticker} {kind} not in snapshot")
+        return entry
+
+    def _fresh(self, value, ticker: str, kind: str):
+        # Stale data is still handed back as a last resort fallback
+        max_age = self.max_ages["statement" if kind in STATEMENTS else kind]
+        if max_age and (datetime.now() - self.exported_at).total_seconds() > max_age:
+            raise DataUnavailable(f"{ticker} {kind} snapshot is stale", fallback=value)
+        return value
+
+    def _stamp(self, value: dict) -> dict:
+        return {**value, AS_OF: self.exported_at.isoformat(timespec="seconds")}
+
+    def _json(self, folder: str, ticker: str):
+        self._entry(ticker, folder)
+        return json.loads((self.root / folder / f"{normalize_ticker(ticker)}.json").read_text())
+
+    def history(self, ticker: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        covered_from, covered_to = map(date.fromisoformat, self._entry(ticker, "history")["history"])
+        start_date, end_date = date.fromisoformat(start), date.fromisoformat(end)
+        path = self.prices._path(ticker, interval)
+        index, values = self.prices._load(path)
+        meta = self.prices._read_meta(path)
+        frame = self.prices._slice(index, values, meta["tz"], max(start_date, covered_from), min(end_date, covered_to), None)
+        if start_date < covered_from or end_date > covered_to:
+            # Tell the store only the exported dates are known so the rest is fetched once online
+            frame.attrs["covered_to"] = covered_to.isoformat()
+            raise DataUnavailable(f"{ticker} snapshot covers {covered_from}..{covered_to}", fallback=frame)
+        return self._fresh(frame, ticker, "history")
+
+    def history_multi(self, tickers: list[str], start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        frames, covered_to = {}, []
+        for ticker in tickers:
+            try:
+                frames[ticker] = self.history(ticker, start, end, interval)
+            except DataUnavailable as e:
+                if e.fallback is None:
+                    raise
+                frames[ticker] = e.fallback
+                covered_to.append(e.fallback.attrs["covered_to"])
+        frame = pd.concat(frames, axis=1)
+        if covered_to:
+            frame.attrs["covered_to"] = min(covered_to)
+            raise DataUnavailable("snapshot does not cover the full range", fallback=frame)
+        return frame
+
+    def info(self, ticker: str) -> dict:
+        return self._fresh(self._stamp(self._json("info", ticker)), ticker, "info")
+
+    def news(self, ticker: str) -> list:
+        return self._fresh([self._stamp(article) for article in self._json("news", ticker)], ticker, "news")
+
+    def statement(self, ticker: str, kind: str) -> pd.DataFrame:
+        self._entry(ticker, kind)
+        key = (normalize_ticker(ticker), kind)
+        with self._lock:
+            frame = self._statements.get(key)
+            if frame is None:
+                path = self.root / "statements" / key[0]
+                labels = json.loads((path / f"{kind}.json").read_text())
+                # Views into the memory mapped values, no copy
+                values = np.load(path / f"{kind}.npy", mmap_mode="r")
+                frame = pd.DataFrame(values, index=labels["index"], columns=pd.to_datetime(labels["columns"]), copy=False)
+                self._statements[key] = frame
+        return self._fresh(frame, ticker, kind)
+
+    def dividends(self, ticker: str, period: str = "1mo") -> pd.Series:
+        records = self._json("dividends", ticker)
+        series = pd.Series(records["values"], index=pd.to_datetime(records["index"], utc=True).tz_convert(records["tz"]),
+                           name="Dividends", dtype=float)
+        if period != "max":
+            start_date, _, _ = resolve_range(period)
+            series = series[series.index.date >= start_date]
+        return self._fresh(series, ticker, "dividends")
+
+
+class ChainedProvider(MarketDataProvider):
+    """Tries each provider in order, keeping the first stale or partial answer as a last resort."""
+
+    name = "chained"
+
+    def __init__(self, providers: list[MarketDataProvider]):
+        self.providers = providers
+        self.hits = {p.name: 0 for p in providers}
+        self.fallbacks = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def replace(self, providers: list[MarketDataProvider]):
+        """Swap the chain in place, modules hold on to this provider rather than looking it up."""
+        with self._lock:
+            self.providers = providers
+            self.hits = {p.name: 0 for p in providers}
+
+    def _call(self, method: str, *args):
+        fallback, error = None, None
+        for provider in self.providers:
+            try:
+                value = getattr(provider, method)(*args)
+            except DataUnavailable as e:
+                if fallback is None:
+                    fallback = e.fallback
+                error = error or e
+                continue
+            except Exception as e:
+                # Network and upstream failures move on to the next provider
+                with self._lock:
+                    self.errors += 1
+                error = e
+                continue
+            with self._lock:
+                self.hits[provider.name] += 1
+            return value
+
+        if fallback is not None:
+            with self._lock:
+                self.fallbacks += 1
+            return fallback
+        raise error or DataUnavailable("no market data provider configured")
+
+    def history(self, ticker, start, end, interval="1d"):
+        return self._call("history", ticker, start, end, interval)
+
+    def history_multi(self, tickers, start, end, interval="1d"):
+        return self._call("history_multi", tickers, start, end, interval)
+
+    def info(self, ticker):
+        return self._call("info", ticker)
+
+    def news(self, ticker):
+        return self._call("news", ticker)
+
+    def statement(self, ticker, kind):
+        return self._call("statement", ticker, kind)
+
+    def dividends(self, ticker, period="1mo"):
+        return self._call("dividends", ticker, period)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "providers": [p.name for p in self.providers],
+                "hits": dict(self.hits),
+                "fallbacks": self.fallbacks,
+                "errors": self.errors
+            }
+
+
+def build_provider(names: str = MARKET_DATA_PROVIDERS, snapshot_dir: Path = SNAPSHOT_DIR) -> ChainedProvider:
+    providers = []
+    for name in [n.strip() for n in names.split(",") if n.strip()]:
+        if name == "snapshot":
+            if (Path(snapshot_dir) / "manifest.json").exists():
+                providers.append(SnapshotProvider(snapshot_dir))
+        elif name == "yfinance":
+            providers.append(YFinanceProvider())
+        else:
+            raise ValueError(f"Unknown market data provider: {name}")
+    return ChainedProvider(providers)
+
+
+def export_bundle(tickers: list[str], dest: Path, source: MarketDataProvider = None, period: str = "5y",
+                  archive: bool = False) -> Path:
+    """Capture prices, statements, metrics, news and dividends for a watchlist into a bundle.
+
+    Returns:
+        Path: the bundle directory, or the .tar.gz next to it when archive is set
+    """
+    source = source or YFinanceProvider()
+    dest = Path(dest)
+    start, end, _ = resolve_range(period)
+    prices = OHLCVStore(dest / "prices")
+    manifest = {"exported_at": datetime.now().isoformat(timespec="seconds"), "period": period, "tickers": {}}
+
+    for ticker in dict.fromkeys(normalize_ticker(t) for t in tickers):
+        entry = {}
+        try:
+            history = source.history(ticker, start.isoformat(), end.isoformat())
+            path = prices._path(ticker, "1d")
+            path.mkdir(parents=True, exist_ok=True)
+            with _lock_for(path):
+                meta = prices._read_meta(path)
+                prices._record(path, meta, history, start, end)
+                prices._write_meta(path, meta)
+            # Today's bar is still moving, only completed days count as covered
+            entry["history"] = [start.isoformat(), min(end, date.today()).isoformat()]
+        except Exception as e:
+            print(f"Skipping {ticker} history: {e}")
+
+        for kind in STATEMENTS:
+            try:
+                frame = source.statement(ticker, kind)
+                path = dest / "statements" / ticker
+                path.mkdir(parents=True, exist_ok=True)
+                np.save(path / f"{kind}.npy", frame.to_numpy(dtype=np.float64, na_value=np.nan))
+                (path / f"{kind}.json").write_text(json.dumps({
+                    "index": [str(i) for i in frame.index],
+                    "columns": [pd.Timestamp(c).isoformat() for c in frame.columns]
+                }))
+                entry[kind] = True
+            except Exception as e:
+                print(f"Skipping {ticker} {kind}: {e}")
+
+        for kind, fetch in (("info", source.info), ("news", source.news),
+                            ("dividends", lambda t: source.dividends(t, "max"))):
+            try:
+                value = fetch(ticker)
+                if kind == "dividends":
+                    tz = str(value.index.tz) if value.index.tz is not None else "UTC"
+                    value = {"tz": tz, "index": [t.isoformat() for t in value.index], "values": value.tolist()}
+                (dest / kind).mkdir(parents=True, exist_ok=True)
+                (dest / kind / f"{ticker}.json").write_text(json.dumps(value, default=str))
+                entry[kind] = True
+            except Exception as e:
+                print(f"Skipping {ticker} {kind}: {e}")
+
+        manifest["tickers"][ticker] = entry
+
+    (dest / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    if archive:
+        return Path(shutil.make_archive(str(dest), "gztar", root_dir=dest))
+    return dest
+
+
+def import_bundle(source: Path, dest: Path = SNAPSHOT_DIR) -> dict:
+    """Install a bundle directory or archive as the local snapshot, replacing any previous one."""
+    source, dest = Path(source), Path(dest)
+    staging = dest.with_name(dest.name + ".importing")
+    shutil.rmtree(staging, ignore_errors=True)
+    if source.is_dir():
+        shutil.copytree(source, staging)
+    else:
+        shutil.unpack_archive(str(source), staging)
+    if not (staging / "manifest.json").exists():
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ValueError(f"{source} is not a snapshot bundle, manifest.json missing")
+
+    # Swap in whole so readers never see a half written bundle
+    shutil.rmtree(dest, ignore_errors=True)
+    os.replace(staging, dest)
+    return json.loads((dest / "manifest.json").read_text())
+
+
+provider = build_provider()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import offline market data bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Capture a watchlist from yfinance")
+    export_parser.add_argument("tickers", nargs="+")
+    export_parser.add_argument("--out", type=Path, required=True, help="Bundle directory, archived to <out>.tar.gz")
+    export_parser.add_argument("--period", default="5y")
+    import_parser = commands.add_parser("import", help="Install a bundle as the local snapshot")
+    import_parser.add_argument("bundle", type=Path)
+    import_parser.add_argument("--dest", type=Path, default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(export_bundle(args.tickers, args.out, period=args.period, archive=True))
+    else:
+        manifest = import_bundle(args.bundle, args.dest)
+        print(f"Imported {len(manifest['tickers'])} tickers exported at {manifest['exported_at']}")
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# name: (numerator line items, denominator line items, scale)
+# A leading "-" subtracts the item, an empty denominator reports the numerator as is
+RATIOS = {
+    # Liquidity
+    "current_ratio": (["CurrentAssets"], ["CurrentLiabilities"], 1),
+    "quick_ratio": (["CurrentAssets", "-Inventory"], ["CurrentLiabilities"], 1),
+    "cash_ratio": (["CashAndCashEquivalents"], ["CurrentLiabilities"], 1),
+    "working_capital": (["CurrentAssets", "-CurrentLiabilities"], [], 1),
+    # Leverage
+    "debt_to_equity": (["TotalDebt"], ["StockholdersEquity"], 1),
+    "debt_to_assets": (["TotalDebt"], ["TotalAssets"], 1),
+    "equity_ratio": (["StockholdersEquity"], ["TotalAssets"], 1),
+    "net_debt": (["TotalDebt", "-CashAndCashEquivalents"], [], 1),
+    "interest_coverage": (["EBIT"], ["InterestExpense"], 1),
+    # Margins, in percent
+    "gross_margin": (["GrossProfit"], ["TotalRevenue"], 100),
+    "operating_margin": (["OperatingIncome"], ["TotalRevenue"], 100),
+    "ebitda_margin": (["EBITDA"], ["TotalRevenue"], 100),
+    "net_margin": (["NetIncome"], ["TotalRevenue"], 100),
+    "fcf_margin": (["FreeCashFlow"], ["TotalRevenue"], 100),
+    # Returns, in percent
+    "return_on_equity": (["NetIncome"], ["StockholdersEquity"], 100),
+    "return_on_assets": (["NetIncome"], ["TotalAssets"], 100),
+    # Cash flow
+    "free_cash_flow": (["FreeCashFlow"], [], 1),
+    "capital_expenditure": (["CapitalExpenditure"], [], 1),
+    "cash_conversion": (["OperatingCashFlow"], ["NetIncome"], 1),
+    "capex_to_revenue": (["CapitalExpenditure"], ["TotalRevenue"], -100),
+}
+
+PERCENT_RATIOS = {name for name, (_, _, scale) in RATIOS.items() if abs(scale) == 100}
+
+
+def coefficients(terms: list[str], items: list[str]) -> np.ndarray:
+    row = np.zeros(len(items))
+    for term in terms:
+        sign = -1.0 if term.startswith("-") else 1.0
+        row[items.index(term.lstrip("-"))] += sign
+    return row
+
+
+def build_matrices(catalog: dict = RATIOS) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Catalog as numerator/denominator coefficient matrices over the line items it uses.
+
+    Returns:
+        tuple: (line items, numerator matrix, denominator matrix, scale vector)
+    """
+    items = sorted({t.lstrip("-") for num, den, _ in catalog.values() for t in num + den})
+    numerators = np.array([coefficients(num, items) for num, _, _ in catalog.values()])
+    denominators = np.array([coefficients(den, items) for _, den, _ in catalog.values()])
+    scales = np.array([scale for _, _, scale in catalog.values()], dtype=float)
+    return items, numerators, denominators, scales
+
+
+ITEMS, NUMERATORS, DENOMINATORS, SCALES = build_matrices()
+
+
+def compute_ratios(*statements: pd.DataFrame) -> pd.DataFrame:
+    """Every ratio in the catalog for every reported period, as ratios x report dates.
+
+    Statements are line items x report dates frames as returned by yfinance. They are
+    aligned on report date and the whole catalog is evaluated in two matrix products.
+    """
+    frames = [s for s in statements if s is not None and not s.empty]
+    if not frames:
+        return pd.DataFrame(index=list(RATIOS))
+
+    # First statement wins when a line item appears in more than one
+    combined = pd.concat(frames)
+    combined = combined[~combined.index.duplicated()]
+    dates = sorted(set().union(*(f.columns for f in frames)), reverse=True)
+    values = combined.reindex(index=ITEMS, columns=dates).to_numpy(dtype=np.float64, na_value=np.nan)
+
+    missing = np.isnan(values)
+    values = np.where(missing, 0.0, values)
+    numerator = NUMERATORS @ values
+    denominator = np.where(np.abs(DENOMINATORS).sum(axis=1, keepdims=True) > 0, DENOMINATORS @ values, 1.0)
+
+    # A ratio is only defined where every item it uses was reported
+    uses = (NUMERATORS != 0) | (DENOMINATORS != 0)
+    undefined = (uses.astype(int) @ missing.astype(int)) > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = numerator / denominator * SCALES[:, None]
+    ratios[undefined | ~np.isfinite(ratios)] = np.nan
+
+    return pd.DataFrame(ratios, index=list(RATIOS), columns=dates)
+
+
+def select(ratios: pd.DataFrame, names: list[str] | None = None, year: int | None = None) -> pd.DataFrame:
+    """Narrow the ratios frame to the requested ratios and fiscal year (latest report in that year)."""
+    if names:
+        unknown = [n for n in names if n not in RATIOS]
+        if unknown:
+            raise ValueError(f"Unknown ratios {unknown}, valid ratios: {', '.join(RATIOS)}")
+        ratios = ratios.loc[names]
+    if year is not None:
+        in_year = [c for c in ratios.columns if c.year == int(year)]
+        if not in_year:
+            raise ValueError(f"No report for {year}, reported periods: {', '.join(str(c.date()) for c in ratios.columns)}")
+        ratios = ratios[[max(in_year)]]
+    return ratios.dropna(how="all")
+
+
+def label(name: str) -> str:
+    return f"{name} (%)" if name in PERCENT_RATIOS else name
@@ -0,0 +1,133 @@
+import os
+import threading
+from collections import OrderedDict
+
+import ollama
+from langchain_ollama import ChatOllama
+
+# How long Ollama keeps a model resident after its last request
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Maximum number of (tool_model, chat_model, tools, options) entries kept built, one per tool subset in use
+MAX_ENTRIES = int(os.getenv("MODEL_REGISTRY_SIZE", "32"))
+
+# Model pairs warmed at startup e.g. "granite4:350m|granite4:1b,granite4:1b|granite4:1b"
+WARM_MODEL_PAIRS = os.getenv("WARM_MODEL_PAIRS", "granite4:350m|granite4:1b")
+
+
+def build_models(tool_model: str, chat_model: str, tools: list, options: dict) -> dict:
+    model_dict = {}
+
+    model_dict["tool_model"] = ChatOllama(
+        model=tool_model,
+        temperature=0.0,
+        keep_alive=KEEP_ALIVE,
+        **options
+    ).bind_tools(tools)
+    model_dict["tool_model_name"] = tool_model
+
+    model_dict["chat_model"] = ChatOllama(
+        model=chat_model,
+        temperature=0.5,
+        keep_alive=KEEP_ALIVE,
+        **options
+    )
+
+    return model_dict
+
+
+class ModelRegistry:
+    """LRU cache of bound model clients keyed by (tool_model, chat_model, tool set, options)."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(tool_model: str, chat_model: str, tools: list, options: dict) -> tuple:
+        tool_names = tuple(sorted(t.name for t in tools))
+        return (tool_model, chat_model, tool_names, tuple(sorted(options.items())))
+
+    def get(self, tool_model: str, chat_model: str, tools: list, options: dict | None = None) -> dict:
+        options = options or {}
+        key = self.make_key(tool_model, chat_model, tools, options)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Build outside the lock, tool schema serialisation is the slow part
+        model_dict = build_models(tool_model, chat_model, tools, options)
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = model_dict
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "keys": [
+                    {"tool_model": k[0], "chat_model": k[1], "tools": list(k[2]), "options": dict(k[3])}
+                    for k in self._entries
+                ]
+            }
+
+
+registry = ModelRegistry()
+
+
+def parse_model_pairs(value: str) -> list[tuple[str, str]]:
+    pairs = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        tool_model, _, chat_model = item.partition("|")
+        pairs.append((tool_model.strip(), (chat_model or tool_model).strip()))
+    return pairs
+
+
+def preload_model(model: str):
+    # A generate request without a prompt makes Ollama load the model and keep it resident
+    ollama.Client().generate(model=model, keep_alive=KEEP_ALIVE)
+
+
+def warm_models(pairs: list[tuple[str, str]], tool_sets: list[list], options: dict | None = None) -> dict:
+    """Build an entry per pair and tool set requests will bind, and preload each model in Ollama."""
+    status = {}
+    for tool_model, chat_model in pairs:
+        for tools in tool_sets:
+            registry.get(tool_model, chat_model, tools, options)
+        for model in (tool_model, chat_model):
+            if model in status:
+                continue
+            try:
+                preload_model(model)
+                status[model] = "loaded"
+            except Exception as e:
+                status[model] = f"error: {e}"
+                print(f"Error preloading model {model}: {e}")
+    return status
@@ -0,0 +1,331 @@
+import os
+import re
+import json
+import time
+import threading
+from pathlib import Path
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from ChatApi.data_cache import TTLS, normalize_ticker, touch
+
+STORE_DIR = Path(os.getenv("OHLCV_STORE_DIR", Path.home() / ".ondeviceagent" / "ohlcv"))
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+# Completed days never change, answers read only from them are still bounded so a corrected bar
+# upstream is eventually picked up
+HISTORICAL_TTL = float(os.getenv("OHLCV_HISTORICAL_TTL", 7 * 24 * 60 * 60))
+
+# Earliest date requested for period="max"
+MAX_START = date(1970, 1, 1)
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _lock_for(path: Path) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault(str(path), threading.Lock())
+
+
+def add_period(start: date, period: str) -> date:
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Invalid period: {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        return start + timedelta(days=n)
+    if unit == "wk":
+        return start + timedelta(weeks=n)
+    months = n if unit == "mo" else n * 12
+    return (pd.Timestamp(start) + pd.DateOffset(months=months)).date()
+
+
+def sub_period(end: date, period: str) -> date:
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Invalid period: {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit in ("d", "wk"):
+        return end - (add_period(end, period) - end)
+    months = n if unit == "mo" else n * 12
+    return (pd.Timestamp(end) - pd.DateOffset(months=months)).date()
+
+
+def resolve_range(period: str = "1d", start: str = None, today: date = None) -> tuple[date, date, int | None]:
+    """Turn yfinance style period/start arguments into a [start, end) date range.
+
+    Returns:
+        tuple: (start, end, tail_rows) where tail_rows limits the result to the last N
+        trading rows for day periods without a start, matching yfinance semantics.
+    """
+    today = today or date.today()
+    period = (period or "1d").strip().lower()
+
+    if start:
+        start_date = date.fromisoformat(start)
+        if period in ("max", "ytd"):
+            return start_date, today + timedelta(days=1), None
+        return start_date, min(add_period(start_date, period), today + timedelta(days=1)), None
+
+    end = today + timedelta(days=1)
+    if period == "max":
+        return MAX_START, end, None
+    if period == "ytd":
+        return date(today.year, 1, 1), end, None
+    if period.endswith("d") and period[:-1].isdigit():
+        # Day periods count trading sessions, over-fetch calendar days and keep the tail
+        n = int(period[:-1])
+        return today - timedelta(days=n * 2 + 7), end, n
+    return sub_period(today, period), end, None
+
+
+def missing_ranges(coverage: list, start: date, end: date) -> list[tuple[date, date]]:
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in sorted(coverage):
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def merge_ranges(coverage: list) -> list:
+    merged = []
+    for s, e in sorted(coverage):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
+class OHLCVStore:
+    """Per ticker/interval price history held as memory mapped numpy arrays.
+
+    Each series lives in its own directory with:
+        index.npy   int64 UTC nanosecond timestamps, sorted
+        values.npy  float64 matrix, one column per entry in COLUMNS
+        meta.json   timezone and the date ranges already fetched from upstream
+    """
+
+    def __init__(self, root: Path = STORE_DIR, live_ttl: float = TTLS["history"], historical_ttl: float = HISTORICAL_TTL):
+        self.root = Path(root)
+        self.live_ttl = live_ttl
+        self.historical_ttl = historical_ttl
+        self.upstream_fetches = 0
+        self.upstream_errors = 0
+        self.queries = 0
+        self.served_from_disk = 0
+
+    def _path(self, ticker: str, interval: str) -> Path:
+        return self.root / f"{normalize_ticker(ticker)}_{interval}"
+
+    def _read_meta(self, path: Path) -> dict:
+        meta_file = path / "meta.json"
+        if not meta_file.exists():
+            return {"tz": None, "coverage": [], "live_fetched_at": 0.0}
+        meta = json.loads(meta_file.read_text())
+        meta["coverage"] = [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in meta["coverage"]]
+        return meta
+
+    def _write_meta(self, path: Path, meta: dict):
+        out = dict(meta)
+        out["coverage"] = [[s.isoformat(), e.isoformat()] for s, e in meta["coverage"]]
+        tmp = path / "meta.json.tmp"
+        tmp.write_text(json.dumps(out))
+        os.replace(tmp, path / "meta.json")
+
+    def _load(self, path: Path) -> tuple[np.ndarray, np.ndarray]:
+        if not (path / "index.npy").exists():
+            return np.empty(0, dtype=np.int64), np.empty((0, len(COLUMNS)), dtype=np.float64)
+        return np.load(path / "index.npy", mmap_mode="r"), np.load(path / "values.npy", mmap_mode="r")
+
+    def _append(self, path: Path, frame: pd.DataFrame):
+        if frame.empty:
+            return
+        # asi8 is UTC nanoseconds for tz aware indexes, naive indexes are treated as UTC
+        new_index = frame.index.as_unit("ns").asi8
+        new_values = frame.reindex(columns=COLUMNS).to_numpy(dtype=np.float64, na_value=np.nan)
+
+        index, values = self._load(path)
+        index = np.concatenate([np.asarray(index), new_index])
+        values = np.concatenate([np.asarray(values), new_values])
+
+        # Newer rows win on duplicate timestamps
+        order = np.argsort(index, kind="stable")
+        index, values = index[order], values[order]
+        keep = np.append(index[1:] != index[:-1], True)
+        index, values = index[keep], values[keep]
+
+        for name, array in (("index", index), ("values", values)):
+            tmp = path / f"{name}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, path / f"{name}.npy")
+
+    def get(self, ticker: str, period: str = "1d", start: str = None, interval: str = "1d", fetch=None) -> pd.DataFrame:
+        """Return history for the range, fetching only the dates not already on disk.
+
+        Args:
+            fetch: callable(ticker, start, end, interval) -> DataFrame for the upstream source.
+        """
+        start_date, end_date, tail_rows = resolve_range(period, start)
+        path = self._path(ticker, interval)
+        self.queries += 1
+
+        with _lock_for(path):
+            path.mkdir(parents=True, exist_ok=True)
+            meta = self._read_meta(path)
+
+            gaps = self._gaps(meta, start_date, end_date) if fetch else []
+            for gap_start, gap_end in gaps:
+                try:
+                    frame = fetch(normalize_ticker(ticker), gap_start.isoformat(), gap_end.isoformat(), interval)
+                except Exception as e:
+                    # Serve whatever is already held when upstream is unreachable
+                    self.upstream_errors += 1
+                    print(f"Error fetching history for {ticker} {gap_start}..{gap_end}: {e}")
+                    continue
+                self.upstream_fetches += 1
+                if not self._record(path, meta, frame, gap_start, gap_end):
+                    self.upstream_errors += 1
+            if gaps:
+                self._write_meta(path, meta)
+            else:
+                self.served_from_disk += 1
+
+            index, values = self._load(path)
+
+        self._touch(meta, start_date, end_date)
+        return self._slice(index, values, meta["tz"], start_date, end_date, tail_rows)
+
+    def get_many(self, tickers: list[str], period: str = "1d", start: str = None, interval: str = "1d",
+                 fetch_many=None) -> dict[str, pd.DataFrame]:
+        """Return history for several tickers, with one upstream request per distinct missing range.
+
+        Args:
+            fetch_many: callable(tickers, start, end, interval) -> DataFrame with a (ticker, column)
+                column MultiIndex, as returned by yf.download(group_by="ticker").
+        """
+        start_date, end_date, tail_rows = resolve_range(period, start)
+        tickers = list(dict.fromkeys(normalize_ticker(t) for t in tickers))
+
+        # Tickers missing the same range share one request
+        wanted = {}
+        for ticker in tickers:
+            with _lock_for(self._path(ticker, interval)):
+                meta = self._read_meta(self._path(ticker, interval))
+            for gap in (self._gaps(meta, start_date, end_date) if fetch_many else []):
+                wanted.setdefault(gap, []).append(ticker)
+
+        for (gap_start, gap_end), group in wanted.items():
+            try:
+                frame = fetch_many(group, gap_start.isoformat(), gap_end.isoformat(), interval)
+            except Exception as e:
+                self.upstream_errors += 1
+                print(f"Error fetching history for {','.join(group)} {gap_start}..{gap_end}: {e}")
+                continue
+            self.upstream_fetches += 1
+            for ticker in group:
+                path = self._path(ticker, interval)
+                if not isinstance(frame.columns, pd.MultiIndex):
+                    ticker_frame = frame
+                elif ticker in frame.columns.get_level_values(0):
+                    ticker_frame = frame[ticker]
+                else:
+                    ticker_frame = pd.DataFrame(columns=COLUMNS)
+                # The batch is aligned on the union of trading days, drop the ones this ticker did not trade.
+                # A ticker that failed inside the batch comes back all NaN and ends up empty here
+                ticker_frame = ticker_frame.dropna(how="all")
+                ticker_frame.attrs.update(frame.attrs)
+                with _lock_for(path):
+                    path.mkdir(parents=True, exist_ok=True)
+                    meta = self._read_meta(path)
+                    if self._record(path, meta, ticker_frame, gap_start, gap_end):
+                        self._write_meta(path, meta)
+                    else:
+                        self.upstream_errors += 1
+                        print(f"No history for {ticker} {gap_start}..{gap_end} in the batch, not marked as fetched")
+
+        out = {}
+        for ticker in tickers:
+            path = self._path(ticker, interval)
+            self.queries += 1
+            with _lock_for(path):
+                meta = self._read_meta(path)
+                index, values = self._load(path)
+            self._touch(meta, start_date, end_date)
+            out[ticker] = self._slice(index, values, meta["tz"], start_date, end_date, tail_rows)
+        return out
+
+    def _gaps(self, meta: dict, start_date: date, end_date: date) -> list[tuple[date, date]]:
+        # Completed days are immutable, today's bar is only trusted for live_ttl seconds
+        today = date.today()
+        coverage = list(meta["coverage"])
+        if time.time() - meta.get("live_fetched_at", 0.0) < self.live_ttl:
+            coverage.append((today, today + timedelta(days=1)))
+        return missing_ranges(coverage, start_date, end_date)
+
+    def _touch(self, meta: dict, start_date: date, end_date: date):
+        # A range reaching today is as fresh as the last fetch of today's bar, a range of completed
+        # days held in full lasts historical_ttl, one with dates still missing is not vouched for
+        if end_date > date.today():
+            touch(time.monotonic() + meta.get("live_fetched_at", 0.0) + self.live_ttl - time.time())
+        elif not missing_ranges(meta["coverage"], start_date, end_date):
+            touch(time.monotonic() + self.historical_ttl)
+
+    def _record(self, path: Path, meta: dict, frame: pd.DataFrame, gap_start: date, gap_end: date) -> bool:
+        """Store the fetched rows and mark the gap covered, False when the frame cannot be trusted.
+
+        No rows for a range with completed weekdays in it is a failed fetch rather than a
+        quiet market, and recording it would keep those days empty for good.
+        """
+        today = date.today()
+        if frame.empty and np.busday_count(gap_start, max(gap_start, min(gap_end, today))) > 0:
+            return False
+        self._append(path, frame)
+        if meta["tz"] is None and not frame.empty and frame.index.tz is not None:
+            meta["tz"] = str(frame.index.tz)
+        # A partial answer (e.g. from an older snapshot) only covers the dates it says it does
+        if "covered_to" in frame.attrs:
+            gap_end = min(gap_end, date.fromisoformat(frame.attrs["covered_to"]))
+        meta["coverage"] = merge_ranges(meta["coverage"] + [(gap_start, min(gap_end, today))])
+        if gap_end > today:
+            meta["live_fetched_at"] = time.time()
+        return True
+
+    @staticmethod
+    def _slice(index, values, tz, start_date, end_date, tail_rows) -> pd.DataFrame:
+        tz = tz or "UTC"
+        lo_ts = pd.Timestamp(start_date, tz=tz).tz_convert("UTC").value
+        hi_ts = pd.Timestamp(end_date, tz=tz).tz_convert("UTC").value
+        lo, hi = np.searchsorted(index, [lo_ts, hi_ts])
+        if tail_rows is not None:
+            lo = max(lo, hi - tail_rows)
+
+        # Views into the memory mapped arrays, no copy of the price data
+        frame = pd.DataFrame(values[lo:hi], columns=COLUMNS, copy=False)
+        frame.index = pd.DatetimeIndex(index[lo:hi], tz="UTC").tz_convert(tz)
+        frame.index.name = "Date"
+        return frame
+
+    def stats(self) -> dict:
+        return {
+            "root": str(self.root),
+            "queries": self.queries,
+            "served_from_disk": self.served_from_disk,
+            "upstream_fetches": self.upstream_fetches,
+            "upstream_errors": self.upstream_errors
+        }
+
+
+store = OHLCVStore()
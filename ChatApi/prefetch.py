@@ -0,0 +1,82 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ChatApi.finance_tools as ft
+from ChatApi.data_cache import sizeof, make_key
+from ChatApi.symbol_index import index as symbol_index
+
+# Off by default, a request can still opt in with speculative=True
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "0") == "1"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+MAX_TICKERS = int(os.getenv("PREFETCH_MAX_TICKERS", "3"))
+
+# What gets warmed for each ticker mentioned in the prompt: the tool it serves, the arguments and the fetch
+PREFETCHES = {
+    "get_key_financial_metrics": ({}, lambda ticker: ft.fetch_info(ticker)),
+    "get_historical_data": ({"period": "1mo"}, lambda ticker, period: ft.fetch_history(ticker, period)),
+}
+
+prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+_lock = threading.Lock()
+stats = {"speculations": 0, "prefetched": 0, "hits": 0, "cancelled": 0, "wasted_bytes": 0, "errors": 0}
+
+
+class Speculation:
+    """Background fetches started from the prompt while the tool model is still deciding."""
+
+    def __init__(self, prompt: str):
+        self.futures = {}
+        for ticker in symbol_index.extract_tickers(prompt)[:MAX_TICKERS]:
+            for tool, (args, fetch) in PREFETCHES.items():
+                self.futures[make_key(tool, ticker, args)] = prefetch_executor.submit(fetch, ticker, **args)
+        with _lock:
+            stats["speculations"] += 1
+            stats["prefetched"] += len(self.futures)
+
+    def resolve(self, tool_calls: list[dict]):
+        """Match the chosen tool calls against what was prefetched and cancel the rest.
+
+        Only a call with the same arguments counts as a hit, a month of history does not
+        answer a question about a year.
+        """
+        used = set()
+        for tool_call in tool_calls:
+            ticker = str(tool_call["args"].get("ticker", ""))
+            used.add(make_key(tool_call["name"], symbol_index.resolve(ticker) or ticker, tool_call["args"]))
+
+        hits = cancelled = 0
+        for key, future in self.futures.items():
+            if key in used:
+                hits += 1
+            elif future.cancel():
+                cancelled += 1
+            else:
+                # Already running or finished, count what it pulled in for nothing
+                future.add_done_callback(_record_waste)
+        with _lock:
+            stats["hits"] += hits
+            stats["cancelled"] += cancelled
+
+
+def _record_waste(future):
+    with _lock:
+        if future.exception() is not None:
+            stats["errors"] += 1
+        else:
+            stats["wasted_bytes"] += sizeof(future.result())
+
+
+def start(prompt: str, speculative: bool | None = None) -> Speculation | None:
+    enabled = SPECULATIVE_PREFETCH if speculative is None else speculative
+    if not enabled:
+        return None
+    return Speculation(prompt)
+
+
+def summary() -> dict:
+    with _lock:
+        out = dict(stats)
+        out["hit_rate"] = stats["hits"] / stats["prefetched"] if stats["prefetched"] else 0.0
+        return out
@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ChatApi.finance_tools as ft
+from ChatApi.data_cache import cache, make_key, ttl_for, normalize_ticker
+
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "1") == "1"
+# Always kept warm, e.g. "NVDA,AAPL,MSFT", on top of the most requested tickers
+WATCHLIST = [t for t in os.getenv("REFRESH_WATCHLIST", "").upper().split(",") if t.strip()]
+TOP_N = int(os.getenv("REFRESH_TOP_N", "20"))
+MIN_HITS = float(os.getenv("REFRESH_MIN_HITS", "2"))
+INTERVAL = float(os.getenv("REFRESH_INTERVAL", "30"))
+# Refresh once this share of the TTL has passed, so hot entries rarely expire at all
+AHEAD = float(os.getenv("REFRESH_AHEAD", "0.8"))
+# Request counts are multiplied by this every cycle so tickers cool off when traffic moves on
+DECAY = float(os.getenv("REFRESH_DECAY", "0.9"))
+# Stale values older than this are not served, the request fetches instead unless upstream is down
+MAX_STALE = float(os.getenv("REFRESH_MAX_STALE", 15 * 60))
+REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", "2"))
+BREAKER_FAILURES = int(os.getenv("REFRESH_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("REFRESH_BREAKER_COOLDOWN", "60"))
+
+# What is kept warm for each hot ticker, keyed by the tool it serves
+REFRESHES = {
+    "get_key_financial_metrics": ft.fetch_info,
+    "get_latest_news": ft.fetch_news,
+}
+
+
+class CircuitBreaker:
+    """Stops calling a failing upstream for a cool down, then lets a single trial call through."""
+
+    def __init__(self, threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.trial else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial and time.monotonic() - self.opened_at >= self.cooldown:
+                self.trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.trial = False
+                self.opens += 1
+
+
+class Refresher:
+    """Keeps the most requested tickers warm off the request path.
+
+    Tool calls are counted per ticker. Every interval the watchlist and the top tickers are
+    refreshed shortly before their entries expire, and an expired entry of a hot ticker is
+    served as is while it is refetched in the background. Refreshes stop while the circuit
+    breaker is open, hot tickers then keep getting their last good value.
+    """
+
+    def __init__(self, watchlist: list[str] = WATCHLIST, top_n: int = TOP_N, interval: float = INTERVAL,
+                 breaker: CircuitBreaker | None = None):
+        self.watchlist = [normalize_ticker(t) for t in watchlist]
+        self.top_n = top_n
+        self.interval = interval
+        self.breaker = breaker or CircuitBreaker()
+        self.counts = {}
+        self.hot = set(self.watchlist)
+        self.executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="refresh")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.cycles = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.revalidated = 0
+
+    def record(self, args: dict):
+        """Count the tickers of one tool call."""
+        tickers = args.get("tickers") or [args.get("ticker")]
+        with self._lock:
+            for ticker in tickers:
+                if isinstance(ticker, str) and ticker:
+                    ticker = normalize_ticker(ticker)
+                    self.counts[ticker] = self.counts.get(ticker, 0) + 1
+
+    def update_hot(self) -> set:
+        with self._lock:
+            ranked = sorted(self.counts.items(), key=lambda item: -item[1])
+            top = [ticker for ticker, count in ranked[:self.top_n] if count >= MIN_HITS]
+            self.counts = {t: c * DECAY for t, c in self.counts.items() if c * DECAY >= 0.1}
+            self.hot = set(self.watchlist) | set(top)
+            return self.hot
+
+    def submit(self, key: tuple, job) -> bool:
+        if not self.breaker.allow():
+            with self._lock:
+                self.skipped += 1
+            return False
+        with self._lock:
+            if key in self._pending:
+                return True
+            self._pending.add(key)
+        self.executor.submit(self._run, key, job)
+        return True
+
+    def _run(self, key: tuple, job):
+        try:
+            with cache.forced():
+                job()
+        except Exception as e:
+            self.breaker.failure()
+            with self._lock:
+                self.failed += 1
+            print(f"Refresh of {key[0]} for {key[1]} failed: {e}")
+        else:
+            self.breaker.success()
+            with self._lock:
+                self.refreshed += 1
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def revalidate(self, key: tuple, ttl: float, fetch, stale_for: float) -> bool:
+        """DataCache hook, True when the stale value should be served while it is refreshed."""
+        if key[1] not in self.hot:
+            return False
+        if stale_for > MAX_STALE and self.breaker.state == "closed":
+            return False
+        self.submit(key, functools.partial(cache.get_or_fetch, key, ttl, fetch))
+        with self._lock:
+            self.revalidated += 1
+        return True
+
+    def refresh_due(self):
+        """Queue a refresh for every hot ticker entry that is missing or close to expiry."""
+        self.cycles += 1
+        for ticker in self.update_hot():
+            for tool, fetch in REFRESHES.items():
+                key = make_key(tool, ticker)
+                left = cache.ttl_left(key)
+                if left is not None and left > ttl_for(tool) * (1 - AHEAD):
+                    continue
+                self.submit(key, functools.partial(fetch, ticker))
+
+    async def run(self):
+        cache.revalidate = self.revalidate
+        try:
+            while True:
+                self.refresh_due()
+                await asyncio.sleep(self.interval)
+        finally:
+            cache.revalidate = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": REFRESH_ENABLED,
+                "hot": sorted(self.hot),
+                "cycles": self.cycles,
+                "refreshed": self.refreshed,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "revalidated": self.revalidated,
+                "pending": len(self._pending),
+                "breaker": {"state": self.breaker.state, "opens": self.breaker.opens},
+            }
+
+
+refresher = Refresher()
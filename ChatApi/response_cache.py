@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from ChatApi.data_cache import sizeof
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+# Answers that used no market data, e.g. to a greeting, have nothing to expire with
+NO_DATA_TTL = float(os.getenv("RESPONSE_CACHE_NO_DATA_TTL", 10 * 60))
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Case is kept, the symbol index treats "Apple" and "apple" differently
+    return " ".join(prompt.split()).rstrip("?.! ")
+
+
+class ResponseCache:
+    """Whole answers keyed by (prompt, tool_model, chat_model), each valid only as long as the
+    data its tool calls read.
+
+    The expiry of every data cache and OHLCV store entry a request reads is collected with
+    data_cache.tracking(), and the answer expires with the earliest of them. Answers that
+    hit a tool error or a deadline are not stored.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES, no_data_ttl: float = NO_DATA_TTL,
+                 enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.no_data_ttl = no_data_ttl
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.uncacheable = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(prompt: str, tool_model: str, chat_model: str) -> tuple:
+        return (normalize_prompt(prompt), tool_model, chat_model)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry["size"]
+
+    def get(self, prompt: str, tool_model: str, chat_model: str) -> dict | None:
+        """The cached {"response", "tool_calls"} for the prompt, None when missing or expired."""
+        key = self.make_key(prompt, tool_model, chat_model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {"response": entry["response"], "tool_calls": entry["tool_calls"]}
+
+    def put(self, prompt: str, tool_model: str, chat_model: str, response: str, tool_calls: list[dict],
+            expiries: list[float]) -> bool:
+        """Store an answer until the earliest of the expiries of the data it used.
+
+        False when there is nothing to cache, e.g. tools were called but read no data, or the
+        data was already stale.
+        """
+        if tool_calls and not expiries:
+            expires = None
+        else:
+            expires = min(expiries) if expiries else time.monotonic() + self.no_data_ttl
+        if not response or expires is None or expires <= time.monotonic():
+            with self._lock:
+                self.uncacheable += 1
+            return False
+
+        key = self.make_key(prompt, tool_model, chat_model)
+        entry = {"response": response, "tool_calls": tool_calls, "expires": expires}
+        entry["size"] = sizeof({"key": key, "response": response, "tool_calls": tool_calls})
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if entry["size"] > self.max_bytes:
+                return False
+            self._entries[key] = entry
+            self.bytes += entry["size"]
+            self.stores += 1
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def reject(self):
+        """Count an answer that was not stored because it is incomplete."""
+        with self._lock:
+            self.uncacheable += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "uncacheable": self.uncacheable,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+response_cache = ResponseCache()
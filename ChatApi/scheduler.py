@@ -0,0 +1,151 @@
+import os
+import time
+import asyncio
+import itertools
+from collections import deque
+
+MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "16"))
+MAX_ACTIVE = int(os.getenv("SCHEDULER_MAX_ACTIVE", "2"))
+PER_MODEL_LIMIT = int(os.getenv("SCHEDULER_PER_MODEL_LIMIT", "2"))
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Ticket:
+    def __init__(self, seq: int, models: tuple, priority: str, scheduler: "Scheduler"):
+        self.seq = seq
+        self.models = models
+        self.priority = priority
+        self.scheduler = scheduler
+        self.granted = asyncio.Event()
+        self.admitted_at = time.monotonic()
+        self.granted_at = None
+
+    @property
+    def sort_key(self) -> tuple:
+        return (PRIORITIES[self.priority], self.seq)
+
+    def threads(self) -> int:
+        """CPU thread budget for this request's model calls."""
+        return self.scheduler.thread_budget()
+
+
+class Scheduler:
+    """Admission control in front of the models.
+
+    Requests wait in a bounded priority queue and are granted while both the global
+    active limit and each of their models' concurrency limits have room. The cores are
+    split evenly across the active slots. The split is fixed rather than recomputed per
+    request because Ollama reloads a model whenever num_thread changes.
+    """
+
+    def __init__(self, max_queue: int = MAX_QUEUE, max_active: int = MAX_ACTIVE,
+                 per_model_limit: int = PER_MODEL_LIMIT, n_cores: int = None):
+        self.max_queue = max_queue
+        self.max_active = max_active
+        self.per_model_limit = per_model_limit
+        self.n_cores = n_cores or os.cpu_count()
+        self._seq = itertools.count()
+        self._waiting = []
+        self._active = set()
+        self._model_active = {}
+        self._moved = asyncio.Event()
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.wait_times = deque(maxlen=1000)
+        self.latencies = deque(maxlen=1000)
+
+    def thread_budget(self) -> int:
+        return max(1, self.n_cores // self.max_active)
+
+    def admit(self, models: tuple, priority: str = "normal") -> Ticket:
+        if len(self._waiting) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(f"Queue is full ({self.max_queue} waiting)")
+        ticket = Ticket(next(self._seq), tuple(dict.fromkeys(models)), priority, self)
+        self._waiting.append(ticket)
+        self._waiting.sort(key=lambda t: t.sort_key)
+        self.admitted += 1
+        self._dispatch()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        return self._waiting.index(ticket) + 1 if ticket in self._waiting else 0
+
+    def _has_room(self, ticket: Ticket) -> bool:
+        return len(self._active) < self.max_active and all(
+            self._model_active.get(m, 0) < self.per_model_limit for m in ticket.models
+        )
+
+    def _dispatch(self):
+        for ticket in list(self._waiting):
+            if self._has_room(ticket):
+                self._waiting.remove(ticket)
+                self._active.add(ticket)
+                for model in ticket.models:
+                    self._model_active[model] = self._model_active.get(model, 0) + 1
+                ticket.granted_at = time.monotonic()
+                self.wait_times.append(ticket.granted_at - ticket.admitted_at)
+                ticket.granted.set()
+        # Wake everyone still queued so they can report their new position
+        self._moved.set()
+        self._moved = asyncio.Event()
+
+    async def wait(self, ticket: Ticket):
+        """Yield the ticket's queue position each time it changes, return once granted."""
+        last = None
+        while not ticket.granted.is_set():
+            position = self.position(ticket)
+            if position != last:
+                last = position
+                yield position
+            moved = self._moved
+            granted = asyncio.ensure_future(ticket.granted.wait())
+            moved_wait = asyncio.ensure_future(moved.wait())
+            try:
+                await asyncio.wait({granted, moved_wait}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                granted.cancel()
+                moved_wait.cancel()
+
+    def release(self, ticket: Ticket):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+        elif ticket in self._active:
+            self._active.remove(ticket)
+            for model in ticket.models:
+                self._model_active[model] -= 1
+            self.completed += 1
+            self.latencies.append(time.monotonic() - ticket.admitted_at)
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "waiting": len(self._waiting),
+            "active": len(self._active),
+            "max_queue": self.max_queue,
+            "max_active": self.max_active,
+            "per_model_limit": self.per_model_limit,
+            "thread_budget": self.thread_budget(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "wait_seconds": percentiles(self.wait_times),
+            "latency_seconds": percentiles(self.latencies)
+        }
+
+
+def percentiles(samples) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+
+scheduler = Scheduler()
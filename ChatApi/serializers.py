@@ -0,0 +1,218 @@
+import os
+import math
+import time
+import numbers
+import threading
+
+import pandas as pd
+
+from ChatApi import instrumentation
+
+# Approximate prompt tokens a single tool output may use
+TOKEN_BUDGET = int(os.getenv("TOOL_TOKEN_BUDGET", "800"))
+
+# Rough characters per token for the small models we run, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def split_ratio(splits: pd.Series) -> float:
+    # Days without a split are 0 rather than 1, so only the actual splits are multiplied
+    ratios = splits[splits != 0].dropna()
+    return float(ratios.prod()) if len(ratios) else 0.0
+
+
+# How each column is combined when consecutive rows are merged to fit the budget
+AGGREGATIONS = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+    "Dividends": "sum",
+    "Stock Splits": split_ratio,
+}
+
+# Statement line items kept first when a statement has to be truncated
+KEY_LINE_ITEMS = [
+    # Income statement
+    "TotalRevenue", "CostOfRevenue", "GrossProfit", "OperatingExpense", "OperatingIncome",
+    "EBITDA", "EBIT", "InterestExpense", "PretaxIncome", "TaxProvision", "NetIncome",
+    "NetIncomeCommonStockholders", "BasicEPS", "DilutedEPS",
+    # Balance sheet
+    "TotalAssets", "CurrentAssets", "CashAndCashEquivalents", "Inventory", "AccountsReceivable",
+    "TotalLiabilitiesNetMinorityInterest", "CurrentLiabilities", "TotalDebt", "LongTermDebt",
+    "NetDebt", "StockholdersEquity", "TotalEquityGrossMinorityInterest", "WorkingCapital",
+    "RetainedEarnings", "ShareIssued",
+    # Cash flow
+    "OperatingCashFlow", "InvestingCashFlow", "FinancingCashFlow", "CapitalExpenditure",
+    "FreeCashFlow", "RepurchaseOfCapitalStock", "CashDividendsPaid",
+]
+
+_lock = threading.Lock()
+stats = {}
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def format_number(value) -> str:
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d")
+    if not isinstance(value, numbers.Real):
+        return "" if value is None else str(value)
+    if math.isnan(value):
+        return ""
+
+    magnitude = abs(value)
+    for threshold, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+        if magnitude >= threshold:
+            return f"{value / threshold:.2f}{suffix}"
+    if magnitude >= 100 or float(value).is_integer():
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return f"{value:.4g}"
+
+
+def format_label(label) -> str:
+    if isinstance(label, pd.Timestamp):
+        if label.hour or label.minute:
+            return label.strftime("%Y-%m-%d %H:%M")
+        return label.strftime("%Y-%m-%d")
+    return str(label)
+
+
+def raw_csv_size(frame) -> int:
+    # Size in bytes of the old to_csv output, extrapolated for very long frames
+    sample = frame.iloc[:2000]
+    size = len(sample.to_csv(index=True).encode())
+    if len(frame) > len(sample):
+        size = int(size * len(frame) / len(sample))
+    return size
+
+
+def record(tool: str, input_bytes: int, output: str, started: float):
+    output_bytes = len(output.encode())
+    instrumentation.observe("serialize_seconds", time.perf_counter() - started, tool=tool)
+    with _lock:
+        tool_stats = stats.setdefault(tool, {
+            "calls": 0, "input_bytes": 0, "output_bytes": 0, "input_tokens": 0, "output_tokens": 0
+        })
+        tool_stats["calls"] += 1
+        tool_stats["input_bytes"] += input_bytes
+        tool_stats["output_bytes"] += output_bytes
+        tool_stats["input_tokens"] += math.ceil(input_bytes / CHARS_PER_TOKEN)
+        tool_stats["output_tokens"] += estimate_tokens(output)
+        tool_stats["last_saved_tokens"] = math.ceil(input_bytes / CHARS_PER_TOKEN) - estimate_tokens(output)
+
+
+def summary() -> dict:
+    with _lock:
+        out = {}
+        for tool, tool_stats in stats.items():
+            out[tool] = dict(tool_stats)
+            out[tool]["saved_tokens"] = tool_stats["input_tokens"] - tool_stats["output_tokens"]
+            out[tool]["saved_tokens_per_call"] = out[tool]["saved_tokens"] / tool_stats["calls"]
+        return out
+
+
+def to_table(frame: pd.DataFrame, index_name: str) -> list[str]:
+    lines = ["|".join([index_name] + [format_label(c) for c in frame.columns])]
+    for label, row in zip(frame.index, frame.itertuples(index=False, name=None)):
+        lines.append("|".join([format_label(label)] + [format_number(v) for v in row]))
+    return lines
+
+
+def downsample(frame: pd.DataFrame, max_rows: int) -> tuple[pd.DataFrame, int]:
+    """Merge runs of consecutive rows so the frame has at most max_rows rows."""
+    if len(frame) <= max_rows:
+        return frame, 1
+    step = math.ceil(len(frame) / max_rows)
+    groups = pd.Series(range(len(frame)), index=frame.index) // step
+    aggregations = {c: AGGREGATIONS.get(c, "last") for c in frame.columns}
+    merged = frame.groupby(groups.values).agg(aggregations)
+    # Label each merged row with its first date
+    merged.index = frame.index[::step][:len(merged)]
+    return merged, step
+
+
+def downsample_header(frame: pd.DataFrame, merged: pd.DataFrame, step: int) -> str:
+    """Describe how the emitted rows were merged, with the rule each emitted column used."""
+    rules = []
+    for column in merged.columns:
+        rule = AGGREGATIONS.get(column, "last")
+        rules.append(f"{column}={'product' if rule is split_ratio else rule}")
+    return f"# each row aggregates up to {step} periods, {len(frame)} periods in {len(merged)} rows ({', '.join(rules)})"
+
+
+def compact_time_series(data, tool: str, token_budget: int = None, columns: list = None) -> str:
+    """Serialize a date indexed frame or series, merging rows to stay within the token budget."""
+    started = time.perf_counter()
+    token_budget = token_budget or TOKEN_BUDGET
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    input_bytes = raw_csv_size(frame)
+
+    if frame.empty:
+        output = "No data"
+        record(tool, input_bytes, output, started)
+        return output
+
+    columns = list(columns or [c for c in PRICE_COLUMNS if c in frame.columns] or frame.columns)
+    # Keep corporate action columns only when something actually happened
+    columns += [c for c in ("Dividends", "Stock Splits") if c in frame.columns and c not in columns and frame[c].any()]
+    frame = frame[columns]
+
+    header_tokens = estimate_tokens("|".join(["Date"] + columns))
+    row_tokens = max(
+        estimate_tokens("|".join(["2025-01-01"] + [format_number(v) for v in frame.iloc[i]])) for i in (0, -1)
+    )
+    max_rows = max(2, (token_budget - header_tokens) // row_tokens)
+
+    while True:
+        merged, step = downsample(frame, max_rows)
+        lines = to_table(merged, "Date")
+        if step > 1:
+            lines.insert(0, downsample_header(frame, merged, step))
+        output = "\n".join(lines)
+        # Aggregated rows can render wider than the estimate, shrink until it fits
+        tokens = estimate_tokens(output)
+        if tokens <= token_budget or max_rows <= 2:
+            break
+        max_rows = max(2, int(max_rows * token_budget / tokens * 0.95))
+    record(tool, input_bytes, output, started)
+    return output
+
+
+def compact_statement(frame: pd.DataFrame, tool: str, token_budget: int = None) -> str:
+    """Serialize a financial statement (line items x report dates), key line items first."""
+    started = time.perf_counter()
+    token_budget = token_budget or TOKEN_BUDGET
+    input_bytes = raw_csv_size(frame)
+
+    frame = frame.dropna(how="all")
+    if frame.empty:
+        output = "No data"
+        record(tool, input_bytes, output, started)
+        return output
+
+    # Most recent report dates first, drop dates with nothing reported
+    frame = frame.loc[:, frame.notna().any()]
+    frame = frame[sorted(frame.columns, reverse=True)]
+
+    key_rows = [r for r in KEY_LINE_ITEMS if r in frame.index]
+    other_rows = [r for r in frame.index if r not in key_rows]
+
+    lines = to_table(frame.loc[key_rows + other_rows], "Item")
+    used = estimate_tokens(lines[0])
+    kept = [lines[0]]
+    for line in lines[1:]:
+        used += estimate_tokens(line) + 1
+        if used > token_budget:
+            kept.append(f"# {len(lines) - len(kept)} more line items omitted")
+            break
+        kept.append(line)
+
+    output = "\n".join(kept)
+    record(tool, input_bytes, output, started)
+    return output
@@ -0,0 +1,207 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from ChatApi.serializers import estimate_tokens
+
+# Sessions idle this long are dropped
+SESSION_TTL = float(os.getenv("SESSION_TTL", 30 * 60))
+MAX_SESSIONS = int(os.getenv("SESSION_MAX", "256"))
+# History kept per session in estimated tokens, system prompt included
+TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "2000"))
+# Compaction goes down to this share of the budget, so the turns after it only append
+COMPACT_TO = float(os.getenv("SESSION_COMPACT_TO", "0.6"))
+# Tool outputs of this many latest turns are kept whole, older ones are shortened
+KEEP_TOOL_TURNS = int(os.getenv("SESSION_KEEP_TOOL_TURNS", "1"))
+SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "300"))
+
+SUMMARY_MARK = "[Shortened earlier tool output, call the tool again for the full data]\n"
+# Role and separator tokens the chat template adds around every message
+MESSAGE_OVERHEAD = 4
+
+_lock = threading.Lock()
+stats = {"created": 0, "turns": 0, "expired": 0, "evicted": 0, "compactions": 0, "shortened": 0, "dropped_turns": 0}
+
+
+class SessionNotFound(KeyError):
+    pass
+
+
+class SessionBusy(Exception):
+    pass
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def shorten(message: dict) -> dict:
+    """The first lines of a tool output, up to SUMMARY_CHARS."""
+    kept, size = [], 0
+    for line in message["content"].splitlines():
+        if size + len(line) > SUMMARY_CHARS and kept:
+            break
+        kept.append(line[:SUMMARY_CHARS])
+        size += len(line) + 1
+    return {**message, "content": SUMMARY_MARK + "\n".join(kept)}
+
+
+class Session:
+    """One conversation's history, kept in turns of [user, tool outputs..., assistant].
+
+    Each turn's chat is the history so far plus the new user message, so between
+    compactions the prompt of a follow-up starts with exactly the previous prompt and its
+    answer, and the model backend only has to prefill the new turn. Once the history goes
+    over the token budget, tool outputs of older turns are shortened and then the oldest
+    turns dropped, down to COMPACT_TO of the budget so this happens only every few turns.
+    """
+
+    def __init__(self, session_id: str, system: list[dict], token_budget: int = TOKEN_BUDGET):
+        self.id = session_id
+        self.system = system
+        self.token_budget = token_budget
+        self.turns = []
+        self.tokens = sum(message_tokens(m) for m in system)
+        self.created_at = self.last_used = time.monotonic()
+        # Turns of one session run one after another, a follow-up waits for the answer before it
+        self.lock = asyncio.Lock()
+        # Set while the API serves a turn, from before it takes a scheduler slot until the response ends
+        self.claimed = False
+
+    @property
+    def busy(self) -> bool:
+        return self.claimed or self.lock.locked()
+
+    def claim(self):
+        """Reserve the session for one request's turn, SessionBusy while another one has it.
+
+        Taken before the request queues for a model slot, so a second turn sent before the
+        first is answered is turned away instead of holding a slot while it waits.
+        """
+        if self.busy:
+            raise SessionBusy(f"Session {self.id} is still answering the previous prompt")
+        self.claimed = True
+
+    def release(self):
+        self.claimed = False
+
+    def history(self) -> list[dict]:
+        return self.system + [message for turn in self.turns for message in turn]
+
+    def chat(self, prompt: str) -> list[dict]:
+        return self.history() + [{"role": "user", "content": prompt}]
+
+    def commit(self, chat: list[dict], response: str):
+        """Record a finished turn, chat being what chat() returned with the tool outputs added."""
+        turn = chat[len(self.history()):] + [{"role": "assistant", "content": response}]
+        self.turns.append(turn)
+        self.tokens += sum(message_tokens(m) for m in turn)
+        self.last_used = time.monotonic()
+        with _lock:
+            stats["turns"] += 1
+        if self.tokens > self.token_budget:
+            self.compact()
+
+    def compact(self):
+        target = self.token_budget * COMPACT_TO
+        shortened = dropped = 0
+        for turn in self.turns[:max(0, len(self.turns) - KEEP_TOOL_TURNS)]:
+            if self.tokens <= target:
+                break
+            for i, message in enumerate(turn):
+                if message["role"] == "tool" and not message["content"].startswith(SUMMARY_MARK):
+                    turn[i] = shorten(message)
+                    self.tokens += message_tokens(turn[i]) - message_tokens(message)
+                    shortened += 1
+        # The latest turn always stays, a follow-up is most likely about it
+        while self.tokens > target and len(self.turns) > 1:
+            self.tokens -= sum(message_tokens(m) for m in self.turns.pop(0))
+            dropped += 1
+        with _lock:
+            stats["compactions"] += 1
+            stats["shortened"] += shortened
+            stats["dropped_turns"] += dropped
+
+    def summary(self) -> dict:
+        return {
+            "session_id": self.id,
+            "turns": len(self.turns),
+            "tokens": self.tokens,
+            "token_budget": self.token_budget,
+            "idle_seconds": round(time.monotonic() - self.last_used, 3),
+        }
+
+
+class SessionStore:
+    """Live sessions, bounded in number and dropped once idle for the TTL."""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS,
+                 token_budget: int = TOKEN_BUDGET):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.ttl and not session.busy:
+                del self._sessions[session_id]
+                stats["expired"] += 1
+
+    def create(self, system: list[dict]) -> Session:
+        session = Session(uuid.uuid4().hex, system, self.token_budget)
+        with self._lock, _lock:
+            self._expire()
+            # Least recently used first, sessions in the middle of a turn are kept
+            for session_id in list(self._sessions):
+                if len(self._sessions) < self.max_sessions:
+                    break
+                if not self._sessions[session_id].busy:
+                    del self._sessions[session_id]
+                    stats["evicted"] += 1
+            self._sessions[session.id] = session
+            stats["created"] += 1
+        return session
+
+    def get(self, session_id: str) -> Session:
+        with self._lock, _lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionNotFound(session_id)
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            return session
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                raise SessionNotFound(session_id)
+
+    def stats(self) -> dict:
+        with self._lock, _lock:
+            tokens = [s.tokens for s in self._sessions.values()]
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "tokens": sum(tokens),
+                "max_tokens": max(tokens, default=0),
+                **stats,
+            }
+
+
+@asynccontextmanager
+async def turn(session: Session, prompt: str):
+    """The chat for the session's next turn, held until the turn is over."""
+    async with session.lock:
+        yield session.chat(prompt)
+        session.last_used = time.monotonic()
+
+
+session_store = SessionStore()
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import contextvars
+
+from starlette.responses import StreamingResponse
+
+# Text chunks are held at most this long before going out together, 0 sends every chunk as it comes
+FLUSH_MS = float(os.getenv("SSE_FLUSH_MS", "50"))
+# Buffered text is sent early once it reaches this many characters
+FLUSH_CHARS = int(os.getenv("SSE_FLUSH_CHARS", "256"))
+# A comment frame goes out after this many idle seconds so proxies keep the connection open
+KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+DISCONNECT_POLL = float(os.getenv("SSE_DISCONNECT_POLL", "0.25"))
+
+KEEPALIVE_FRAME = ": keep-alive\n\n"
+HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Closing tasks still running, referenced so they are not garbage collected mid way
+_closing = set()
+
+_lock = threading.Lock()
+stats = {"streams": 0, "frames": 0, "text_chunks": 0, "text_frames": 0, "keepalives": 0, "disconnects": 0}
+
+
+def frame(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+class FlushPolicy:
+    """When buffered text goes out: the first chunk at once so time to first token is not
+    delayed, then whatever arrived within window_ms, or earlier once max_chars is reached."""
+
+    def __init__(self, window_ms: float = FLUSH_MS, max_chars: int = FLUSH_CHARS):
+        self.window = window_ms / 1000
+        self.max_chars = max_chars
+
+    @classmethod
+    def from_ms(cls, window_ms: float | None) -> "FlushPolicy":
+        return cls(FLUSH_MS if window_ms is None else window_ms)
+
+
+class Coalescer:
+    """Merges consecutive text events, every other event flushes the text ahead of it."""
+
+    def __init__(self, policy: FlushPolicy | None = None):
+        self.policy = policy or FlushPolicy()
+        self.parts = []
+        self.chars = 0
+        self.since = None
+        self.sent_text = False
+        self.chunks = 0
+        self.frames = 0
+
+    def due(self) -> float | None:
+        """Seconds until the buffered text must go out, None when nothing is buffered."""
+        if self.since is None:
+            return None
+        return max(0.0, self.since + self.policy.window - time.monotonic())
+
+    def flush(self) -> list[dict]:
+        if not self.parts:
+            return []
+        event = {"type": "text", "content": "".join(self.parts)}
+        self.parts, self.chars, self.since = [], 0, None
+        self.sent_text = True
+        self.frames += 1
+        return [event]
+
+    def add(self, event: dict) -> list[dict]:
+        """Events ready to send after this one arrives."""
+        if event.get("type") != "text":
+            return self.flush() + [event]
+        if not event.get("content"):
+            return []
+        self.chunks += 1
+        self.parts.append(event["content"])
+        self.chars += len(event["content"])
+        if self.since is None:
+            self.since = time.monotonic()
+        if not self.sent_text or self.chars >= self.policy.max_chars or self.due() == 0:
+            return self.flush()
+        return []
+
+    def record(self, frames: int = 0, keepalives: int = 0, disconnected: bool = False):
+        with _lock:
+            stats["streams"] += 1
+            stats["frames"] += frames
+            stats["text_chunks"] += self.chunks
+            stats["text_frames"] += self.frames
+            stats["keepalives"] += keepalives
+            stats["disconnects"] += disconnected
+
+
+def frames(events, policy: FlushPolicy | None = None):
+    """SSE frames for a blocking event generator, text is coalesced as it arrives."""
+    coalescer = Coalescer(policy)
+    sent = 0
+    try:
+        for event in events:
+            for ready in coalescer.add(event):
+                sent += 1
+                yield frame(ready)
+        for ready in coalescer.flush():
+            sent += 1
+            yield frame(ready)
+    finally:
+        events.close()
+        coalescer.record(sent)
+
+
+async def stream(events, is_disconnected=None, policy: FlushPolicy | None = None, keepalive: float | None = None):
+    """SSE frames for an async event generator.
+
+    Text is coalesced on the flush policy's timer, an idle connection gets keep-alive
+    comments, and once is_disconnected() reports the client gone the event generator is
+    cancelled and closed so the model generation and pending tool calls stop with it.
+    """
+    coalescer = Coalescer(policy)
+    iterator = events.__aiter__()
+    # Every step runs in one context so context variables set by the generator carry across steps
+    context = contextvars.copy_context()
+    pending = None
+    last_sent = time.monotonic()
+    sent = keepalives = 0
+    disconnected = False
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.get_running_loop().create_task(anext(iterator), context=context)
+            waits = [DISCONNECT_POLL] if is_disconnected is not None else []
+            if keepalive:
+                waits.append(last_sent + keepalive - time.monotonic())
+            if coalescer.due() is not None:
+                waits.append(coalescer.due())
+            done, _ = await asyncio.wait({pending}, timeout=max(0.0, min(waits)) if waits else None)
+
+            if is_disconnected is not None and await is_disconnected():
+                disconnected = True
+                return
+
+            ready = []
+            if pending in done:
+                try:
+                    event = pending.result()
+                except StopAsyncIteration:
+                    pending = None
+                    for event in coalescer.flush():
+                        sent += 1
+                        yield frame(event)
+                    return
+                pending = None
+                ready = coalescer.add(event)
+            elif coalescer.due() == 0:
+                ready = coalescer.flush()
+
+            for event in ready:
+                sent += 1
+                yield frame(event)
+            if ready:
+                last_sent = time.monotonic()
+            elif keepalive and time.monotonic() - last_sent >= keepalive:
+                keepalives += 1
+                last_sent = time.monotonic()
+                yield KEEPALIVE_FRAME
+    except (asyncio.CancelledError, GeneratorExit):
+        # The server noticed the disconnect first and is tearing the response down
+        disconnected = True
+        raise
+    finally:
+        coalescer.record(sent, keepalives, disconnected)
+        # The server may be cancelling this generator, which cancels every await here again,
+        # so the producer is closed on a task of its own that finishes either way
+        closing = asyncio.get_running_loop().create_task(close(iterator, pending), context=context)
+        _closing.add(closing)
+        closing.add_done_callback(_closing.discard)
+        await asyncio.shield(closing)
+
+
+async def close(iterator, pending: asyncio.Task | None):
+    """Stop the producer mid step, then let its finally blocks cancel the model and tool calls."""
+    if pending is not None:
+        pending.cancel()
+        await asyncio.wait({pending})
+    await iterator.aclose()
+
+
+class EventStreamResponse(StreamingResponse):
+    """SSE response that calls on_close however it ends.
+
+    The body generator only starts once the response headers are sent, so anything held for
+    the stream, like a scheduler slot, cannot be released from the generator alone: when the
+    client is gone before the first send, it never runs.
+    """
+
+    def __init__(self, content, on_close=None):
+        super().__init__(content, media_type="text/event-stream", headers=HEADERS)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+
+def summary() -> dict:
+    with _lock:
+        out = dict(stats)
+        out["chunks_per_frame"] = stats["text_chunks"] / stats["text_frames"] if stats["text_frames"] else 0.0
+        return out
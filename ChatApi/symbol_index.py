@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import time
+import difflib
+import threading
+from pathlib import Path
+
+SYMBOLS_FILE = Path(os.getenv("SYMBOLS_FILE", Path(__file__).parent / "data" / "symbols.json"))
+
+# Anything shaped like a Yahoo symbol e.g. MSFT, BRK-B, AIR.PA, ^GSPC, GC=F, EURUSD=X
+SYMBOL_PATTERN = re.compile(r"^\^?[A-Z0-9]{1,8}(?:[.\-][A-Z0-9]{1,4})?(?:=[XF])?$")
+
+# Upper case words in finance questions that are not ticker symbols
+NOT_TICKERS = {
+    "I", "A", "CEO", "CFO", "EPS", "PE", "USD", "EUR", "GBP", "ETF", "IPO", "AI", "US", "UK", "EU",
+    "YTD", "TTM", "EBIT", "EBITDA", "FCF", "ROE", "ROI", "ROA", "Q1", "Q2", "Q3", "Q4", "FY", "OK",
+}
+
+# Known symbols that are also everyday words, in a prompt typed all in capitals they are read as words
+WORD_SYMBOLS = {"SO", "NOW", "LOW", "DE", "ARM", "GE", "MS"}
+
+# Trailing words dropped from company names so "Microsoft Corporation" also matches "microsoft"
+NAME_SUFFIXES = {
+    "inc", "inc.", "incorporated", "corporation", "corp", "corp.", "company", "co", "co.", "plc", "p.l.c.",
+    "ltd", "ltd.", "limited", "group", "holdings", "holding", "n.v.", "s.a.", "se", "ag", "a/s", "&",
+    "class", "a", "b", "c",
+}
+
+# Fuzzy lookups remembered, misses included, cleared when full
+FUZZY_CACHE_SIZE = int(os.getenv("SYMBOL_FUZZY_CACHE_SIZE", "4096"))
+
+TOKEN_PATTERN = re.compile(r"\$?[\w&'./^=-]+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        token = re.sub(r"'s$", "", token).rstrip(".,'")
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def name_key(name: str) -> str:
+    tokens = [t.lower() for t in tokenize(name)]
+    if tokens and tokens[0] == "the":
+        tokens = tokens[1:]
+    while len(tokens) > 1 and tokens[-1] in NAME_SUFFIXES:
+        tokens = tokens[:-1]
+    return " ".join(tokens)
+
+
+class SymbolIndex:
+    """In-memory lookup of tickers by symbol, company name and alias.
+
+    Names and aliases are held in a word level trie for scanning prompts, and in a flat
+    dict for resolving a single tool argument. Fuzzy matching is only tried when both miss,
+    against phrases with the same first letter and a similar length, and its answers are cached.
+    """
+
+    def __init__(self, entries: list[dict]):
+        self.tickers = {}
+        self.phrases = {}
+        self.trie = {}
+        self.ambiguous = set()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self.normalized = 0
+        self.rejected = 0
+
+        for entry in entries:
+            ticker = entry["ticker"].upper()
+            self.tickers[ticker] = entry["name"]
+            if entry.get("ambiguous"):
+                self.ambiguous.add(ticker)
+            self.phrases[ticker.lower()] = ticker
+            for phrase in [name_key(entry["name"])] + [a.lower() for a in entry.get("aliases", [])]:
+                self.add_phrase(phrase, ticker)
+
+        # Candidates for fuzzy matching by first character, misspellings rarely get that wrong
+        self.by_initial = {}
+        for phrase in self.phrases:
+            self.by_initial.setdefault(phrase[0], []).append(phrase)
+        self._fuzzy = {}
+
+    @classmethod
+    def load(cls, path: Path = SYMBOLS_FILE) -> "SymbolIndex":
+        return cls(json.loads(Path(path).read_text()))
+
+    def add_phrase(self, phrase: str, ticker: str):
+        self.phrases.setdefault(phrase, ticker)
+        node = self.trie
+        for token in phrase.split():
+            node = node.setdefault(token, {})
+        node.setdefault("$", ticker)
+
+    def resolve(self, text: str) -> str | None:
+        """Resolve a symbol, company name or alias to a ticker, None when unknown.
+
+        Upper case input shaped like a symbol is taken as one, it is only matched against
+        known tickers and never against names, so SOFI or COKE are not turned into a
+        different company that happens to be close.
+        """
+        text = text.strip()
+        if not text:
+            return None
+        if text.upper() in self.tickers:
+            return text.upper()
+        if text.isupper() and SYMBOL_PATTERN.match(text):
+            # Share classes are written BRK.B as often as Yahoo's BRK-B
+            dashed = text.replace(".", "-")
+            return dashed if dashed in self.tickers else None
+        key = name_key(text)
+        if key in self.phrases:
+            return self.phrases[key]
+        if len(key) >= 5:
+            return self.fuzzy(key)
+        return None
+
+    def fuzzy(self, key: str) -> str | None:
+        # A miss is cached as "", read with get() since another thread may clear the cache
+        cached = self._fuzzy.get(key)
+        if cached is not None:
+            return cached or None
+        # A ratio of 0.8 needs the shorter string to be at least 2/3 of the longer one
+        candidates = [p for p in self.by_initial.get(key[0], []) if 2 * len(key) <= 3 * len(p) <= 9 * len(key) // 2]
+        close = difflib.get_close_matches(key, candidates, n=1, cutoff=0.8)
+        ticker = self.phrases[close[0]] if close else None
+        if len(self._fuzzy) >= FUZZY_CACHE_SIZE:
+            self._fuzzy.clear()
+        self._fuzzy[key] = ticker or ""
+        return ticker
+
+    def normalize_ticker_arg(self, value: str) -> str | None:
+        """Validate a model emitted ticker argument before any network call.
+
+        Known symbols, names and aliases map to their ticker. Unknown values pass through
+        upper cased only when they look like a symbol, otherwise None.
+        """
+        started = time.perf_counter()
+        value = str(value).strip().lstrip("$")
+        ticker = self.resolve(value)
+        if ticker is None and SYMBOL_PATTERN.match(value.upper()) and (value.isupper() or len(value) <= 5):
+            ticker = value.upper()
+
+        with self._lock:
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - started
+            if ticker is None:
+                self.rejected += 1
+            elif ticker != value:
+                self.normalized += 1
+        return ticker
+
+    def extract_tickers(self, prompt: str) -> list[str]:
+        """Find the tickers mentioned in free text, by name, alias or upper case symbol."""
+        return list(dict.fromkeys(ticker for _, _, ticker in self.scan(tokenize(prompt))))
+
+    def scan(self, tokens: list[str]) -> list[tuple[int, int, str]]:
+        """(start, end, ticker) for every mention in a tokenized prompt, end is exclusive.
+
+        A bare upper case word counts only when it is a known ticker, anything else has to be
+        marked as a symbol with $, so a prompt typed in capitals does not turn into tickers.
+        """
+        shouted = not any(c.islower() for token in tokens for c in token)
+        found = []
+        i = 0
+        while i < len(tokens):
+            # Longest name or alias starting at this token
+            node, match, match_end = self.trie, None, i
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j].lower())
+                if node is None:
+                    break
+                if "$" in node:
+                    match, match_end = node["$"], j + 1
+
+            # Common word names like Apple or Target only count when capitalised
+            if match and match_end - i == 1 and match in self.ambiguous and not tokens[i][0].isupper():
+                match = None
+
+            if match:
+                found.append((i, match_end, match))
+                i = match_end
+                continue
+
+            token = tokens[i]
+            if token.startswith("$") and SYMBOL_PATTERN.match(token[1:].upper()):
+                found.append((i, i + 1, token[1:].upper()))
+            elif len(token) > 1 and token in self.tickers and token not in NOT_TICKERS and not (
+                    shouted and token in WORD_SYMBOLS):
+                found.append((i, i + 1, token))
+            i += 1
+        return found
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "symbols": len(self.tickers),
+                "phrases": len(self.phrases),
+                "lookups": self.lookups,
+                "normalized": self.normalized,
+                "rejected": self.rejected,
+                "avg_lookup_us": 1e6 * self.lookup_seconds / self.lookups if self.lookups else 0.0
+            }
+
+
+index = SymbolIndex.load()
@@ -0,0 +1,39 @@
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import ChatApi.batch as batch
+
+
+def item(prompt, tool_model="t1", chat_model="c1"):
+    return SimpleNamespace(prompt=prompt, tool_model=tool_model, chat_model=chat_model,
+                           speculative=None, priority="normal", deadline_ms=None)
+
+
+def test_batch_groups_by_model_pair_and_streams_every_item(monkeypatch):
+    order = []
+
+    async def fake_prompt_model(prompt, tool_model, chat_model, speculative, thread_budget, memo, deadline):
+        order.append((tool_model, prompt))
+        await asyncio.sleep(0.01)
+        if prompt == "bad":
+            raise RuntimeError("model failed")
+        return {"response": prompt.upper(), "tool_calls": []}
+
+    monkeypatch.setattr(batch, "aprompt_model", fake_prompt_model)
+    items = [item("a"), item("b", "t2"), item("c"), item("bad", "t2")]
+
+    async def collect():
+        return [json.loads(line) async for line in batch.run_batch(items, concurrency=2)]
+
+    results = asyncio.run(collect())
+
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    assert [m for m, _ in order] == ["t1", "t1", "t2", "t2"]
+    assert next(r for r in results if r["index"] == 2)["response"] == "C"
+    assert next(r for r in results if r["index"] == 3)["error"] == "model failed"
@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import yfinance as yf
+
+from ChatApi.benchmarks import fixtures, run
+from ChatApi.benchmarks.fake_ollama import FakeOllama
+from ChatApi.model_registry import registry
+from ChatApi.ohlcv_store import store
+from ChatApi.data_cache import cache
+from ChatApi.market_data import ChainedProvider, SnapshotProvider, provider
+
+
+def test_fixture_data_is_deterministic():
+    first = fixtures.FixtureTicker("NVDA").history(start="2025-01-02", end="2025-02-01")
+    second = fixtures.FixtureTicker("nvda").history(start="2025-01-02", end="2025-02-01")
+
+    assert len(first) == 22
+    assert first.equals(second)
+    assert fixtures.FixtureTicker("AMD").get_info() != fixtures.FixtureTicker("NVDA").get_info()
+
+
+def test_recorded_fixtures_are_replayed():
+    history = fixtures.FixtureTicker("MSFT").history(start="2025-12-01", end="2025-12-06")
+    news = fixtures.FixtureTicker("NVDA").get_news()
+
+    assert len(history) == 5
+    assert str(history.index.tz) == "America/New_York"
+    assert history.index[0].date().isoformat() == "2025-12-01"
+    assert history["Close"].iloc[0] == 486.73999
+    assert news[1]["content"]["provider"]["displayName"] == "Investor's Business Daily"
+    # Anything not recorded still falls back to synthetic data, history around the recorded window included
+    earlier = fixtures.FixtureTicker("MSFT").history(start="2025-05-01", end="2025-11-21")
+    assert len(earlier) > 100
+    assert abs(earlier["Close"].iloc[-2] / earlier["Close"].iloc[-1] - 1) < 0.1
+    assert fixtures.FixtureTicker("MSFT").get_news()[0]["content"]["provider"]["displayName"] == "Fixture"
+
+
+def test_stream_benchmark_runs_offline(monkeypatch, tmp_path):
+    with FakeOllama(token_rate=500, answer_tokens=10, tool_latency=0.0) as fake:
+        monkeypatch.setenv("OLLAMA_HOST", fake.host)
+        monkeypatch.setattr(yf, "Ticker", fixtures.FixtureTicker)
+        monkeypatch.setattr(yf, "download", fixtures.download)
+        monkeypatch.setattr(provider, "providers", fixtures.fixture_providers())
+        monkeypatch.setattr(store, "root", tmp_path)
+        registry.clear()
+        cache.clear()
+        try:
+            result = run.run_target(run.Runner("tool", "chat"), "stream_response", requests=4, concurrency=2, warmup=0)
+        finally:
+            registry.clear()
+            cache.clear()
+
+    assert result["errors"] == 0, result["first_error"]
+    assert result["ttft_seconds"]["p50"] < result["latency_seconds"]["p50"]
+    assert fake.requests >= 4
+
+
+def test_benchmark_ignores_an_installed_snapshot(monkeypatch, tmp_path):
+    (tmp_path / "manifest.json").write_text('{"exported_at": "2025-12-19T16:00:00", "tickers": {}}')
+    chain = ChainedProvider([SnapshotProvider(tmp_path)])
+    monkeypatch.setattr("ChatApi.market_data.provider", chain)
+    monkeypatch.setattr(yf, "Ticker", yf.Ticker)
+    monkeypatch.setattr(yf, "download", yf.download)
+
+    fixtures.install()
+
+    assert [p.name for p in chain.providers] == ["yfinance"]
+
+
+def test_api_import_stays_light():
+    from ChatApi.benchmarks import startup
+
+    assert startup.measure_import()["heavy"] == []
@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ChatApi.data_cache import DataCache, make_key
+
+
+def test_single_flight_dedupes_concurrent_misses():
+    cache = DataCache()
+    calls = []
+    lock = threading.Lock()
+
+    def fetch():
+        with lock:
+            calls.append(1)
+        time.sleep(0.2)
+        return {"currentPrice": 100.0}
+
+    key = make_key("get_key_financial_metrics", "nvda", {})
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        results = list(pool.map(lambda _: cache.get_or_fetch(key, 60, fetch), range(50)))
+
+    assert len(calls) == 1
+    assert all(r == {"currentPrice": 100.0} for r in results)
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = DataCache()
+    key = make_key("get_latest_news", "TSLA", {})
+
+    cache.get_or_fetch(key, 0.05, lambda: ["old"])
+    time.sleep(0.1)
+    value = cache.get_or_fetch(key, 60, lambda: ["new"])
+
+    assert value == ["new"]
+    assert cache.stats()["expirations"] == 1
+
+
+def test_failed_refetch_serves_the_last_good_value():
+    cache = DataCache()
+    key = make_key("get_key_financial_metrics", "NVDA", {})
+
+    def down():
+        raise ConnectionError("upstream down")
+
+    cache.get_or_fetch(key, 0.05, lambda: {"currentPrice": 1.0})
+    time.sleep(0.1)
+    assert cache.get_or_fetch(key, 60, down) == {"currentPrice": 1.0}
+    assert cache.get_or_fetch(key, 60, lambda: {"currentPrice": 2.0}) == {"currentPrice": 2.0}
+    assert cache.stats()["stale_errors"] == 1
+
+
+def test_lru_eviction_by_bytes():
+    cache = DataCache(max_bytes=100)
+
+    cache.put("a", "x" * 40, 60)
+    cache.put("b", "x" * 40, 60)
+    cache.get("a")
+    cache.put("c", "x" * 40, 60)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.stats()["bytes"] == 80
+
+
+def test_key_normalises_ticker_and_args():
+    assert make_key("get_dividends", " ko ", {"time_period": "1Y", "ticker": "KO"}) == \
+        make_key("get_dividends", "KO", {"time_period": "1y"})
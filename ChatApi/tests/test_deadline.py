@@ -0,0 +1,137 @@
+import sys
+import json
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+
+import ChatApi.trading_agent as ta
+from ChatApi.deadline import Deadline
+
+
+class SlowTool:
+    def __init__(self, delay: float, output: str):
+        self.delay = delay
+        self.output = output
+
+    def invoke(self, args):
+        time.sleep(self.delay)
+        return self.output
+
+
+class SlowToolModel:
+    async def ainvoke(self, chat):
+        await asyncio.sleep(5)
+
+
+class SlowChatModel:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.chats = []
+
+    async def astream(self, chat):
+        self.chats.append(chat)
+        for token in ["one ", "two ", "three ", "four"]:
+            await asyncio.sleep(self.delay)
+            yield SimpleNamespace(content=token, usage_metadata=None)
+
+
+def test_tools_missing_the_deadline_are_reported_unavailable(monkeypatch):
+    monkeypatch.setitem(ta.tool_mapping, "slow", SlowTool(1.0, "slow"))
+    monkeypatch.setitem(ta.tool_mapping, "fast", SlowTool(0.0, "fast"))
+    tool_calls = [{"name": "slow", "args": {}, "id": "1"}, {"name": "fast", "args": {}, "id": "2"}]
+    deadline = Deadline(0.5)
+
+    started = time.monotonic()
+    results = asyncio.run(ta.aexecute_tools(tool_calls, deadline=deadline))
+
+    assert time.monotonic() - started < 0.5
+    assert ta.is_skipped(results[0]) and results[1]["content"] == "fast"
+    assert deadline.skipped == [{"part": "tool", "name": "slow"}]
+
+
+def test_tool_timeout_within_deadline_is_not_a_skip(monkeypatch):
+    monkeypatch.setitem(ta.tool_mapping, "slow", SlowTool(0.3, "slow"))
+    deadline = Deadline(10)
+
+    results = ta.execute_tools([{"name": "slow", "args": {}, "id": "1"}], timeout=0.1, deadline=deadline)
+
+    assert ta.is_error(results[0]) and not ta.is_skipped(results[0])
+    assert deadline.skipped == []
+
+
+def test_prompt_answers_with_what_it_has_at_the_deadline(monkeypatch):
+    chat_model = SlowChatModel(0.15)
+    monkeypatch.setattr(ta, "initialise_models", lambda *args: {"tool_model": SlowToolModel(), "chat_model": chat_model})
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [])
+    monkeypatch.setattr(ta.prefetch, "start", lambda prompt, speculative: None)
+
+    started = time.monotonic()
+    result = asyncio.run(ta.aprompt_model("p", "t", "c", deadline=Deadline(0.5)))
+
+    assert time.monotonic() - started < 0.7
+    assert [s["part"] for s in result["skipped"]] == ["tool_selection", "answer"]
+    assert result["response"].startswith("one ") and not result["response"].endswith("four")
+    assert len(chat_model.chats) == 1
+
+
+def test_stream_marks_skipped_tools(monkeypatch):
+    call = {"name": "slow", "args": {}, "id": "1", "type": "tool_call"}
+    monkeypatch.setitem(ta.tool_mapping, "slow", SlowTool(1.0, "slow"))
+    monkeypatch.setattr(ta, "initialise_models", lambda *args: {"chat_model": SlowChatModel(0.0)})
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [call])
+
+    async def collect():
+        return [json.loads(e[len("data: "):]) async for e in ta.astream_response("p", "t", "c", deadline=Deadline(0.5))]
+
+    events = asyncio.run(collect())
+
+    assert next(e for e in events if e["type"] == "tool_done")["status"] == "skipped"
+    assert events[-1] == {"type": "done", "skipped": [{"part": "tool", "name": "slow"}]}
+    assert "".join(e["content"] for e in events if e["type"] == "text") == "one two three four"
+
+
+class TimingOutToolModel:
+    def invoke(self, chat):
+        raise TimeoutError("read timed out")
+
+    async def ainvoke(self, chat):
+        raise TimeoutError("read timed out")
+
+
+def test_client_timeout_without_a_deadline_is_raised(monkeypatch):
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [])
+    model_dict = {"tool_model": TimingOutToolModel()}
+    chat = ta.initialise_chat("Anything new on the market today")
+
+    with pytest.raises(TimeoutError):
+        ta.select_tool_calls(model_dict, chat, "Anything new on the market today")
+    with pytest.raises(TimeoutError):
+        asyncio.run(ta.aselect_tool_calls(model_dict, chat, "Anything new on the market today"))
+
+
+def test_abandoned_tool_model_call_leaves_the_tool_pool_free(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(ta, "tool_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setitem(ta.tool_mapping, "fast", SlowTool(0.0, "fast"))
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [])
+    monkeypatch.setattr(ta, "DECISION_CACHE_ENABLED", False)
+    model_dict = {"tool_model": SimpleNamespace(invoke=lambda chat: release.wait(5))}
+    chat = ta.initialise_chat("Anything new on the market today")
+
+    try:
+        deadline = Deadline(0.1)
+        assert ta.select_tool_calls(model_dict, chat, "Anything new on the market today", deadline=deadline)[0] == []
+        assert deadline.skipped == [{"part": "tool_selection"}]
+        # The model call is still running, the only tool worker is not the one waiting on it
+        results = ta.execute_tools([{"name": "fast", "args": {}, "id": "1"}], timeout=1)
+        assert results[0]["content"] == "fast"
+    finally:
+        release.set()
@@ -0,0 +1,92 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from langchain.messages import AIMessage
+
+import ChatApi.trading_agent as ta
+from ChatApi.decision_cache import DecisionCache, normalize
+
+
+def history_call(tickers: list[str], start: str) -> dict:
+    return {"name": "get_historical_data_multi", "args": {"tickers": tickers, "start": start}}
+
+
+class CountingToolModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, chat):
+        self.calls += 1
+        ticker = "NVDA" if "Nvidia" in chat[-1]["content"] else "MSFT"
+        return AIMessage(content="", tool_calls=[
+            {"name": "get_key_financial_metrics", "args": {"ticker": ticker}, "id": "1", "type": "tool_call"}
+        ])
+
+
+def test_prompts_of_the_same_shape_share_a_template():
+    first, slots = normalize("How did Nvidia trade on the 31st October 2025 against AMD?")
+    second, _ = normalize("How did Microsoft trade on the 2nd May 2024 against $AAPL?")
+
+    assert first == second
+    assert slots == {"date": ["2025-10-31"], "year": [], "ticker": ["NVDA", "AMD"]}
+
+
+def test_agreed_decision_is_replayed_with_the_new_entities():
+    cache = DecisionCache(min_agreement=2)
+    cache.learn("Compare Nvidia and AMD since 1st March 2025", [history_call(["NVDA", "AMD"], "2025-03-01")])
+    assert cache.lookup("Compare Tesla and Ford since 3rd June 2023") == []
+
+    cache.learn("Compare Microsoft and Apple since 2nd May 2024", [history_call(["MSFT", "AAPL"], "2024-05-02")])
+    calls = cache.lookup("Compare Tesla and Ford since 3rd June 2023")
+
+    assert [(c["name"], c["args"]) for c in calls] == [
+        ("get_historical_data_multi", {"tickers": ["TSLA", "F"], "start": "2023-06-03"})
+    ]
+    assert cache.lookup("Compare Tesla and Ford since 3rd June 2023", "other-model") == []
+
+
+def test_arguments_not_taken_from_the_prompt_are_not_cached():
+    cache = DecisionCache(min_agreement=1)
+
+    # The start date depends on today, replaying it later would be wrong
+    assert not cache.learn("How has Nvidia done this year", [history_call(["NVDA"], "2026-01-01")])
+    assert cache.lookup("How has AMD done this year") == []
+    assert cache.stats()["uncacheable"] == 1
+
+
+def test_disagreement_and_age_stop_replay():
+    cache = DecisionCache(min_agreement=2, min_confidence=0.75, ttl=60)
+    metrics = {"name": "get_key_financial_metrics", "args": {"ticker": "NVDA"}}
+    history = {"name": "get_historical_data", "args": {"ticker": "NVDA", "period": "1mo"}}
+    for call in [metrics, history, history]:
+        cache.learn("How is Nvidia", [call])
+
+    # Two of three agree, below the confidence bar
+    assert cache.lookup("How is AMD") == []
+
+    cache.ttl = 0
+    cache.learn("How is Nvidia", [history])
+    assert cache.lookup("How is AMD") == []
+    assert cache.stats()["expirations"] == 1
+
+
+def test_repeat_shape_skips_the_tool_model(monkeypatch):
+    monkeypatch.setattr(ta, "decision_cache", DecisionCache(min_agreement=2))
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [])
+    tool_model = CountingToolModel()
+    model_dict = {"tool_model": tool_model, "tool_model_name": "tool"}
+
+    async def select(prompt: str):
+        return await ta.aselect_tool_calls(model_dict, ta.initialise_chat(prompt), prompt)
+
+    asyncio.run(select("Is Nvidia worth buying?"))
+    asyncio.run(select("Is Microsoft worth buying?"))
+    calls, result = asyncio.run(select("Is Tesla worth buying?"))
+
+    assert tool_model.calls == 2
+    assert result is None
+    assert [(c["name"], c["args"]) for c in calls] == [("get_key_financial_metrics", {"ticker": "TSLA"})]
@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+import pandas as pd
+
+import ChatApi.finance_tools as ft
+from ChatApi.data_cache import cache
+
+
+def frames():
+    index = pd.date_range("2025-01-01", periods=5, freq="B")
+    return {
+        "NVDA": pd.DataFrame({"Close": [10, 11, 12, 11, 13.0], "High": 15.0, "Low": 9.0}, index=index),
+        # AMD missed a day, the aligned frame carries the previous close forward
+        "AMD": pd.DataFrame({"Close": [20, np.nan, 18, 19, 22.0], "High": 25.0, "Low": 17.0}, index=index),
+    }
+
+
+def test_compare_history():
+    summary, closes = ft.compare_history(frames())
+
+    assert list(closes.columns) == ["NVDA", "AMD"]
+    assert round(summary.loc["NVDA", "Return%"], 6) == 30.0
+    assert round(summary.loc["AMD", "MaxDrawdown%"], 6) == -10.0
+    assert summary.loc["AMD", "High"] == 25.0
+
+
+def test_multi_ticker_tool_output(monkeypatch):
+    monkeypatch.setattr(ft, "fetch_history_multi", lambda tickers, period, start: frames())
+
+    output = ft.get_historical_data_multi.invoke({"tickers": ["NVDA", "AMD"], "period": "5d"})
+    lines = output.splitlines()
+
+    assert lines[0] == "Ticker|First|Last|Return%|High|Low|Volatility%|MaxDrawdown%"
+    assert lines[1].startswith("NVDA|10|13|30|15|9|")
+    assert "Date|NVDA|AMD" in lines
+
+
+def statements():
+    dates = pd.to_datetime(["2024-12-31", "2023-12-31"])
+    balance_sheet = pd.DataFrame({
+        dates[0]: {"CurrentAssets": 300.0, "CurrentLiabilities": 200.0, "Inventory": 50.0, "TotalDebt": 100.0,
+                   "StockholdersEquity": 400.0, "TotalAssets": 800.0},
+        dates[1]: {"CurrentAssets": 240.0, "CurrentLiabilities": 160.0, "Inventory": np.nan, "TotalDebt": 80.0,
+                   "StockholdersEquity": 0.0, "TotalAssets": 640.0},
+    })
+    income_stmt = pd.DataFrame({
+        dates[0]: {"TotalRevenue": 1000.0, "GrossProfit": 420.0, "NetIncome": 100.0},
+        dates[1]: {"TotalRevenue": 900.0, "GrossProfit": 360.0, "NetIncome": 90.0},
+    })
+    return balance_sheet, income_stmt
+
+
+def test_ratios_are_computed_for_every_period():
+    ratios = ft.metrics_engine.compute_ratios(*statements())
+
+    assert ratios.loc["current_ratio"].tolist() == [1.5, 1.5]
+    assert ratios.loc["gross_margin"].tolist() == [42.0, 40.0]
+    # Undefined where an input is missing or the denominator is zero
+    assert ratios.loc["quick_ratio"].tolist()[0] == 1.25 and np.isnan(ratios.loc["quick_ratio"].iloc[1])
+    assert np.isnan(ratios.loc["debt_to_equity"].iloc[1])
+    assert ratios.loc["free_cash_flow"].isna().all()
+
+
+def test_ratio_tool_returns_only_the_requested_numbers(monkeypatch):
+    balance_sheet, income_stmt = statements()
+    monkeypatch.setattr(ft, "fetch_balance_sheet", lambda ticker: balance_sheet)
+    monkeypatch.setattr(ft, "fetch_income_stmt", lambda ticker: income_stmt)
+    monkeypatch.setattr(ft, "fetch_cashflow", lambda ticker: pd.DataFrame())
+    cache.clear()
+
+    output = ft.get_financial_ratios.invoke({"ticker": "TEST", "ratios": ["debt_to_equity", "gross_margin"], "year": 2024})
+
+    assert output.splitlines() == ["Item|2024-12-31", "debt_to_equity|0.25", "gross_margin (%)|42"]
@@ -0,0 +1,102 @@
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pandas as pd
+
+import ChatApi.trading_agent as ta
+from ChatApi import instrumentation, serializers
+
+
+class FakeChatModel:
+    async def astream(self, chat):
+        for token in ["Micro", "soft ", "is up"]:
+            yield SimpleNamespace(content=token, usage_metadata=None)
+        yield SimpleNamespace(content="", usage_metadata={"output_tokens": 3})
+
+
+class EchoTool:
+    def invoke(self, args):
+        return "x" * 400
+
+
+def fresh_histograms(monkeypatch):
+    monkeypatch.setattr(instrumentation, "histograms", {
+        name: instrumentation.Histogram(buckets) for name, (_, buckets) in instrumentation.METRICS.items()
+    })
+
+
+def test_histogram_renders_cumulative_buckets(monkeypatch):
+    fresh_histograms(monkeypatch)
+    instrumentation.observe("tool_seconds", 0.02, tool="a")
+    instrumentation.observe("tool_seconds", 3.0, tool="a")
+
+    lines = instrumentation.render().splitlines()
+
+    assert 'tool_seconds_bucket{tool="a",le="0.025"} 1' in lines
+    assert 'tool_seconds_bucket{tool="a",le="+Inf"} 2' in lines
+    assert 'tool_seconds_count{tool="a"} 2' in lines
+
+
+class HistoryTool:
+    def invoke(self, args):
+        index = pd.date_range("2025-01-01", periods=30, freq="B")
+        return serializers.compact_time_series(pd.DataFrame({"Close": range(30)}, index=index), "history")
+
+
+def test_every_tool_output_is_measured_once(monkeypatch):
+    fresh_histograms(monkeypatch)
+    monkeypatch.setitem(ta.tool_mapping, "news", SimpleNamespace(invoke=lambda args: json.dumps([{"title": "t"}])))
+    monkeypatch.setitem(ta.tool_mapping, "history", HistoryTool())
+
+    news = ta.execute_tool({"name": "news", "args": {}, "id": "1"})
+    history = ta.execute_tool({"name": "history", "args": {}, "id": "2"})
+
+    series = instrumentation.histograms["tool_output_bytes"].series
+    assert series[(("tool", "news"),)]["count"] == 1
+    assert series[(("tool", "news"),)]["sum"] == len(news["content"])
+    assert series[(("tool", "history"),)]["count"] == 1
+    assert series[(("tool", "history"),)]["sum"] == len(history["content"])
+
+
+def test_null_ollama_durations_are_read_as_zero(monkeypatch):
+    fresh_histograms(monkeypatch)
+    message = SimpleNamespace(response_metadata={
+        "load_duration": None, "prompt_eval_duration": 2e8, "eval_count": 10, "eval_duration": 1e9
+    })
+
+    instrumentation.observe_chat_message("m", message, 0.0)
+
+    assert instrumentation.histograms["chat_ttft_seconds"].series[(("model", "m"),)]["sum"] == 0.2
+
+
+def test_stream_ends_with_timings_event(monkeypatch):
+    call = {"name": "echo", "args": {}, "id": "1", "type": "tool_call"}
+    monkeypatch.setitem(ta.tool_mapping, "echo", EchoTool())
+    monkeypatch.setattr(ta, "initialise_models", lambda *args: {"chat_model": FakeChatModel()})
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [call])
+
+    async def collect():
+        return [json.loads(e[len("data: "):]) async for e in ta.astream_response("p", "t", "c", timings=True)]
+
+    events = asyncio.run(collect())
+
+    assert [e["type"] for e in events][-2:] == ["timings", "done"]
+    names = {t["name"] for t in events[-2]["timings"]}
+    assert {"tool_selection_seconds", "tool_seconds", "chat_ttft_seconds", "chat_tokens_per_second"} <= names
+
+
+def test_disabled_records_nothing(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+
+    with instrumentation.collect() as samples:
+        with instrumentation.timer("tool_seconds", tool="a"):
+            pass
+
+    assert samples is None
+    assert instrumentation.timer("tool_seconds") is instrumentation._null
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+
+from ChatApi.intent_router import classify, route, summary
+
+
+@pytest.mark.parametrize(
+    "prompt, name, args",
+    [
+        pytest.param("What is the current price of Nvidia", "get_key_financial_metrics", {"ticker": "NVDA"}, id="price"),
+        pytest.param("What was the price of Microsoft at close on the 31st October 2025", "get_historical_data",
+                     {"ticker": "MSFT", "start": "2025-10-31", "period": "1d"}, id="historic-price"),
+        pytest.param("What was the highest price of Microsoft between 2025-10-30 and 2025-11-05", "get_historical_data",
+                     {"ticker": "MSFT", "start": "2025-10-30", "period": "1mo"}, id="historic-range"),
+        pytest.param("How did Microsoft perform in 2023?", "get_historical_data",
+                     {"ticker": "MSFT", "start": "2023-01-01", "period": "1y"}, id="calendar-year"),
+        pytest.param("What is the low of Tesla this year", "get_historical_data", {"ticker": "TSLA", "period": "ytd"}, id="this-year"),
+        pytest.param("Can you tell me the market capilisation of AMD", "get_key_financial_metrics", {"ticker": "AMD"}, id="market-cap"),
+        pytest.param("Give me the latest news for Tesla", "get_latest_news", {"ticker": "TSLA"}, id="news"),
+        pytest.param("What dividends did Coca-Cola pay in the last year", "get_dividends", {"ticker": "KO", "time_period": "1y"}, id="dividends"),
+        pytest.param("Can you calculate ASML's debt to equity for 2024 using the balance sheet?", "get_financial_ratios",
+                     {"ticker": "ASML", "ratios": ["debt_to_equity"], "year": 2024}, id="debt-to-equity"),
+        pytest.param("Please fetch the income statement for Meta and tell me the latest Gross Profit Margin", "get_financial_ratios",
+                     {"ticker": "META", "ratios": ["gross_margin"]}, id="gross-margin"),
+        pytest.param("Please fetch the balance sheet for Microsoft and tell me Total Assets", "get_balance_sheet", {"ticker": "MSFT"}, id="balance-sheet"),
+        pytest.param("Please fetch the income statement for Microsoft and tell me Total Revenue", "get_income_statement", {"ticker": "MSFT"}, id="income"),
+        pytest.param("Please fetch the cash flow statement for Microsoft and tell me Capital Expenditure", "get_cash_flow_statement", {"ticker": "MSFT"}, id="cash-flow"),
+    ]
+)
+def test_classify_test_prompts(prompt: str, name: str, args: dict):
+    calls, _, confidence = classify(prompt)
+
+    assert confidence >= 0.8
+    assert [(c["name"], c["args"]) for c in calls] == [(name, args)]
+
+
+def test_multi_ticker_price_question_is_one_batched_call():
+    calls, _, _ = classify("Compare NVDA, AMD and INTC over the last 6 months")
+
+    assert [(c["name"], c["args"]) for c in calls] == [
+        ("get_historical_data_multi", {"tickers": ["NVDA", "AMD", "INTC"], "period": "6mo"})
+    ]
+
+
+@pytest.mark.parametrize("prompt", [
+    "What is the market open time for NVDA?",
+    "What was the price of Microsoft in March?",
+])
+def test_price_question_without_a_usable_range_falls_back(prompt: str):
+    assert route(prompt) == []
+
+
+def test_unrecognised_prompt_falls_back():
+    before = summary()["fallback"]
+
+    assert route("Should I be worried about the market?") == []
+    assert summary()["fallback"] == before + 1
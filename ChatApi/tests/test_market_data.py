@@ -0,0 +1,85 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+import yfinance as yf
+
+from ChatApi.benchmarks import fixtures
+from ChatApi.market_data import (
+    ChainedProvider, DataUnavailable, MarketDataProvider, SnapshotProvider, YFinanceProvider,
+    export_bundle, import_bundle, AS_OF
+)
+
+
+class Offline(MarketDataProvider):
+    name = "offline"
+
+    def info(self, ticker):
+        raise ConnectionError("no network")
+
+    def history(self, ticker, start, end, interval="1d"):
+        raise ConnectionError("no network")
+
+
+@pytest.fixture
+def snapshot(monkeypatch, tmp_path):
+    monkeypatch.setattr(yf, "Ticker", fixtures.FixtureTicker)
+    archive = export_bundle(["nvda", "AMD"], tmp_path / "bundle", YFinanceProvider(), period="1y", archive=True)
+    manifest = import_bundle(archive, tmp_path / "snapshot")
+    assert sorted(manifest["tickers"]) == ["AMD", "NVDA"]
+    return SnapshotProvider(tmp_path / "snapshot")
+
+
+def test_snapshot_round_trip(snapshot):
+    live = fixtures.FixtureTicker("NVDA")
+
+    info = snapshot.info("nvda")
+    assert info.pop(AS_OF) == snapshot.manifest["exported_at"]
+    assert info == live.get_info()
+    pd.testing.assert_frame_equal(snapshot.statement("NVDA", "balance_sheet"), live.get_balance_sheet(), check_freq=False)
+    start = (date.today() - timedelta(days=30)).isoformat()
+    history = snapshot.history("NVDA", start, date.today().isoformat())
+    assert history["Close"].tolist() == live.history(start=start, end=date.today().isoformat())["Close"].tolist()
+
+
+def test_chain_falls_back_to_partial_snapshot_when_offline(snapshot):
+    chain = ChainedProvider([snapshot, Offline()])
+    start = (date.today() - timedelta(days=30)).isoformat()
+    end = (date.today() + timedelta(days=1)).isoformat()
+
+    history = chain.history("NVDA", start, end)
+
+    # Today's bar was not exported, so the store is told the snapshot stops before it
+    assert history.attrs["covered_to"] == date.today().isoformat()
+    assert chain.stats()["fallbacks"] == 1 and chain.stats()["errors"] == 1
+
+    assert chain.info("AMD")["currentPrice"] == fixtures.FixtureTicker("AMD").get_info()["currentPrice"]
+    assert chain.stats()["hits"]["snapshot"] == 1
+
+
+def test_chain_raises_when_nobody_has_the_data(snapshot):
+    with pytest.raises(ConnectionError):
+        ChainedProvider([snapshot, Offline()]).info("TSLA")
+    with pytest.raises(DataUnavailable):
+        ChainedProvider([snapshot]).news("TSLA")
+
+
+def test_quotes_go_stale_before_statements(snapshot):
+    snapshot.exported_at = datetime.now().replace(microsecond=0) - timedelta(hours=2)
+    exported_at = snapshot.exported_at.isoformat()
+
+    with pytest.raises(DataUnavailable) as stale:
+        snapshot.info("NVDA")
+    # Still usable as a last resort, and says when it is from
+    assert stale.value.fallback[AS_OF] == exported_at
+    assert not snapshot.statement("NVDA", "balance_sheet").empty
+
+    chain = ChainedProvider([snapshot, Offline()])
+    assert chain.info("NVDA")[AS_OF] == exported_at
+    assert chain.stats()["fallbacks"] == 1
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import ChatApi.finance_tools as ft
+import ChatApi.model_registry as model_registry
+import ChatApi.trading_agent as ta
+from ChatApi import tool_selector
+from ChatApi.model_registry import ModelRegistry, parse_model_pairs
+
+
+def test_registry_reuses_models():
+    reg = ModelRegistry(max_entries=2)
+    tools = [ft.get_latest_news, ft.get_key_financial_metrics]
+
+    first = reg.get("granite4:350m", "granite4:1b", tools, {"num_thread": 2})
+    second = reg.get("granite4:350m", "granite4:1b", list(reversed(tools)), {"num_thread": 2})
+
+    assert first is second
+    assert reg.stats()["hits"] == 1
+    assert reg.stats()["misses"] == 1
+
+
+def test_registry_evicts_least_recently_used():
+    reg = ModelRegistry(max_entries=2)
+    tools = [ft.get_latest_news]
+
+    reg.get("a", "a", tools)
+    reg.get("b", "b", tools)
+    reg.get("a", "a", tools)
+    reg.get("c", "c", tools)
+
+    stats = reg.stats()
+    assert stats["evictions"] == 1
+    assert [k["tool_model"] for k in stats["keys"]] == ["a", "c"]
+
+
+def test_parse_model_pairs():
+    assert parse_model_pairs("granite4:350m|granite4:1b, granite4:1b") == [
+        ("granite4:350m", "granite4:1b"),
+        ("granite4:1b", "granite4:1b"),
+    ]
+
+
+def test_warm_up_builds_the_subsets_requests_bind(monkeypatch):
+    reg = ModelRegistry()
+    monkeypatch.setattr(model_registry, "registry", reg)
+    monkeypatch.setattr(model_registry, "preload_model", lambda model: None)
+    options = {"num_thread": 2}
+
+    model_registry.warm_models([("granite4:350m", "granite4:1b")], tool_selector.warm_subsets(ta.tool_list), options)
+    warmed = reg.stats()["misses"]
+    reg.get("granite4:350m", "granite4:1b", ta.bound_tools("Any headlines about Apple?"), options)
+    reg.get("granite4:350m", "granite4:1b", ta.bound_tools("How much debt does Microsoft have on its balance sheet?"), options)
+
+    assert warmed > 1
+    assert reg.stats()["hits"] == 2 and reg.stats()["misses"] == warmed
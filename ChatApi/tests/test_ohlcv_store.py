@@ -0,0 +1,115 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from ChatApi.ohlcv_store import OHLCVStore, missing_ranges, resolve_range
+
+
+class FakeUpstream:
+    def __init__(self):
+        self.calls = []
+        self.offline = False
+
+    def __call__(self, ticker, start, end, interval):
+        if self.offline:
+            raise ConnectionError("offline")
+        self.calls.append((start, end))
+        index = pd.date_range(start, end, freq="B", inclusive="left", tz="America/New_York")
+        return pd.DataFrame({
+            "Open": 1.0, "High": 2.0, "Low": 0.5,
+            "Close": np.arange(len(index), dtype=float),
+            "Volume": 1000, "Dividends": 0.0, "Stock Splits": 0.0
+        }, index=index)
+
+
+def test_only_missing_dates_are_fetched(tmp_path):
+    store = OHLCVStore(tmp_path)
+    upstream = FakeUpstream()
+
+    store.get("MSFT", "5d", "2025-10-30", fetch=upstream)
+    hist = store.get("MSFT", "1mo", "2025-10-20", fetch=upstream)
+
+    assert upstream.calls == [("2025-10-30", "2025-11-04"), ("2025-10-20", "2025-10-30"), ("2025-11-04", "2025-11-20")]
+    assert hist.index.is_monotonic_increasing
+    assert str(hist.index[0].date()) == "2025-10-20"
+
+
+def test_held_ranges_are_served_offline(tmp_path):
+    store = OHLCVStore(tmp_path)
+    upstream = FakeUpstream()
+    first = store.get("msft", "5d", "2025-10-30", fetch=upstream)
+
+    upstream.offline = True
+    second = store.get("MSFT", "5d", "2025-10-30", fetch=upstream)
+
+    assert len(upstream.calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_get_many_batches_shared_gaps(tmp_path):
+    store = OHLCVStore(tmp_path)
+    upstream = FakeUpstream()
+    batches = []
+
+    def fetch_many(tickers, start, end, interval):
+        batches.append(list(tickers))
+        return pd.concat({t: upstream(t, start, end, interval) for t in tickers}, axis=1)
+
+    store.get("AMD", "5d", "2025-10-30", fetch=upstream)
+    frames = store.get_many(["nvda", "AMD", "INTC"], "5d", "2025-10-30", fetch_many=fetch_many)
+
+    assert batches == [["NVDA", "INTC"]]
+    assert list(frames) == ["NVDA", "AMD", "INTC"]
+    pd.testing.assert_frame_equal(frames["AMD"], frames["NVDA"])
+
+
+def test_ticker_failing_in_a_batch_is_fetched_again(tmp_path):
+    store = OHLCVStore(tmp_path)
+    upstream = FakeUpstream()
+    failing = {"XYZ"}
+
+    def fetch_many(tickers, start, end, interval):
+        frames = {t: upstream(t, start, end, interval) for t in tickers}
+        # yf.download keeps a failed ticker's columns, all NaN
+        for t in failing & set(tickers):
+            frames[t] = frames[t] * np.nan
+        return pd.concat(frames, axis=1)
+
+    frames = store.get_many(["NVDA", "XYZ"], "5d", "2025-10-30", fetch_many=fetch_many)
+    assert frames["XYZ"].empty and len(frames["NVDA"]) == 3
+    assert store.stats()["upstream_errors"] == 1
+
+    failing.clear()
+    upstream.calls.clear()
+    frames = store.get_many(["NVDA", "XYZ"], "5d", "2025-10-30", fetch_many=fetch_many)
+    assert upstream.calls == [("2025-10-30", "2025-11-04")]
+    pd.testing.assert_frame_equal(frames["XYZ"], frames["NVDA"])
+
+
+def test_empty_answer_is_not_recorded_as_covered(tmp_path):
+    store = OHLCVStore(tmp_path)
+    upstream = FakeUpstream()
+
+    assert store.get("MSFT", "5d", "2025-10-30", fetch=lambda *args: pd.DataFrame(columns=["Close"])).empty
+    assert len(store.get("MSFT", "5d", "2025-10-30", fetch=upstream)) == 3
+    assert upstream.calls == [("2025-10-30", "2025-11-04")]
+
+
+def test_missing_ranges():
+    coverage = [(date(2025, 1, 5), date(2025, 1, 10))]
+
+    assert missing_ranges(coverage, date(2025, 1, 1), date(2025, 1, 20)) == [
+        (date(2025, 1, 1), date(2025, 1, 5)),
+        (date(2025, 1, 10), date(2025, 1, 20)),
+    ]
+
+
+def test_resolve_range_with_start():
+    assert resolve_range("1d", "2025-10-31", today=date(2025, 12, 1)) == (date(2025, 10, 31), date(2025, 11, 1), None)
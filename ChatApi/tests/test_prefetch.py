@@ -0,0 +1,61 @@
+import sys
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+
+import ChatApi.prefetch as prefetch
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(prefetch, "prefetch_executor", executor)
+    monkeypatch.setattr(prefetch, "stats", {k: 0 for k in prefetch.stats})
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_only_calls_with_the_same_arguments_are_hits(monkeypatch, executor):
+    monkeypatch.setattr(prefetch, "PREFETCHES", {
+        "get_key_financial_metrics": ({}, lambda ticker: "q" * 100),
+        "get_historical_data": ({"period": "1mo"}, lambda ticker, period: "h" * 1000),
+    })
+    speculation = prefetch.Speculation("How are Nvidia and AMD doing")
+    for future in speculation.futures.values():
+        future.result()
+
+    speculation.resolve([
+        {"name": "get_key_financial_metrics", "args": {"ticker": "nvda"}},
+        {"name": "get_historical_data", "args": {"ticker": "AMD", "period": "1y"}},
+    ])
+    executor.shutdown(wait=True)
+
+    summary = prefetch.summary()
+    assert summary["prefetched"] == 4 and summary["hits"] == 1
+    assert summary["hit_rate"] == 0.25
+    # Nvidia's history and both of AMD's fetches were not used
+    assert summary["wasted_bytes"] == 1000 + 100 + 1000
+
+
+def test_unused_prefetches_are_cancelled(monkeypatch, executor):
+    started, release = threading.Event(), threading.Event()
+    monkeypatch.setattr(prefetch, "PREFETCHES", {
+        "get_key_financial_metrics": ({}, lambda ticker: started.set() or release.wait() and "q" * 100),
+        "get_historical_data": ({"period": "1mo"}, lambda ticker, period: "h" * 1000),
+    })
+    speculation = prefetch.Speculation("Compare Nvidia and AMD")
+
+    # One worker, the first fetch is running and the other three are still queued
+    started.wait(1)
+    speculation.resolve([])
+    release.set()
+    executor.shutdown(wait=True)
+
+    summary = prefetch.summary()
+    assert summary["hits"] == 0 and summary["cancelled"] == 3
+    assert summary["wasted_bytes"] == 100
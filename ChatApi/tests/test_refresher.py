@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import time
+
+import ChatApi.refresher as rf
+from ChatApi.data_cache import cache, make_key
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+
+    def fetch(self):
+        self.calls += 1
+        time.sleep(0.05)
+        if self.failing:
+            raise ConnectionError("upstream down")
+        return {"currentPrice": float(self.calls)}
+
+
+def wait_idle(refresher: rf.Refresher):
+    deadline = time.monotonic() + 2
+    while refresher._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_hot_ticker_is_served_stale_while_it_refreshes(monkeypatch):
+    cache.clear()
+    refresher = rf.Refresher(watchlist=["NVDA"], breaker=rf.CircuitBreaker(threshold=2, cooldown=60))
+    monkeypatch.setattr(cache, "revalidate", refresher.revalidate)
+    upstream = Upstream()
+    hot, cold = make_key("get_key_financial_metrics", "NVDA"), make_key("get_key_financial_metrics", "AMD")
+
+    cache.get_or_fetch(hot, 0.01, upstream.fetch)
+    cache.get_or_fetch(cold, 0.01, upstream.fetch)
+    time.sleep(0.02)
+
+    started = time.monotonic()
+    assert cache.get_or_fetch(hot, 60, upstream.fetch) == {"currentPrice": 1.0}
+    assert time.monotonic() - started < 0.05
+    wait_idle(refresher)
+    assert cache.get_or_fetch(hot, 60, upstream.fetch) == {"currentPrice": 3.0}
+
+    # Not hot, the request waits on the fetch as before
+    assert cache.get_or_fetch(cold, 60, upstream.fetch) == {"currentPrice": 4.0}
+    assert refresher.refreshed == 1
+
+
+def test_breaker_opens_and_keeps_the_last_good_value(monkeypatch):
+    cache.clear()
+    refresher = rf.Refresher(watchlist=["NVDA"], breaker=rf.CircuitBreaker(threshold=2, cooldown=60))
+    monkeypatch.setattr(cache, "revalidate", refresher.revalidate)
+    upstream = Upstream()
+    key = make_key("get_key_financial_metrics", "NVDA")
+    cache.get_or_fetch(key, 0.01, upstream.fetch)
+    upstream.failing = True
+
+    for _ in range(3):
+        time.sleep(0.02)
+        assert cache.get_or_fetch(key, 0.01, upstream.fetch) == {"currentPrice": 1.0}
+        wait_idle(refresher)
+
+    assert refresher.breaker.state == "open"
+    assert refresher.failed == 2 and refresher.skipped == 1
+    assert upstream.calls == 3
+
+
+def test_refresh_due_warms_top_tickers_near_expiry(monkeypatch):
+    cache.clear()
+    fetched = []
+    monkeypatch.setattr(rf, "REFRESHES", {"get_key_financial_metrics": lambda ticker: fetched.append(ticker)})
+    refresher = rf.Refresher(watchlist=[], top_n=1)
+    for ticker in ["msft", "MSFT", "aapl", "MSFT"]:
+        refresher.record({"ticker": ticker})
+    refresher.record({"tickers": ["AAPL", "NVDA"]})
+
+    refresher.refresh_due()
+    wait_idle(refresher)
+
+    assert refresher.hot == {"MSFT"}
+    assert fetched == ["MSFT"]
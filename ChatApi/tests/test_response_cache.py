@@ -0,0 +1,164 @@
+import sys
+import time
+import json
+import asyncio
+from types import SimpleNamespace
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import ChatApi.trading_agent as ta
+import pandas as pd
+
+from ChatApi.data_cache import DataCache, tracking
+from ChatApi.ohlcv_store import OHLCVStore
+from ChatApi.response_cache import ResponseCache
+
+
+class QuoteTool:
+    """Reads through a data cache with a short TTL, like the finance tools."""
+
+    def __init__(self, cache: DataCache, ttl: float):
+        self.cache = cache
+        self.ttl = ttl
+
+    def invoke(self, args):
+        return json.dumps(self.cache.get_or_fetch(("quote", args["ticker"]), self.ttl, lambda: {"price": 1.0}))
+
+
+class PastHistoryTool:
+    """Reads a range of completed days through the OHLCV store."""
+
+    def __init__(self, store: OHLCVStore):
+        self.store = store
+
+    def invoke(self, args):
+        def fetch(ticker, start, end, interval):
+            index = pd.date_range(start, end, freq="B", inclusive="left", tz="America/New_York")
+            return pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 1.0,
+                                 "Dividends": 0.0, "Stock Splits": 0.0}, index=index)
+        return self.store.get(args["ticker"], "1mo", "2025-01-02", fetch=fetch).to_json()
+
+
+class CountingChatModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, chat):
+        self.calls += 1
+        return SimpleNamespace(content="Nvidia trades at 1.0", usage_metadata=None)
+
+    async def astream(self, chat):
+        self.calls += 1
+        for word in ["Nvidia ", "trades ", "at 1.0"]:
+            yield SimpleNamespace(content=word, usage_metadata=None)
+
+
+def setup_agent(monkeypatch, ttl: float) -> CountingChatModel:
+    chat_model = CountingChatModel()
+    monkeypatch.setattr(ta, "response_cache", ResponseCache())
+    monkeypatch.setitem(ta.tool_mapping, "quote", QuoteTool(DataCache(), ttl))
+    monkeypatch.setattr(ta, "initialise_models", lambda *args: {"chat_model": chat_model})
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [
+        {"name": "quote", "args": {"ticker": "NVDA"}, "id": "1", "type": "tool_call"}
+    ])
+    return chat_model
+
+
+def test_tracking_collects_the_expiry_of_data_read():
+    cache = DataCache()
+    with tracking() as expiries:
+        cache.get_or_fetch("a", 60, lambda: 1)
+        cache.get_or_fetch("a", 60, lambda: 2)
+        cache.get_or_fetch("b", 5, lambda: 3)
+    cache.get_or_fetch("c", 5, lambda: 4)
+
+    assert len(expiries) == 3
+    assert expiries[0] == expiries[1]
+    assert 0 < min(expiries) - time.monotonic() <= 5
+
+
+def test_shared_tool_call_counts_for_every_caller(monkeypatch):
+    monkeypatch.setitem(ta.tool_mapping, "quote", QuoteTool(DataCache(), 60))
+    memo = {}
+
+    async def item(call_id: str):
+        with tracking() as expiries:
+            await ta.aexecute_tools([{"name": "quote", "args": {"ticker": "NVDA"}, "id": call_id}], memo=memo)
+        return expiries
+
+    async def run():
+        return await asyncio.gather(item("1"), item("2"))
+
+    first, second = asyncio.run(run())
+
+    assert len(memo) == 1
+    assert len(first) == len(second) == 1 and first == second
+
+
+def test_answer_expires_with_the_earliest_data():
+    cache = ResponseCache()
+    calls = [{"name": "get_key_financial_metrics", "args": {"ticker": "NVDA"}}]
+
+    assert cache.put("Price of Nvidia?", "t", "c", "It is 1.0", calls, [time.monotonic() + 60, time.monotonic() + 0.05])
+    assert cache.get("Price of  Nvidia", "t", "c")["response"] == "It is 1.0"
+    assert cache.get("Price of Nvidia", "t", "other") is None
+    time.sleep(0.06)
+    assert cache.get("Price of Nvidia", "t", "c") is None
+
+    # Tools called but no data read, e.g. every fetch failed
+    assert not cache.put("Price of Nvidia", "t", "c", "Sorry", calls, [])
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["uncacheable"] == 1 and stats["bytes"] == 0
+
+
+def test_memory_is_bounded():
+    cache = ResponseCache(max_bytes=300)
+    for i in range(5):
+        cache.put(f"prompt {i}", "t", "c", "x" * 100, [], [])
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 300 and stats["evictions"] >= 2
+    assert cache.get("prompt 4", "t", "c") is not None
+
+
+def test_repeat_question_skips_the_models_until_its_data_expires(monkeypatch):
+    chat_model = setup_agent(monkeypatch, ttl=0.3)
+
+    first = asyncio.run(ta.aprompt_model("How is Nvidia priced?", "t", "c"))
+    second = asyncio.run(ta.aprompt_model("How is Nvidia priced?", "t", "c"))
+    assert chat_model.calls == 1
+    assert second == first
+
+    time.sleep(0.35)
+    asyncio.run(ta.aprompt_model("How is Nvidia priced?", "t", "c"))
+    assert chat_model.calls == 2
+
+
+def test_cached_answer_replays_through_the_stream(monkeypatch):
+    chat_model = setup_agent(monkeypatch, ttl=60)
+
+    async def events(prompt: str) -> list[dict]:
+        return [json.loads(f[len("data: "):]) async for f in ta.astream_response(prompt, "t", "c")]
+
+    live = asyncio.run(events("How is Nvidia priced?"))
+    replayed = asyncio.run(events("How is Nvidia priced?"))
+
+    assert chat_model.calls == 1
+    assert [e["type"] for e in replayed] == ["tool", "tool_done", "text", "done"]
+    assert [e["type"] for e in live[:2]] == ["tool", "tool_done"]
+    assert replayed[2]["content"] == "".join(e["content"] for e in live if e["type"] == "text")
+    assert ta.response_cache.stats()["hits"] == 1
+
+
+def test_answer_from_completed_days_is_cached(monkeypatch, tmp_path):
+    chat_model = setup_agent(monkeypatch, ttl=60)
+    monkeypatch.setitem(ta.tool_mapping, "quote", PastHistoryTool(OHLCVStore(tmp_path, historical_ttl=60)))
+
+    first = asyncio.run(ta.aprompt_model("How did Nvidia do in January 2025?", "t", "c"))
+    second = asyncio.run(ta.aprompt_model("How did Nvidia do in January 2025?", "t", "c"))
+
+    assert chat_model.calls == 1
+    assert second == first
+    assert ta.response_cache.stats()["stores"] == 1
@@ -0,0 +1,53 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+
+from ChatApi.scheduler import Scheduler, QueueFull
+
+
+def test_priority_order_and_queue_full():
+    async def run():
+        scheduler = Scheduler(max_queue=2, max_active=1, per_model_limit=1, n_cores=8)
+        first = scheduler.admit(("a", "b"))
+        low = scheduler.admit(("a", "b"), "low")
+        high = scheduler.admit(("a", "b"), "high")
+        assert first.granted.is_set()
+        assert scheduler.position(high) == 1 and scheduler.position(low) == 2
+
+        with pytest.raises(QueueFull):
+            scheduler.admit(("a", "b"))
+
+        positions = []
+        async def waiter():
+            async for position in scheduler.wait(low):
+                positions.append(position)
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        scheduler.release(first)
+        assert high.granted.is_set() and not low.granted.is_set()
+        await asyncio.sleep(0.01)
+        scheduler.release(high)
+        await asyncio.wait_for(task, 1)
+        assert positions == [2, 1]
+        assert scheduler.stats()["rejected"] == 1
+
+    asyncio.run(run())
+
+
+def test_per_model_limit_and_thread_split():
+    async def run():
+        scheduler = Scheduler(max_queue=4, max_active=4, per_model_limit=1, n_cores=8)
+        a = scheduler.admit(("m1", "m1"))
+        b = scheduler.admit(("m1", "m2"))
+        c = scheduler.admit(("m3", "m4"))
+        assert a.granted.is_set() and c.granted.is_set()
+        assert not b.granted.is_set()
+        assert a.threads() == 2
+
+    asyncio.run(run())
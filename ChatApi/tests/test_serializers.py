@@ -0,0 +1,83 @@
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from ChatApi import serializers
+from ChatApi.serializers import compact_statement, compact_time_series, estimate_tokens, format_number
+
+
+def test_format_number():
+    assert format_number(245_122_000_000.0) == "245.12B"
+    assert format_number(512.3456) == "512.35"
+    assert format_number(0.012345) == "0.01235"
+    assert format_number(float("nan")) == ""
+
+
+def test_long_history_is_downsampled_within_budget():
+    index = pd.date_range("2000-01-01", periods=5000, freq="B")
+    hist = pd.DataFrame({
+        "Open": 1.0, "High": np.linspace(2, 500, 5000), "Low": 0.5,
+        "Close": np.linspace(1, 400, 5000), "Volume": 1_000_000,
+        "Dividends": 0.0, "Stock Splits": 0.0
+    }, index=index)
+
+    output = compact_time_series(hist, "get_historical_data", token_budget=500)
+
+    assert estimate_tokens(output) <= 500
+    assert "Dividends" not in output
+    # Aggregation keeps the extremes and the final close
+    assert "|500|" in output
+    assert output.splitlines()[-1].split("|")[4] == "400"
+
+
+def test_splits_survive_downsampling():
+    index = pd.date_range("2020-01-01", periods=1000, freq="B")
+    splits = np.zeros(1000)
+    splits[500], splits[900], splits[901] = 4.0, 2.0, 3.0
+    hist = pd.DataFrame({
+        "Open": 1.0, "High": 2.0, "Low": 0.5, "Close": 1.0, "Volume": 1000,
+        "Dividends": 0.0, "Stock Splits": splits
+    }, index=index)
+
+    output = compact_time_series(hist, "get_historical_data", token_budget=300)
+
+    rows = output.splitlines()
+    assert rows[0].startswith("# each row aggregates")
+    ratios = [row.split("|")[-1] for row in rows[2:] if row.split("|")[-1] != "0"]
+    # Two splits merged into one row compound
+    assert ratios == ["4", "6"]
+
+
+def test_downsample_header_describes_the_emitted_table():
+    index = pd.date_range("2020-01-01", periods=1000, freq="B")
+    closes = pd.DataFrame({"NVDA": np.linspace(1, 2, 1000), "AMD": np.linspace(3, 4, 1000)}, index=index)
+
+    rows = compact_time_series(closes, "get_historical_data_multi", token_budget=200).splitlines()
+
+    assert rows[0].endswith(f"1000 periods in {len(rows) - 2} rows (NVDA=last, AMD=last)")
+    assert rows[1] == "Date|NVDA|AMD"
+
+
+def test_output_size_is_counted_in_bytes():
+    serializers.record("bytes_test", 10, "caf\u00e9", time.perf_counter())
+
+    assert serializers.summary()["bytes_test"]["output_bytes"] == 5
+
+
+def test_statement_keeps_key_items_first():
+    columns = pd.to_datetime(["2024-06-30", "2025-06-30"])
+    index = [f"Item{i}" for i in range(100)] + ["TotalAssets"]
+    statement = pd.DataFrame(1e9, index=index, columns=columns)
+
+    output = compact_statement(statement, "get_balance_sheet", token_budget=200)
+    lines = output.splitlines()
+
+    assert lines[0] == "Item|2025-06-30|2024-06-30"
+    assert lines[1].startswith("TotalAssets|")
+    assert lines[-1].endswith("more line items omitted")
@@ -0,0 +1,153 @@
+import sys
+import asyncio
+from types import SimpleNamespace
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import httpx
+import pytest
+from langchain.messages import AIMessage
+
+import ChatApi.trading_agent as ta
+from ChatApi.sessions import Session, SessionStore, SessionNotFound, SessionBusy, SUMMARY_MARK
+from ChatApi.response_cache import ResponseCache
+
+SYSTEM = [{"role": "system", "content": "You are a financial analysis assistant."}]
+
+
+def add_turn(session: Session, prompt: str, tool_output: str, answer: str) -> list[dict]:
+    chat = session.chat(prompt)
+    chat.append({"role": "tool", "tool_call_id": "1", "name": "get_balance_sheet", "content": tool_output})
+    session.commit(chat, answer)
+    return chat
+
+
+class RecordingToolModel:
+    def __init__(self):
+        self.chats = []
+
+    async def ainvoke(self, chat):
+        self.chats.append(list(chat))
+        return AIMessage(content="", tool_calls=[
+            {"name": "statement", "args": {"ticker": "MSFT"}, "id": str(len(self.chats)), "type": "tool_call"}
+        ])
+
+
+class SlowChatModel:
+    def __init__(self):
+        self.answers = 0
+
+    async def ainvoke(self, chat):
+        await asyncio.sleep(0.05)
+        self.answers += 1
+        return SimpleNamespace(content=f"answer {self.answers}", usage_metadata=None)
+
+
+def test_follow_up_prompt_extends_the_previous_one():
+    session = Session("s", SYSTEM)
+    first = add_turn(session, "Balance sheet for Microsoft", "Total Assets 100", "Assets are 100")
+
+    second = session.chat("And its debt?")
+
+    assert second[:len(first)] == first
+    assert second[len(first):] == [
+        {"role": "assistant", "content": "Assets are 100"},
+        {"role": "user", "content": "And its debt?"}
+    ]
+
+
+def test_history_is_compacted_under_the_budget():
+    session = Session("s", SYSTEM, token_budget=1000)
+    table = "\n".join(f"Row {i},{i * 1000},{i * 2000}" for i in range(200))
+    add_turn(session, "Balance sheet for Microsoft", table, "Here it is")
+    add_turn(session, "And for Apple", "Total Assets 100", "Here it is")
+
+    # Shortening the older tool output is enough, no turn is dropped
+    assert len(session.turns) == 2
+    assert session.turns[0][1]["content"].startswith(SUMMARY_MARK)
+    assert session.turns[1][1]["content"] == "Total Assets 100"
+
+    for ticker in ["Nvidia", "Tesla", "Amazon", "Google", "Meta"]:
+        add_turn(session, f"And for {ticker}", table[:2000], "Here it is")
+        assert session.tokens <= 1000
+    # The oldest turns went, the latest is kept whole
+    assert session.turns[0][0]["content"] != "Balance sheet for Microsoft"
+    assert session.turns[-1][0]["content"] == "And for Meta"
+    assert session.turns[-1][1]["content"] == table[:2000]
+    assert session.history()[0] == SYSTEM[0]
+
+
+def test_idle_sessions_expire_and_the_store_is_bounded():
+    store = SessionStore(ttl=60, max_sessions=2)
+    first, second = store.create(SYSTEM), store.create(SYSTEM)
+    store.get(first.id)
+    store.create(SYSTEM)
+
+    # Least recently used goes first
+    with pytest.raises(SessionNotFound):
+        store.get(second.id)
+
+    store.ttl = 0
+    with pytest.raises(SessionNotFound):
+        store.get(first.id)
+    assert store.stats()["sessions"] == 0
+
+
+def test_follow_ups_see_the_conversation_and_run_in_order(monkeypatch):
+    tool_model, chat_model = RecordingToolModel(), SlowChatModel()
+    routed = []
+    monkeypatch.setattr(ta, "response_cache", ResponseCache())
+    monkeypatch.setitem(ta.tool_mapping, "statement", SimpleNamespace(invoke=lambda args: "Total Debt 5"))
+    monkeypatch.setattr(ta, "initialise_models", lambda *args: {"tool_model": tool_model, "chat_model": chat_model})
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: routed.append(prompt) or [])
+    session = ta.sessions.Session("s", SYSTEM)
+
+    async def run():
+        return await asyncio.gather(
+            ta.aprompt_model("Balance sheet for Microsoft", "t", "c", session=session),
+            ta.aprompt_model("And its debt?", "t", "c", session=session),
+        )
+
+    first, second = asyncio.run(run())
+
+    assert first["response"] == "answer 1" and second["response"] == "answer 2"
+    # The follow-up was decided by the model with the first answer in front of it
+    assert routed == ["Balance sheet for Microsoft"]
+    assert {"role": "assistant", "content": "answer 1"} in tool_model.chats[1]
+    assert len(session.turns) == 2
+    assert ta.response_cache.stats()["stores"] == 0
+
+
+def test_busy_session_is_turned_away_before_it_takes_a_slot():
+    from ChatApi.main import app
+    from ChatApi.scheduler import scheduler
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session_id = (await client.post("/agent/trading/sessions")).json()["session_id"]
+            session = ta.sessions.session_store.get(session_id)
+            # The first turn is still being answered
+            session.claim()
+            admitted = scheduler.admitted
+            body = {"tool_model": "t", "chat_model": "c", "prompt": "And its debt?", "session_id": session_id}
+            chat = await client.post("/agent/trading/chat", json=body)
+            stream = await client.post("/agent/trading/chat/stream", json=body)
+            session.release()
+            await client.delete(f"/agent/trading/sessions/{session_id}")
+            return chat.status_code, stream.status_code, scheduler.admitted - admitted
+
+    assert asyncio.run(run()) == (409, 409, 0)
+
+
+def test_claimed_session_is_not_evicted():
+    store = SessionStore(max_sessions=1)
+    first = store.create(SYSTEM)
+    first.claim()
+    with pytest.raises(SessionBusy):
+        first.claim()
+
+    store.create(SYSTEM)
+    assert store.get(first.id) is first
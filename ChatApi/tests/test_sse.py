@@ -0,0 +1,130 @@
+import sys
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import ChatApi.trading_agent as ta
+from ChatApi import sse
+from ChatApi.scheduler import Scheduler
+
+
+class EndlessChatModel:
+    def __init__(self):
+        self.closed = False
+
+    async def astream(self, chat):
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield SimpleNamespace(content="token ", usage_metadata=None)
+        finally:
+            self.closed = True
+
+
+async def tokens(count: int, delay: float):
+    yield {"type": "tool", "name": "t", "args": {}}
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield {"type": "text", "content": f"{i} "}
+    yield {"type": "done"}
+
+
+def iter_tokens(count: int):
+    for i in range(count):
+        yield {"type": "text", "content": f"{i} "}
+
+
+async def no_tool_calls(*args):
+    return
+    yield
+
+
+def collect(frames) -> list[str]:
+    async def run():
+        return [f async for f in frames]
+    return asyncio.run(run())
+
+
+def parse(frames: list[str]) -> list[dict]:
+    return [json.loads(f[len("data: "):]) for f in frames if f.startswith("data: ")]
+
+
+def test_text_is_coalesced_after_the_first_chunk():
+    events = parse(collect(sse.stream(tokens(40, 0.005), policy=sse.FlushPolicy(window_ms=50))))
+    text = [e["content"] for e in events if e["type"] == "text"]
+
+    assert events[0]["type"] == "tool" and events[-1]["type"] == "done"
+    assert text[0] == "0 "
+    assert "".join(text) == "".join(f"{i} " for i in range(40))
+    assert len(text) < 15
+
+
+def test_flush_window_of_zero_sends_every_chunk():
+    frames = list(sse.frames(iter_tokens(5), sse.FlushPolicy(window_ms=0)))
+
+    assert len(parse(frames)) == 5
+
+
+def test_idle_stream_gets_keepalives():
+    async def slow():
+        await asyncio.sleep(0.35)
+        yield {"type": "done"}
+
+    frames = collect(sse.stream(slow(), keepalive=0.1))
+
+    assert frames.count(sse.KEEPALIVE_FRAME) >= 2
+    assert parse(frames) == [{"type": "done"}]
+
+
+def test_disconnect_stops_the_model_generation(monkeypatch):
+    chat_model = EndlessChatModel()
+    monkeypatch.setattr(ta, "initialise_models", lambda *args: {"chat_model": chat_model})
+    monkeypatch.setattr(ta, "astream_tool_calls", no_tool_calls)
+    started = time.monotonic()
+
+    async def is_disconnected():
+        return time.monotonic() - started > 0.2
+
+    async def run():
+        frames = [f async for f in sse.stream(ta.astream_events("p", "t", "c"), is_disconnected)]
+        # Let cancellations delivered to the producer settle before checking
+        await asyncio.sleep(0.05)
+        return frames
+
+    frames = asyncio.run(run())
+
+    assert time.monotonic() - started < 0.6
+    assert parse(frames)[-1]["type"] == "text"
+    assert chat_model.closed
+
+
+def test_slot_is_released_when_the_response_never_starts():
+    async def run():
+        scheduler = Scheduler(max_queue=2, max_active=1, per_model_limit=1, n_cores=2)
+        ticket = scheduler.admit(("a", "b"))
+        started = []
+
+        async def events():
+            started.append(True)
+            yield {"type": "done"}
+
+        async def receive():
+            await asyncio.sleep(10)
+
+        async def send(message):
+            raise OSError("connection reset")
+
+        response = sse.EventStreamResponse(sse.stream(events()), on_close=lambda: scheduler.release(ticket))
+        try:
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        except Exception:
+            pass
+        assert not started
+        assert scheduler.stats()["active"] == 0
+
+    asyncio.run(run())
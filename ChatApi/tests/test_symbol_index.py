@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import difflib
+
+import pytest
+
+from ChatApi.symbol_index import SymbolIndex, index
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("MSFT", "MSFT"),
+        ("msft", "MSFT"),
+        ("Microsoft Corporation", "MSFT"),
+        ("Coca-Cola", "KO"),
+        ("nvidea", "NVDA"),
+        ("BRK.B", "BRK-B"),
+        ("$TSLA", "TSLA"),
+        ("ZZZZ", "ZZZZ"),
+        # Real tickers close to a known name or alias stay as they are
+        ("SOFI", "SOFI"),
+        ("COKE", "COKE"),
+        ("AMDL", "AMDL"),
+        ("PEPS", "PEPS"),
+        ("VISA", "VISA"),
+        ("visa", "V"),
+        ("some company", None),
+    ]
+)
+def test_normalize_ticker_arg(value: str, expected: str):
+    assert index.normalize_ticker_arg(value) == expected
+
+
+def test_extract_tickers_from_prompt():
+    assert index.extract_tickers("Compare Bank of America, NVDA and ASML's margins") == ["BAC", "NVDA", "ASML"]
+
+
+def test_common_word_names_need_capitals():
+    assert index.extract_tickers("what is the target price for the apple of my eye") == []
+    assert index.extract_tickers("What is the price of Apple") == ["AAPL"]
+
+
+def test_shouted_prompt_only_yields_known_tickers():
+    assert index.extract_tickers("WHAT IS THE PRICE OF TESLA") == ["TSLA"]
+    assert index.extract_tickers("HOW DID GDP AFFECT NVDA AND $SOFI NOW") == ["NVDA", "SOFI"]
+    assert index.extract_tickers("Is PLTR or XYZQ cheaper") == ["PLTR"]
+
+
+def test_fuzzy_lookups_are_narrowed_and_cached(monkeypatch):
+    symbols = SymbolIndex([
+        {"ticker": "MSFT", "name": "Microsoft Corporation"},
+        {"ticker": "MU", "name": "Micron Technology"},
+        {"ticker": "NVDA", "name": "NVIDIA Corporation"},
+    ])
+    compared = []
+    close_matches = difflib.get_close_matches
+    monkeypatch.setattr(difflib, "get_close_matches", lambda key, candidates, **kw: compared.append(list(candidates)) or close_matches(key, candidates, **kw))
+
+    assert symbols.resolve("Microsft") == "MSFT"
+    assert symbols.resolve("Samsung Electronics") is None
+    assert symbols.resolve("Samsung Electronics") is None
+    assert symbols.resolve("Microsft") == "MSFT"
+
+    # Only same initial, similar length phrases are compared, and each key once
+    assert compared == [["microsoft"], []]
@@ -0,0 +1,275 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+
+from langchain.messages import AIMessage
+
+import ChatApi.trading_agent as ta
+from ChatApi.data_cache import DataCache
+
+
+class SlowTool:
+    def __init__(self, delay: float, output: str):
+        self.delay = delay
+        self.output = output
+
+    def invoke(self, args):
+        time.sleep(self.delay)
+        return self.output
+
+
+def test_tools_run_concurrently_in_call_order(monkeypatch):
+    monkeypatch.setitem(ta.tool_mapping, "slow", SlowTool(0.3, "slow"))
+    monkeypatch.setitem(ta.tool_mapping, "fast", SlowTool(0.1, "fast"))
+    tool_calls = [
+        {"name": "slow", "args": {}, "id": "1"},
+        {"name": "fast", "args": {}, "id": "2"},
+        {"name": "slow", "args": {}, "id": "3"},
+    ]
+
+    started = time.monotonic()
+    results = ta.execute_tools(tool_calls)
+    elapsed = time.monotonic() - started
+
+    assert [r["tool_call_id"] for r in results] == ["1", "2", "3"]
+    assert [r["content"] for r in results] == ["slow", "fast", "slow"]
+    assert elapsed < 0.6
+
+
+def test_tool_timeout_is_reported(monkeypatch):
+    monkeypatch.setitem(ta.tool_mapping, "slow", SlowTool(0.5, "slow"))
+    tool_calls = [{"name": "slow", "args": {}, "id": "1"}]
+
+    results = asyncio.run(ta.aexecute_tools(tool_calls, timeout=0.1))
+
+    assert "error" in json.loads(results[0]["content"])
+
+
+def test_unknown_tool_returns_error():
+    result = ta.execute_tool({"name": "missing_tool", "args": {}, "id": "1"})
+
+    assert ta.is_error(result)
+
+
+def test_memo_runs_identical_calls_once(monkeypatch):
+    counter = SlowTool(0.1, "out")
+    calls = []
+    monkeypatch.setitem(ta.tool_mapping, "counted", counter)
+    monkeypatch.setattr(counter, "invoke", lambda args: calls.append(args) or "out")
+    memo = {}
+
+    async def run():
+        first = ta.aexecute_tools([{"name": "counted", "args": {"ticker": "msft"}, "id": "1"}], memo=memo)
+        second = ta.aexecute_tools([{"name": "counted", "args": {"ticker": "MSFT"}, "id": "2"}], memo=memo)
+        return await asyncio.gather(first, second)
+
+    first, second = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert first[0]["tool_call_id"] == "1" and second[0]["tool_call_id"] == "2"
+    assert second[0]["content"] == "out"
+
+
+class FlakyQuoteTool:
+    """Fails on its first call, then reads through a data cache with the given TTL."""
+
+    def __init__(self, ttl: float):
+        self.cache = DataCache()
+        self.ttl = ttl
+        self.calls = 0
+
+    def invoke(self, args):
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionError("upstream unavailable")
+        return json.dumps(self.cache.get_or_fetch(("quote", self.calls), self.ttl, lambda: {"price": self.calls}))
+
+
+def test_memo_runs_a_failed_call_again(monkeypatch):
+    tool = FlakyQuoteTool(60)
+    monkeypatch.setitem(ta.tool_mapping, "flaky", tool)
+    memo = {}
+
+    async def run():
+        # One after another, like prompts later in a batch
+        return [(await ta.aexecute_tools([{"name": "flaky", "args": {"ticker": "NVDA"}, "id": i}], memo=memo))[0] for i in "123"]
+
+    first, second, third = asyncio.run(run())
+
+    assert ta.is_error(first)
+    assert not ta.is_error(second) and third["content"] == second["content"]
+    assert tool.calls == 2
+
+
+def test_memo_runs_a_call_again_once_its_data_expires(monkeypatch):
+    tool = FlakyQuoteTool(0.05)
+    tool.calls = 1
+    monkeypatch.setitem(ta.tool_mapping, "flaky", tool)
+    memo = {}
+
+    async def run():
+        first = await ta.aexecute_tools([{"name": "flaky", "args": {"ticker": "NVDA"}, "id": "1"}], memo=memo)
+        await asyncio.sleep(0.06)
+        second = await ta.aexecute_tools([{"name": "flaky", "args": {"ticker": "NVDA"}, "id": "2"}], memo=memo)
+        return first[0], second[0]
+
+    first, second = asyncio.run(run())
+
+    assert tool.calls == 3
+    assert json.loads(first["content"]) == {"price": 2} and json.loads(second["content"]) == {"price": 3}
+
+
+class StreamingToolModel:
+    """Emits one complete tool call per chunk, delay seconds apart, like Ollama."""
+
+    def __init__(self, calls: list[dict], delay: float):
+        self.calls = calls
+        self.delay = delay
+
+    async def astream(self, chat):
+        for call in self.calls:
+            await asyncio.sleep(self.delay)
+            yield SimpleNamespace(content="", tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": None}])
+
+
+class EchoChatModel:
+    async def astream(self, chat):
+        yield SimpleNamespace(content="answer", usage_metadata=None)
+
+
+def test_assembler_releases_calls_once_arguments_parse():
+    assembler = ta.ToolCallAssembler()
+    pieces = [
+        [{"name": "get_dividends", "args": "", "id": "a", "index": 0}],
+        [{"name": None, "args": '{"ticker": "K', "id": None, "index": 0}],
+        [{"name": None, "args": 'O"}', "id": None, "index": 0}, {"name": "get_latest_news", "args": "", "id": "b", "index": 1}],
+    ]
+
+    released = [[c["name"] for c in assembler.feed(SimpleNamespace(tool_call_chunks=p))] for p in pieces]
+
+    assert released == [[], [], ["get_dividends"]]
+    assert assembler.calls[0]["args"] == {"ticker": "KO"}
+    assert assembler.finish() == [{"name": "get_latest_news", "args": {}, "id": "b", "type": "tool_call"}]
+
+
+def test_tools_start_while_the_tool_model_is_still_generating(monkeypatch):
+    calls = [{"name": "slow", "args": {}, "id": "1"}, {"name": "fast", "args": {}, "id": "2"}]
+    monkeypatch.setitem(ta.tool_mapping, "slow", SlowTool(0.5, "slow"))
+    monkeypatch.setitem(ta.tool_mapping, "fast", SlowTool(0.1, "fast"))
+    monkeypatch.setattr(ta, "initialise_models", lambda *args: {
+        "tool_model": StreamingToolModel(calls, 0.3), "chat_model": EchoChatModel()
+    })
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [])
+    monkeypatch.setattr(ta.prefetch, "start", lambda prompt, speculative: None)
+
+    async def first_text():
+        started, types, elapsed = time.monotonic(), [], None
+        async for event in ta.astream_response("p", "t", "c"):
+            types.append(json.loads(event[len("data: "):])["type"])
+            if types[-1] == "text" and elapsed is None:
+                elapsed = time.monotonic() - started
+        return elapsed, types
+
+    elapsed, types = asyncio.run(first_text())
+
+    # Dispatching after selection would take 0.6s + 0.5s, the slow fetch overlaps the second call's generation
+    assert elapsed < 0.95
+    assert types == ["tool", "tool", "tool_done", "tool_done", "text", "done"]
+
+
+class InvokingToolModel:
+    def __init__(self, result: AIMessage):
+        self.result = result
+        self.chats = []
+
+    async def ainvoke(self, chat):
+        self.chats.append(list(chat))
+        return self.result
+
+
+class RecordingChatModel:
+    """Answers with the content of the last message it was given, in two chunks when streamed."""
+
+    def __init__(self):
+        self.chats = []
+
+    async def ainvoke(self, chat):
+        self.chats.append(list(chat))
+        return AIMessage(content=f"saw {chat[-1]['content']}")
+
+    async def astream(self, chat):
+        self.chats.append(list(chat))
+        yield SimpleNamespace(content="saw ", usage_metadata=None)
+        yield SimpleNamespace(content=chat[-1]["content"], usage_metadata=None)
+
+
+def stub_agent(monkeypatch, tool_model, chat_model):
+    monkeypatch.setattr(ta, "initialise_models", lambda *args: {"tool_model": tool_model, "chat_model": chat_model})
+    monkeypatch.setattr(ta.intent_router, "route", lambda prompt: [])
+    monkeypatch.setattr(ta.prefetch, "start", lambda prompt, speculative: None)
+    monkeypatch.setattr(ta, "DECISION_CACHE_ENABLED", False)
+    monkeypatch.setattr(ta.response_cache, "enabled", False)
+
+
+def test_async_tools_run_concurrently_in_call_order(monkeypatch):
+    monkeypatch.setitem(ta.tool_mapping, "slow", SlowTool(0.3, "slow"))
+    monkeypatch.setitem(ta.tool_mapping, "fast", SlowTool(0.1, "fast"))
+    tool_calls = [
+        {"name": "slow", "args": {}, "id": "1"},
+        {"name": "fast", "args": {}, "id": "2"},
+        {"name": "missing_tool", "args": {}, "id": "3"},
+    ]
+
+    started = time.monotonic()
+    results = asyncio.run(ta.aexecute_tools(tool_calls))
+    elapsed = time.monotonic() - started
+
+    assert [r["tool_call_id"] for r in results] == ["1", "2", "3"]
+    assert [r["content"] for r in results[:2]] == ["slow", "fast"]
+    assert ta.is_error(results[2])
+    assert elapsed < 0.4
+
+
+def test_async_prompt_answers_from_the_tool_results(monkeypatch):
+    monkeypatch.setitem(ta.tool_mapping, "fast", SlowTool(0.0, "fetched"))
+    tool_model = InvokingToolModel(AIMessage(content="", tool_calls=[{"name": "fast", "args": {"ticker": "NVDA"}, "id": "1"}]))
+    chat_model = RecordingChatModel()
+    stub_agent(monkeypatch, tool_model, chat_model)
+
+    result = asyncio.run(ta.aprompt_model("p", "t", "c"))
+
+    assert result == {"response": "saw fetched", "tool_calls": [{"name": "fast", "args": {"ticker": "NVDA"}}], "skipped": []}
+    assert tool_model.chats[0][-1] == {"role": "user", "content": "p"}
+    assert chat_model.chats[0][-1]["tool_call_id"] == "1"
+
+
+def test_async_prompt_without_tool_calls_keeps_the_tool_model_answer(monkeypatch):
+    chat_model = RecordingChatModel()
+    stub_agent(monkeypatch, InvokingToolModel(AIMessage(content="direct answer")), chat_model)
+
+    result = asyncio.run(ta.aprompt_model("p", "t", "c"))
+
+    assert result["response"] == "direct answer" and result["tool_calls"] == []
+    assert chat_model.chats == []
+
+
+def test_async_stream_emits_tool_then_text_events(monkeypatch):
+    monkeypatch.setitem(ta.tool_mapping, "fast", SlowTool(0.0, "fetched"))
+    stub_agent(monkeypatch, StreamingToolModel([{"name": "fast", "args": {"ticker": "NVDA"}, "id": "1"}], 0.0), RecordingChatModel())
+
+    async def collect():
+        return [json.loads(e[len("data: "):]) async for e in ta.astream_response("p", "t", "c")]
+
+    events = asyncio.run(collect())
+
+    assert [e["type"] for e in events] == ["tool", "tool_done", "text", "text", "done"]
+    assert events[0] == {"type": "tool", "name": "fast", "args": {"ticker": "NVDA"}}
+    assert events[1]["status"] == "ok"
+    assert "".join(e["content"] for e in events if e["type"] == "text") == "saw fetched"
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+# Add parent directory (OnDeviceAgent) to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+
+from ChatApi.trading_agent import tool_list
+from ChatApi.tool_selector import ToolSelector
+
+# Prompts from test_trading_agent with the tools that answer them correctly
+EXPECTED = [
+    ("What is the current price of Nvidia", {"get_key_financial_metrics", "get_historical_data"}),
+    ("Please use your tools to fetch the current price of Nvidia", {"get_key_financial_metrics", "get_historical_data"}),
+    ("What was the price of Microsoft at close on the 31st October 2025", {"get_historical_data"}),
+    ("What was the highest price of Microsoft between 2025-10-30 and 2025-11-05", {"get_historical_data"}),
+    ("Can you tell me the market capilisation of AMD", {"get_key_financial_metrics"}),
+    ("Give me the latest news for Tesla", {"get_latest_news"}),
+    ("What dividends did Coca-Cola pay in the last year", {"get_dividends"}),
+    ("Please fetch the balance sheet for Microsoft and tell me the Total Assets", {"get_balance_sheet"}),
+    ("Can you calculate AMD's current ratio for 2025 using the balance sheet?", {"get_balance_sheet", "get_financial_ratios"}),
+    ("Can you calculate ASML's debt to equity for 2024 using the balance sheet?", {"get_balance_sheet", "get_financial_ratios"}),
+    ("Please fetch the income statement for Meta and tell me the latest Gross Profit Margin", {"get_income_statement", "get_financial_ratios"}),
+    ("Please fetch the income statement for Microsoft and tell me Total Revenue", {"get_income_statement"}),
+    ("Please fetch the cash flow statement for Microsoft and tell me Capital Expenditure", {"get_cash_flow_statement"}),
+    ("Compare NVDA, AMD and INTC over the last 6 months", {"get_historical_data_multi"}),
+]
+
+
+@pytest.mark.parametrize("prompt,accepted", EXPECTED)
+def test_subset_keeps_a_tool_that_answers_the_prompt(prompt, accepted):
+    selector = ToolSelector(tool_list, k=3)
+
+    subset = selector.select(prompt)
+
+    assert len(subset) <= 3
+    assert accepted & {t.name for t in subset}
+
+
+def test_unrelated_prompt_binds_every_tool_in_order():
+    selector = ToolSelector(tool_list, k=3)
+
+    assert selector.select("Hello there") == tool_list
+    assert ToolSelector(tool_list, k=0).select("Give me the latest news for Tesla") == tool_list
+
+
+def test_same_subset_keeps_tool_order():
+    selector = ToolSelector(tool_list, k=3)
+
+    first = selector.select("Is Microsoft in a strong financial position?")
+    second = selector.select("How strong is the balance sheet of Microsoft, what is its financial position?")
+
+    assert [t.name for t in first] == [t.name for t in tool_list if t in first]
+    assert sum(selector.tokens[t.name] for t in first) < selector.full_tokens / 2
+    assert first == second
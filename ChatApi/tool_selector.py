@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import math
+import threading
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from ChatApi.serializers import estimate_tokens
+
+# Tools bound to the tool model per request, 0 binds every tool
+TOOL_SUBSET_K = int(os.getenv("TOOL_SUBSET_K", "3"))
+# Below this score a tool is not considered relevant, nothing relevant binds every tool
+MIN_SCORE = float(os.getenv("TOOL_SUBSET_MIN_SCORE", "1.0"))
+
+# How users ask for what each tool returns, in words its description does not use
+HINTS = {
+    "get_historical_data": "price close closing open high highest low lowest trading performance perform doing "
+                           "lately trend moved move week month year yesterday between",
+    "get_historical_data_multi": "compare comparison versus vs against better outperform performance",
+    "get_key_financial_metrics": "price current quote market cap capitalisation capitalization valuation worth pe "
+                                 "earnings target analyst overview buy sell better",
+    "get_balance_sheet": "assets liabilities equity debt position strong strength health healthy solvent leverage",
+    "get_income_statement": "revenue sales profit profitable earnings expenses margin gross operating net",
+    "get_cash_flow_statement": "cash flow capex capital expenditure free operating investing financing",
+    "get_financial_ratios": "ratio margin return roe roa coverage leverage liquidity debt equity calculate current quick",
+    "get_dividends": "dividend payout yield paid pay",
+    "get_latest_news": "news headlines articles latest happening announcement announced",
+}
+
+# A typical question per intent, the subsets they bind are built at start up
+WARM_PROMPTS = [
+    "What is the current price of Nvidia",
+    "How has Apple performed over the last month",
+    "Compare NVDA, AMD and INTC over the last 6 months",
+    "Give me the latest news for Tesla",
+    "What dividends did Coca-Cola pay in the last year",
+    "Show me the balance sheet for Microsoft",
+    "What was Apple's total revenue and net income",
+    "What is Amazon's free cash flow",
+    "Calculate Meta's debt to equity ratio",
+    "Is Microsoft in a strong financial position?",
+]
+
+STOPWORDS = set(
+    "a an and are as at be by can could did do does for from get give how i in is it me of on or please "
+    "show tell than that the this to use using was what when which with you your".split()
+)
+
+WORD = re.compile(r"[a-z]+")
+
+_lock = threading.Lock()
+stats = {"selections": 0, "all_tools": 0, "bound_tokens": 0, "full_tokens": 0, "subsets": {}}
+
+
+def words(text: str) -> set[str]:
+    # Trailing s dropped so dividend/dividends and asset/assets match, applied to prompts and tools alike
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in WORD.findall(text.lower())} - STOPWORDS
+
+
+class ToolSelector:
+    """Keyword relevance of each tool to a prompt, weighted by how few tools share the word.
+
+    Each tool's vocabulary is its name, its description and the hints above. A prompt
+    scores a tool by summing the inverse document frequency of the words they share, so
+    words every tool has ("ticker", "company") count for nothing.
+    """
+
+    def __init__(self, tools: list, k: int = TOOL_SUBSET_K, min_score: float = MIN_SCORE):
+        self.tools = tools
+        self.k = k
+        self.min_score = min_score
+        self.vocab = {
+            t.name: words(t.name.replace("_", " ") + " " + t.description + " " + HINTS.get(t.name, "")) for t in tools
+        }
+        counts = {}
+        for vocab in self.vocab.values():
+            for word in vocab:
+                counts[word] = counts.get(word, 0) + 1
+        self.idf = {word: math.log(len(tools) / count) for word, count in counts.items()}
+        self.tokens = {t.name: estimate_tokens(json.dumps(convert_to_openai_tool(t))) for t in tools}
+        self.full_tokens = sum(self.tokens.values())
+
+    def scores(self, prompt: str) -> dict[str, float]:
+        prompt_words = words(prompt)
+        return {
+            name: sum(self.idf[w] for w in prompt_words & vocab)
+            for name, vocab in self.vocab.items()
+        }
+
+    def choose(self, prompt: str) -> list:
+        """The top k relevant tools in their original order, or every tool when none stands out."""
+        if not self.k or self.k >= len(self.tools):
+            return self.tools
+        scores = self.scores(prompt)
+        ranked = sorted((s, name) for name, s in scores.items() if s >= self.min_score)
+        chosen = {name for _, name in ranked[::-1][:self.k]}
+        # Original order keeps the schema block identical for the same subset, so the bound model is reused
+        return [t for t in self.tools if t.name in chosen] or self.tools
+
+    def select(self, prompt: str) -> list:
+        subset = self.choose(prompt)
+        self.record(subset)
+        return subset
+
+    def record(self, subset: list):
+        names = tuple(t.name for t in subset)
+        with _lock:
+            stats["selections"] += 1
+            stats["all_tools"] += len(subset) == len(self.tools)
+            stats["bound_tokens"] += sum(self.tokens[name] for name in names)
+            stats["full_tokens"] += self.full_tokens
+            key = ",".join(names)
+            stats["subsets"][key] = stats["subsets"].get(key, 0) + 1
+
+
+_selectors = {}
+
+
+def selector_for(tools: list) -> ToolSelector:
+    # The selector for a tool list is built once
+    key = tuple(t.name for t in tools)
+    selector = _selectors.get(key)
+    if selector is None:
+        selector = _selectors[key] = ToolSelector(tools)
+    return selector
+
+
+def select(prompt: str, tools: list) -> list:
+    """Tools to bind for this prompt."""
+    return selector_for(tools).select(prompt)
+
+
+def warm_subsets(tools: list, prompts: list[str] = WARM_PROMPTS) -> list[list]:
+    """The distinct tool lists requests bind, every tool (as sessions bind) then each prompt's subset.
+
+    Not counted in the selection stats.
+    """
+    selector = selector_for(tools)
+    subsets = {tuple(t.name for t in tools): tools}
+    for prompt in prompts:
+        subset = selector.choose(prompt)
+        subsets.setdefault(tuple(t.name for t in subset), subset)
+    return list(subsets.values())
+
+
+def summary() -> dict:
+    with _lock:
+        out = {k: v for k, v in stats.items() if k != "subsets"}
+        out["saved_tokens"] = stats["full_tokens"] - stats["bound_tokens"]
+        out["saved_ratio"] = out["saved_tokens"] / stats["full_tokens"] if stats["full_tokens"] else 0.0
+        out["top_subsets"] = dict(sorted(stats["subsets"].items(), key=lambda item: -item[1])[:10])
+        return out
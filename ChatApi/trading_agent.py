@@ -6,42 +6,67 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import os
 import json
-
-from langchain_ollama import ChatOllama
+import time
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from langchain.messages import AIMessage
 
 import yfinance as yf
 
 import ChatApi.finance_tools as ft
+from ChatApi.model_registry import registry
+from ChatApi import intent_router, prefetch, instrumentation, sse, tool_selector
+from ChatApi.refresher import refresher
+from ChatApi.decision_cache import decision_cache, DECISION_CACHE_ENABLED
+from ChatApi.response_cache import response_cache
+from ChatApi.data_cache import tracking, touch
+from ChatApi import sessions
+from ChatApi.symbol_index import index as symbol_index
+from ChatApi.serializers import estimate_tokens
 
 tool_mapping = {
         "get_historical_data": ft.get_historical_data,
+        "get_historical_data_multi": ft.get_historical_data_multi,
         "get_balance_sheet": ft.get_balance_sheet,
         "get_dividends": ft.get_dividends,
         "get_key_financial_metrics": ft.get_key_financial_metrics,
         "get_latest_news": ft.get_latest_news,
         "get_income_statement": ft.get_income_statement,
-        "get_cash_flow_statement": ft.get_cash_flow_statement
+        "get_cash_flow_statement": ft.get_cash_flow_statement,
+        "get_financial_ratios": ft.get_financial_ratios
 }
 
-def initialise_models(tool_model, chat_model, tools: list) -> dict:
-    n_cores = os.cpu_count()
-    model_dict = {}
+tool_list = [
+    ft.get_historical_data,
+    ft.get_historical_data_multi,
+    ft.get_key_financial_metrics,
+    ft.get_balance_sheet,
+    ft.get_dividends,
+    ft.get_latest_news,
+    ft.get_income_statement,
+    ft.get_cash_flow_statement,
+    ft.get_financial_ratios
+]
 
-    model_dict["tool_model"] = ChatOllama(
-        model=tool_model,
-        num_thread=n_cores,
-        temperature=0.0
-    ).bind_tools(tools)
+# Tool calls from one turn run concurrently on this bounded pool
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+# Blocking tool model calls waited on with a deadline, kept off the tool pool since an abandoned call
+# holds its thread until the model answers
+MODEL_WAIT_WORKERS = int(os.getenv("MODEL_WAIT_WORKERS", "4"))
+model_wait_executor = ThreadPoolExecutor(max_workers=MODEL_WAIT_WORKERS, thread_name_prefix="tool-model")
 
-    model_dict["chat_model"] = ChatOllama(
-        model=chat_model,
-        num_thread=n_cores,
-        temperature=0.5
-    )
+def model_options(thread_budget=None) -> dict:
+    # thread_budget is the scheduler's callable for this request's share of the cores
+    return {"num_thread": thread_budget() if thread_budget else os.cpu_count()}
 
-    return model_dict
+def initialise_models(tool_model, chat_model, tools: list, options: dict | None = None) -> dict:
+    # Clients are built once per (models, tools, options) and reused across requests
+    return registry.get(tool_model, chat_model, tools, options or model_options())
 
 def initialise_chat(user_prompt: str) -> list[dict]:
     chat = [
@@ -59,92 +84,681 @@ def initialise_chat(user_prompt: str) -> list[dict]:
     ]
     return chat
 
+def new_session() -> sessions.Session:
+    return sessions.session_store.create(initialise_chat("")[:1])
+
+@asynccontextmanager
+async def conversation(prompt: str, session=None):
+    """The chat for a prompt, continuing the session's history when there is one."""
+    if session is None:
+        yield initialise_chat(prompt)
+        return
+    async with sessions.turn(session, prompt) as chat:
+        yield chat
+
+def bound_tools(prompt: str, session=None) -> list:
+    # The schema block heads the prompt, a session binds every tool so it is the same every turn
+    return tool_list if session is not None else tool_selector.select(prompt, tool_list)
+
+def tool_message(tool_call: dict, content: str) -> dict:
+    return {
+        "role": "tool",
+        "tool_call_id": tool_call.get("id"),
+        "name": tool_call["name"],
+        "content": content
+    }
+
+def normalize_tool_args(args: dict) -> dict:
+    """Map ticker arguments to known symbols, raising ValueError before any network call."""
+    args = dict(args)
+    if "ticker" in args:
+        ticker = symbol_index.normalize_ticker_arg(args["ticker"])
+        if ticker is None:
+            raise ValueError(f"Unknown ticker symbol: {args['ticker']}")
+        args["ticker"] = ticker
+    if "tickers" in args:
+        tickers = args["tickers"]
+        # Small models sometimes pass a comma separated string instead of a list
+        if isinstance(tickers, str):
+            tickers = tickers.split(",")
+        args["tickers"] = [normalize_tool_args({"ticker": t})["ticker"] for t in tickers]
+    return args
+
 def execute_tool(tool_call: dict) -> dict:
     try:
-        tool_response = tool_mapping[tool_call["name"]].invoke(tool_call["args"])
-        # tool_func = tool_mapping[result.tool_calls[0]["name"]]
-        # result = tool_func(**result.tool_calls[0]["args"])
+        args = normalize_tool_args(tool_call["args"])
+        refresher.record(args)
+        with instrumentation.timer("tool_seconds", tool=tool_call["name"]):
+            tool_response = tool_mapping[tool_call["name"]].invoke(args)
     except Exception as e:
-        result = {"error": str(e)}
+        tool_response = json.dumps({"error": str(e)})
         print(f"Error executing tool {tool_call['name']}: {e}")
-    tool_response
 
+    # Measured on what the chat model gets, so every tool counts once however it built its text
+    content = str(tool_response)
+    instrumentation.observe("tool_output_bytes", len(content.encode()), tool=tool_call["name"])
+    instrumentation.observe("tool_output_tokens", estimate_tokens(content), tool=tool_call["name"])
+    return tool_message(tool_call, content)
+
+def timeout_message(tool_call: dict, timeout: float) -> dict:
+    print(f"Tool {tool_call['name']} timed out after {timeout}s")
+    return tool_message(tool_call, json.dumps({"error": f"Tool timed out after {timeout}s"}))
+
+# Content of a tool message standing in for a call the request deadline cut short
+UNAVAILABLE = "Unavailable, skipped to answer within the response deadline"
+
+def unavailable_message(tool_call: dict) -> dict:
+    print(f"Tool {tool_call['name']} skipped at the request deadline")
+    return tool_message(tool_call, json.dumps({"error": UNAVAILABLE}))
+
+def missed_message(tool_call: dict, timeout: float, limit: float, deadline=None) -> dict:
+    # A limit below the tool timeout means the request deadline, not the tool, ran out
+    if deadline is not None and limit < timeout:
+        deadline.skip("tool", name=tool_call["name"])
+        return unavailable_message(tool_call)
+    return timeout_message(tool_call, timeout)
+
+def tool_limit(timeout: float, deadline=None) -> float:
+    return deadline.timeout(timeout, "tools") if deadline is not None else timeout
+
+def submit_tool(tool_call: dict):
+    # Carry the request's context into the pool so per request timings are collected
+    return tool_executor.submit(contextvars.copy_context().run, execute_tool, tool_call)
+
+def is_error(tool_result: dict) -> bool:
+    return tool_result["content"].startswith('{"error"')
+
+def is_skipped(tool_result: dict) -> bool:
+    return is_error(tool_result) and UNAVAILABLE in tool_result["content"]
+
+# Stream events are dicts, ChatApi.sse turns them into frames
+def tool_event(tool_call: dict) -> dict:
+    return {"type": "tool", "name": tool_call["name"], "args": tool_call["args"]}
+
+def tool_done_event(tool_call: dict, tool_result: dict, started: float) -> dict:
+    status = "skipped" if is_skipped(tool_result) else "error" if is_error(tool_result) else "ok"
     return {
-        "role": "tool",
-        "tool_call_id": tool_call["id"],
+        "type": "tool_done",
         "name": tool_call["name"],
-        "content": tool_response
+        "args": tool_call["args"],
+        "status": status,
+        "elapsed": round(time.monotonic() - started, 3)
     }
 
-def prompt_model(prompt: str, tool_model: str, chat_model: str) -> dict:
-    model_dict = initialise_models(
-        tool_model, chat_model, 
-        [
-            ft.get_historical_data,
-            ft.get_key_financial_metrics, 
-            ft.get_balance_sheet, 
-            ft.get_dividends, 
-            ft.get_latest_news, 
-            ft.get_income_statement, 
-            ft.get_cash_flow_statement
-        ]
-    )
+def execute_tools(tool_calls: list[dict], timeout: float = TOOL_TIMEOUT, deadline=None) -> list[dict]:
+    """Run all tool calls of a turn concurrently and return their messages in call order."""
+    started = time.monotonic()
+    limit = tool_limit(timeout, deadline)
+    futures = [submit_tool(tool_call) for tool_call in tool_calls]
+
+    results = []
+    for tool_call, future in zip(tool_calls, futures):
+        try:
+            results.append(future.result(timeout=max(0.0, started + limit - time.monotonic())))
+        except TimeoutError:
+            future.cancel()
+            results.append(missed_message(tool_call, timeout, limit, deadline))
+    return results
+
+def follow_up(chat: list[dict]) -> bool:
+    # A prompt after earlier answers may refer to them ("and its debt?"), only the model sees those
+    return any(message["role"] == "assistant" for message in chat)
+
+def preselect_tool_calls(model_dict: dict, chat: list[dict], prompt: str) -> list[dict]:
+    """Tool calls found without the tool model, from the intent router or a decision the model
+    already made for prompts of the same shape, or an empty list when the model has to decide."""
+    if follow_up(chat):
+        return []
+    with instrumentation.timer("tool_selection_seconds", source="router"):
+        routed = intent_router.route(prompt)
+    if routed or not DECISION_CACHE_ENABLED:
+        return routed
+    with instrumentation.timer("tool_selection_seconds", source="cache"):
+        return decision_cache.lookup(prompt, model_dict.get("tool_model_name", ""))
+
+def learn_tool_calls(model_dict: dict, chat: list[dict], prompt: str, tool_calls: list[dict]):
+    if DECISION_CACHE_ENABLED and not follow_up(chat):
+        decision_cache.learn(prompt, tool_calls, model_dict.get("tool_model_name", ""))
+
+def select_tool_calls(model_dict: dict, chat: list[dict], prompt: str, speculative: bool | None = None, deadline=None) -> tuple[list[dict], AIMessage | None]:
+    """Pick the tool calls for a prompt, from the intent router or decision cache when they have
+    an answer, else the tool model.
+
+    Returns:
+        tuple: (tool_calls, tool model message or None when preselected or cut short by the deadline)
+    """
+    preselected = preselect_tool_calls(model_dict, chat, prompt)
+    if preselected:
+        return preselected, None
+
+    # Warm likely data while the tool model decides
+    speculation = prefetch.start(prompt, speculative)
+    tool_calls, result = [], None
+    try:
+        with instrumentation.timer("tool_selection_seconds", source="model"):
+            if deadline is None:
+                result = model_dict["tool_model"].invoke(chat)
+            else:
+                # The blocking client cannot be interrupted, wait for it from a pool of its own instead
+                future = model_wait_executor.submit(contextvars.copy_context().run, model_dict["tool_model"].invoke, chat)
+                result = future.result(timeout=deadline.remaining("tools"))
+        tool_calls = result.tool_calls if isinstance(result, AIMessage) else []
+        learn_tool_calls(model_dict, chat, prompt, tool_calls)
+    except TimeoutError:
+        # Without a deadline the timeout came from the model client itself
+        if deadline is None:
+            raise
+        deadline.skip("tool_selection")
+    finally:
+        if speculation:
+            speculation.resolve(tool_calls)
+    return tool_calls, result
+
+async def aselect_tool_calls(model_dict: dict, chat: list[dict], prompt: str, speculative: bool | None = None, deadline=None) -> tuple[list[dict], AIMessage | None]:
+    preselected = preselect_tool_calls(model_dict, chat, prompt)
+    if preselected:
+        return preselected, None
+
+    speculation = prefetch.start(prompt, speculative)
+    tool_calls, result = [], None
+    try:
+        with instrumentation.timer("tool_selection_seconds", source="model"):
+            result = await asyncio.wait_for(
+                model_dict["tool_model"].ainvoke(chat), deadline.remaining("tools") if deadline else None
+            )
+        tool_calls = result.tool_calls if isinstance(result, AIMessage) else []
+        learn_tool_calls(model_dict, chat, prompt, tool_calls)
+    except asyncio.TimeoutError:
+        if deadline is None:
+            raise
+        deadline.skip("tool_selection")
+    finally:
+        if speculation:
+            speculation.resolve(tool_calls)
+    return tool_calls, result
+
+class ToolCallAssembler:
+    """Rebuilds tool calls from streamed tool model chunks.
+
+    Ollama sends every call whole in one chunk, other providers send the arguments in pieces
+    under the same index. A call is released as soon as its arguments parse as a JSON object.
+    """
+
+    def __init__(self):
+        self.partial = {}
+        self.released = set()
+        self.calls = []
+
+    def _release(self, key, args: dict) -> dict:
+        part = self.partial[key]
+        tool_call = {"name": part["name"], "args": args, "id": part["id"], "type": "tool_call"}
+        self.released.add(key)
+        self.calls.append(tool_call)
+        return tool_call
+
+    def feed(self, chunk) -> list[dict]:
+        """Calls completed by this chunk, in the order the model emitted them."""
+        for part in getattr(chunk, "tool_call_chunks", None) or []:
+            key = part.get("index") if part.get("index") is not None else part.get("id") or len(self.partial)
+            partial = self.partial.setdefault(key, {"name": "", "args": "", "id": None})
+            partial["name"] += part.get("name") or ""
+            partial["args"] += part.get("args") or ""
+            partial["id"] = partial["id"] or part.get("id")
+
+        ready = []
+        for key, partial in self.partial.items():
+            # Empty arguments may still be on their way, those calls are released by finish()
+            if key in self.released or not partial["name"] or not partial["args"]:
+                continue
+            try:
+                args = json.loads(partial["args"])
+            except ValueError:
+                continue
+            if isinstance(args, dict):
+                ready.append(self._release(key, args))
+        return ready
+
+    def finish(self) -> list[dict]:
+        """Release whatever is left once the model has finished, malformed arguments become {}."""
+        ready = []
+        for key, partial in self.partial.items():
+            if key in self.released or not partial["name"]:
+                continue
+            try:
+                args = json.loads(partial["args"] or "{}")
+            except ValueError:
+                args = {}
+            ready.append(self._release(key, args if isinstance(args, dict) else {}))
+        return ready
+
+def stream_tool_calls(model_dict: dict, chat: list[dict], prompt: str, speculative: bool | None = None, deadline=None):
+    """Yield the tool calls for a prompt as soon as each one is complete.
+
+    Preselected prompts yield all their calls at once. Otherwise the tool model is streamed so
+    the first calls can be dispatched while it is still generating the rest.
+    """
+    preselected = preselect_tool_calls(model_dict, chat, prompt)
+    if preselected:
+        yield from preselected
+        return
+
+    speculation = prefetch.start(prompt, speculative)
+    assembler = ToolCallAssembler()
+    started = time.perf_counter()
+    try:
+        stream = model_dict["tool_model"].stream(chat)
+        for chunk in stream:
+            for tool_call in assembler.feed(chunk):
+                instrumentation.observe("tool_dispatch_seconds", time.perf_counter() - started)
+                yield tool_call
+            if deadline is not None and deadline.expired("tools"):
+                stream.close()
+                deadline.skip("tool_selection")
+                return
+        for tool_call in assembler.finish():
+            instrumentation.observe("tool_dispatch_seconds", time.perf_counter() - started)
+            yield tool_call
+        learn_tool_calls(model_dict, chat, prompt, assembler.calls)
+    finally:
+        instrumentation.observe("tool_selection_seconds", time.perf_counter() - started, source="model")
+        if speculation:
+            speculation.resolve(assembler.calls)
+
+def stream_chat(model, chat: list[dict], deadline=None):
+    """Chat model chunks, stopping after the deadline with whatever was generated so far."""
+    stream = model.stream(chat)
+    for chunk in stream:
+        yield chunk
+        if deadline is not None and deadline.expired():
+            stream.close()
+            deadline.skip("answer")
+            return
+
+def answer(model, chat: list[dict], chat_model: str, deadline=None) -> str:
+    started = time.perf_counter()
+    if deadline is None:
+        result = model.invoke(chat)
+        instrumentation.observe_chat_message(chat_model, result, started)
+        return result.content
+
+    # Streamed so a partial answer can still be returned at the deadline
+    first_token_at, text, chunk = None, "", None
+    for chunk in stream_chat(model, chat, deadline):
+        if first_token_at is None and chunk.content:
+            first_token_at = time.perf_counter()
+        text += chunk.content
+    instrumentation.observe_chat(chat_model, started, first_token_at, instrumentation.output_tokens(chunk, text))
+    return text
+
+def lookup_response(prompt: str, tool_model: str, chat_model: str) -> dict | None:
+    """The stored {"response", "tool_calls"} for the prompt, None when it has to be generated."""
+    return response_cache.get(prompt, tool_model, chat_model) if response_cache.enabled else None
+
+def cached_response(prompt: str, tool_model: str, chat_model: str, deadline=None) -> dict | None:
+    """A stored answer to the prompt shaped like prompt_model's result."""
+    cached = lookup_response(prompt, tool_model, chat_model)
+    if cached is None:
+        return None
+    return {**cached, "skipped": deadline.finish() if deadline else []}
+
+def store_response(prompt: str, tool_model: str, chat_model: str, result: dict, failed: bool, expiries: list[float]):
+    if not response_cache.enabled:
+        return
+    # A partial answer or one missing some data is not worth repeating to the next user
+    if failed or result["skipped"]:
+        response_cache.reject()
+        return
+    response_cache.put(prompt, tool_model, chat_model, result["response"], result["tool_calls"], expiries)
+
+def prompt_model(prompt: str, tool_model: str, chat_model: str, speculative: bool | None = None, deadline=None, lookup: bool = True) -> dict:
+    # lookup=False when the caller has already missed the response cache
+    cached = cached_response(prompt, tool_model, chat_model, deadline) if lookup else None
+    if cached is not None:
+        return cached
+
+    model_dict = initialise_models(tool_model, chat_model, tool_selector.select(prompt, tool_list))
 
     chat = initialise_chat(prompt)
-    tool_calls = []
-
-    result = model_dict["tool_model"].invoke(chat)
-    if isinstance(result, AIMessage) and result.tool_calls:
-        print(result.tool_calls)
-        for tool_call in result.tool_calls:
-            tool_result = execute_tool(tool_call)
-            chat.append(tool_result)
-            tool_calls.append({
-                "name": tool_call["name"],
-                "args": tool_call["args"]
-            })
-    
-    if tool_calls:
-        result = model_dict["chat_model"].invoke(chat)
-    
-    return {
-        "response": result.content,
-        "tool_calls": tool_calls
+    tool_calls, tool_results = [], []
+
+    with tracking() as expiries:
+        selected, result = select_tool_calls(model_dict, chat, prompt, speculative, deadline)
+        if selected:
+            tool_results = execute_tools(selected, deadline=deadline)
+            chat.extend(tool_results)
+            tool_calls = [{"name": tool_call["name"], "args": tool_call["args"]} for tool_call in selected]
+
+    # No tool model message either when tools were called or when selection missed the deadline
+    if tool_calls or result is None:
+        response = answer(model_dict["chat_model"], chat, chat_model, deadline)
+    else:
+        response = result.content
+
+    out = {
+        "response": response,
+        "tool_calls": tool_calls,
+        "skipped": deadline.finish() if deadline else []
     }
+    store_response(prompt, tool_model, chat_model, out, any(is_error(r) for r in tool_results), expiries)
+    return out
+
+def done_event(deadline=None) -> dict:
+    event = {"type": "done"}
+    if deadline is not None:
+        event["skipped"] = deadline.finish()
+    return event
+
+def replay_events(cached: dict, timings: bool = False, deadline=None):
+    """Stream events for a cached answer, its tool calls followed by the whole text at once."""
+    for tool_call in cached["tool_calls"]:
+        yield tool_event(tool_call)
+        yield {"type": "tool_done", "name": tool_call["name"], "args": tool_call["args"], "status": "ok", "elapsed": 0.0}
+    yield {"type": "text", "content": cached["response"]}
+    if timings:
+        yield timings_event([])
+    yield done_event(deadline)
+
+async def areplay_events(cached: dict, timings: bool = False, deadline=None):
+    for event in replay_events(cached, timings, deadline):
+        yield event
+
+def store_events(prompt: str, tool_model: str, chat_model: str, events: list[dict], done: dict, expiries: list[float]):
+    """Store the answer a completed stream produced, from the events it sent."""
+    result = {
+        "response": "".join(e["content"] for e in events if e["type"] == "text"),
+        "tool_calls": [{"name": e["name"], "args": e["args"]} for e in events if e["type"] == "tool"],
+        "skipped": done.get("skipped", [])
+    }
+    failed = any(e["type"] == "tool_done" and e["status"] != "ok" for e in events)
+    store_response(prompt, tool_model, chat_model, result, failed, expiries)
+
+def stream_response(prompt: str, tool_model: str, chat_model: str, speculative: bool | None = None, timings: bool = False, deadline=None, flush_ms: float | None = None):
+    """SSE frames for a prompt, text chunks coalesced by the flush policy."""
+    return sse.frames(stream_events(prompt, tool_model, chat_model, speculative, timings, deadline), sse.FlushPolicy.from_ms(flush_ms))
+
+def stream_events(prompt: str, tool_model: str, chat_model: str, speculative: bool | None = None, timings: bool = False, deadline=None, lookup: bool = True):
+    cached = lookup_response(prompt, tool_model, chat_model) if lookup else None
+    if cached is not None:
+        yield from replay_events(cached, timings, deadline)
+        return
 
-def stream_response(prompt: str, tool_model: str, chat_model: str):
+    with instrumentation.collect() as samples:
+        events = []
+        with tracking() as expiries:
+            for event in _stream_response(prompt, tool_model, chat_model, speculative, deadline):
+                events.append(event)
+                yield event
+        if timings and samples is not None:
+            yield timings_event(samples)
+        done = done_event(deadline)
+        store_events(prompt, tool_model, chat_model, events, done, expiries)
+        yield done
+
+def _stream_response(prompt: str, tool_model: str, chat_model: str, speculative: bool | None = None, deadline=None):
     chat = initialise_chat(prompt)
     
-    # Get tool selection model based on tool_model parameter
-    model_dict = initialise_models(
-        tool_model, chat_model, 
-        [
-            ft.get_historical_data,
-            ft.get_key_financial_metrics, 
-            ft.get_balance_sheet, 
-            ft.get_dividends, 
-            ft.get_latest_news,
-            ft.get_income_statement,
-            ft.get_cash_flow_statement
-        ]
-    )
-    
-    # Tool selection phase
-    result = model_dict["tool_model"].invoke(chat)
+    # Get tool selection model based on tool_model parameter, bound to the tools this prompt is likely to need
+    model_dict = initialise_models(tool_model, chat_model, tool_selector.select(prompt, tool_list))
     
-    if isinstance(result, AIMessage) and result.tool_calls:
-        for tool_call in result.tool_calls:
-            yield f"data: {json.dumps({'type': 'tool', 'name': tool_call['name'], 'args': tool_call['args']})}\n\n"
-            tool_result = execute_tool(tool_call)
-            chat.append(tool_result)
+    # Tool selection phase, each call starts fetching as soon as the tool model has emitted it
+    selected, dispatched, futures = [], [], {}
+    for tool_call in stream_tool_calls(model_dict, chat, prompt, speculative, deadline):
+        yield tool_event(tool_call)
+        futures[submit_tool(tool_call)] = len(selected)
+        selected.append(tool_call)
+        dispatched.append(time.monotonic())
+
+    if selected:
+        limit = tool_limit(TOOL_TIMEOUT, deadline)
+
+        # Emit each result as it lands, keep chat order matching the model's call order
+        tool_results = [None] * len(futures)
+        try:
+            for future in as_completed(futures, timeout=limit):
+                index = futures[future]
+                tool_results[index] = future.result()
+                yield tool_done_event(selected[index], tool_results[index], dispatched[index])
+        except TimeoutError:
+            for future, index in futures.items():
+                if tool_results[index] is None:
+                    future.cancel()
+                    tool_results[index] = missed_message(selected[index], TOOL_TIMEOUT, limit, deadline)
+                    yield tool_done_event(selected[index], tool_results[index], dispatched[index])
+        chat.extend(tool_results)
 
     # Stream the final response
-    response = model_dict["chat_model"].stream(chat)
-    for chunk in response:
-        yield f"data: {json.dumps({'type': 'text', 'content': chunk.content})}\n\n"
+    started, first_token_at, text, chunk = time.perf_counter(), None, "", None
+    for chunk in stream_chat(model_dict["chat_model"], chat, deadline):
+        if first_token_at is None and chunk.content:
+            first_token_at = time.perf_counter()
+        text += chunk.content
+        yield {"type": "text", "content": chunk.content}
+    instrumentation.observe_chat(chat_model, started, first_token_at, instrumentation.output_tokens(chunk, text))
+
+def timings_event(samples: list[dict]) -> dict:
+    return {"type": "timings", "timings": samples}
+
+async def aexecute_tool(tool_call: dict, timeout: float = TOOL_TIMEOUT, deadline=None) -> dict:
+    # yfinance is blocking, run it on the tool pool so the event loop stays free
+    loop = asyncio.get_running_loop()
+    run = contextvars.copy_context().run
+    limit = tool_limit(timeout, deadline)
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(tool_executor, run, execute_tool, tool_call), limit)
+    except asyncio.TimeoutError:
+        return missed_message(tool_call, timeout, limit, deadline)
+
+def tool_call_key(tool_call: dict) -> tuple:
+    try:
+        args = normalize_tool_args(tool_call["args"])
+    except ValueError:
+        args = tool_call["args"]
+    return tool_call["name"], json.dumps(args, sort_keys=True, default=str)
+
+async def atracked_execute_tool(tool_call: dict, timeout: float = TOOL_TIMEOUT) -> tuple[dict, list[float]]:
+    # The result with the expiry of the data it read, kept apart from whichever request started it
+    with tracking() as expiries:
+        result = await aexecute_tool(tool_call, timeout)
+    return result, expiries
+
+def memo_usable(execution) -> bool:
+    # A call in flight is always shared, a finished one only while it succeeded and its data is fresh
+    if not execution.done():
+        return True
+    if execution.cancelled() or execution.exception() is not None:
+        return False
+    result, expiries = execution.result()
+    return not is_error(result) and bool(expiries) and min(expiries) > time.monotonic()
+
+async def amemo_execute_tool(tool_call: dict, memo: dict, timeout: float = TOOL_TIMEOUT, deadline=None) -> dict:
+    # Identical calls share one execution, each caller gets a message with its own call id
+    key = tool_call_key(tool_call)
+    if key not in memo or not memo_usable(memo[key]):
+        memo[key] = asyncio.ensure_future(atracked_execute_tool(tool_call, timeout))
+    # The shared execution runs to the tool timeout, each caller only waits as long as its own deadline
+    limit = tool_limit(timeout, deadline)
+    try:
+        result, expiries = await asyncio.wait_for(asyncio.shield(memo[key]), limit)
+    except asyncio.TimeoutError:
+        return missed_message(tool_call, timeout, limit, deadline)
+    # Every caller's answer depends on the shared data, not only the first one's
+    for expires in expiries:
+        touch(expires)
+    return tool_message(tool_call, result["content"])
+
+async def aexecute_tools(tool_calls: list[dict], timeout: float = TOOL_TIMEOUT, memo: dict | None = None, deadline=None) -> list[dict]:
+    if memo is not None:
+        return await asyncio.gather(*(amemo_execute_tool(tool_call, memo, timeout, deadline) for tool_call in tool_calls))
+    return await asyncio.gather(*(aexecute_tool(tool_call, timeout, deadline) for tool_call in tool_calls))
+
+async def abounded(stream, deadline=None, stage: str = "answer", part: str = "answer"):
+    """Items of a model stream, cancelling it when the deadline of the stage passes or the consumer stops."""
+    try:
+        if deadline is None:
+            async for item in stream:
+                yield item
+            return
+        while True:
+            yield await asyncio.wait_for(anext(stream), deadline.remaining(stage))
+    except StopAsyncIteration:
+        pass
+    except asyncio.TimeoutError:
+        if deadline is None:
+            raise
+        deadline.skip(part)
+    finally:
+        # Closing the model stream drops the connection, which stops the Ollama generation
+        await stream.aclose()
+
+def astream_chat(model, chat: list[dict], deadline=None):
+    """Chat model chunks, cancelling the generation at the deadline."""
+    return abounded(model.astream(chat), deadline)
+
+async def astream_tool_calls(model_dict: dict, chat: list[dict], prompt: str, speculative: bool | None = None, deadline=None):
+    preselected = preselect_tool_calls(model_dict, chat, prompt)
+    if preselected:
+        for tool_call in preselected:
+            yield tool_call
+        return
+
+    speculation = prefetch.start(prompt, speculative)
+    assembler = ToolCallAssembler()
+    started = time.perf_counter()
+    try:
+        async for chunk in abounded(model_dict["tool_model"].astream(chat), deadline, "tools", "tool_selection"):
+            for tool_call in assembler.feed(chunk):
+                instrumentation.observe("tool_dispatch_seconds", time.perf_counter() - started)
+                yield tool_call
+        if deadline is not None and deadline.expired("tools"):
+            return
+        for tool_call in assembler.finish():
+            instrumentation.observe("tool_dispatch_seconds", time.perf_counter() - started)
+            yield tool_call
+        learn_tool_calls(model_dict, chat, prompt, assembler.calls)
+    finally:
+        instrumentation.observe("tool_selection_seconds", time.perf_counter() - started, source="model")
+        if speculation:
+            speculation.resolve(assembler.calls)
+
+async def aanswer(model, chat: list[dict], chat_model: str, deadline=None) -> str:
+    started = time.perf_counter()
+    if deadline is None:
+        result = await model.ainvoke(chat)
+        instrumentation.observe_chat_message(chat_model, result, started)
+        return result.content
+
+    # Streamed so a partial answer can still be returned at the deadline
+    first_token_at, text, chunk = None, "", None
+    async for chunk in astream_chat(model, chat, deadline):
+        if first_token_at is None and chunk.content:
+            first_token_at = time.perf_counter()
+        text += chunk.content
+    instrumentation.observe_chat(chat_model, started, first_token_at, instrumentation.output_tokens(chunk, text))
+    return text
+
+async def aprompt_model(prompt: str, tool_model: str, chat_model: str, speculative: bool | None = None, thread_budget=None, memo: dict | None = None, deadline=None, lookup: bool = True, session=None) -> dict:
+    # A session turn depends on the conversation before it, it is neither looked up nor stored
+    cached = cached_response(prompt, tool_model, chat_model, deadline) if lookup and session is None else None
+    if cached is not None:
+        return cached
+
+    model_dict = initialise_models(tool_model, chat_model, bound_tools(prompt, session), model_options(thread_budget))
+
+    async with conversation(prompt, session) as chat:
+        tool_calls, tool_results = [], []
+
+        with tracking() as expiries:
+            selected, result = await aselect_tool_calls(model_dict, chat, prompt, speculative, deadline)
+            if selected:
+                tool_results = await aexecute_tools(selected, memo=memo, deadline=deadline)
+                chat.extend(tool_results)
+                tool_calls = [{"name": tool_call["name"], "args": tool_call["args"]} for tool_call in selected]
+
+        if tool_calls or result is None:
+            response = await aanswer(model_dict["chat_model"], chat, chat_model, deadline)
+        else:
+            response = result.content
+
+        out = {
+            "response": response,
+            "tool_calls": tool_calls,
+            "skipped": deadline.finish() if deadline else []
+        }
+        if session is not None:
+            session.commit(chat, response)
+            out["session_id"] = session.id
+        else:
+            store_response(prompt, tool_model, chat_model, out, any(is_error(r) for r in tool_results), expiries)
+    return out
+
+def astream_response(prompt: str, tool_model: str, chat_model: str, speculative: bool | None = None, thread_budget=None, timings: bool = False, deadline=None, flush_ms: float | None = None, session=None):
+    """SSE frames for a prompt, text chunks coalesced by the flush policy."""
+    events = astream_events(prompt, tool_model, chat_model, speculative, thread_budget, timings, deadline, session=session)
+    return sse.stream(events, policy=sse.FlushPolicy.from_ms(flush_ms))
+
+async def astream_events(prompt: str, tool_model: str, chat_model: str, speculative: bool | None = None, thread_budget=None, timings: bool = False, deadline=None, lookup: bool = True, session=None):
+    cached = lookup_response(prompt, tool_model, chat_model) if lookup and session is None else None
+    if cached is not None:
+        for event in replay_events(cached, timings, deadline):
+            yield event
+        return
+
+    with instrumentation.collect() as samples:
+        events = []
+        with tracking() as expiries:
+            async for event in _astream_response(prompt, tool_model, chat_model, speculative, thread_budget, deadline, session):
+                events.append(event)
+                yield event
+        if timings and samples is not None:
+            yield timings_event(samples)
+        done = done_event(deadline)
+        if session is not None:
+            done["session_id"] = session.id
+        else:
+            store_events(prompt, tool_model, chat_model, events, done, expiries)
+        yield done
+
+async def _astream_response(prompt: str, tool_model: str, chat_model: str, speculative: bool | None = None, thread_budget=None, deadline=None, session=None):
+    model_dict = initialise_models(tool_model, chat_model, bound_tools(prompt, session), model_options(thread_budget))
+
+    async with conversation(prompt, session) as chat:
+        # Tool selection phase, each call starts fetching as soon as the tool model has emitted it
+        selected, dispatched, tasks = [], [], {}
+        try:
+            async for tool_call in astream_tool_calls(model_dict, chat, prompt, speculative, deadline):
+                yield tool_event(tool_call)
+                tasks[asyncio.ensure_future(aexecute_tool(tool_call, deadline=deadline))] = len(selected)
+                selected.append(tool_call)
+                dispatched.append(time.monotonic())
+
+            if selected:
+                # Emit each result as it lands, keep chat order matching the model's call order
+                tool_results = [None] * len(tasks)
+                pending = set(tasks)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        index = tasks[task]
+                        tool_results[index] = task.result()
+                        yield tool_done_event(selected[index], tool_results[index], dispatched[index])
+                chat.extend(tool_results)
+        finally:
+            # Closed early when the client went away, calls still queued on the tool pool never start
+            for task in tasks:
+                task.cancel()
+
+        # Stream the final response
+        started, first_token_at, text, chunk = time.perf_counter(), None, "", None
+        async for chunk in astream_chat(model_dict["chat_model"], chat, deadline):
+            if first_token_at is None and chunk.content:
+                first_token_at = time.perf_counter()
+            text += chunk.content
+            yield {"type": "text", "content": chunk.content}
+        instrumentation.observe_chat(chat_model, started, first_token_at, instrumentation.output_tokens(chunk, text))
+        # A turn cut short by a disconnect never gets here and is not part of the conversation
+        if session is not None:
+            session.commit(chat, text)
 
-    yield f"data: {json.dumps({'type': 'done'})}\n\n"
-    
 if __name__ == "__main__":
     model_dict = initialise_models(
         "ollama-350m", "ollama-1b",
@@ -0,0 +1,92 @@
+import time
+import asyncio
+import importlib
+
+# Loaded in the background after the server starts accepting connections, in this order
+HEAVY_MODULES = [
+    "ChatApi.trading_agent",
+    "ChatApi.model_registry",
+    "ChatApi.batch",
+    "ChatApi.refresher",
+]
+
+STATES = ("pending", "importing", "warming_models", "ready", "failed")
+
+
+def import_modules(names: list[str] = HEAVY_MODULES) -> dict:
+    timings = {}
+    for name in names:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+class Warmup:
+    """Background start up: heavy imports first, then model preloading.
+
+    Requests that need the agent await imports() instead of importing on the event loop,
+    so they are held until the modules are in rather than failing or blocking the loop.
+    """
+
+    def __init__(self):
+        self.state = "pending"
+        self.error = None
+        self.created = time.perf_counter()
+        self.stages = {}
+        self.import_seconds = {}
+        self.models = {}
+        self._imports = None
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def imports(self):
+        """Wait for the heavy modules and return the trading agent module."""
+        if self._imports is None:
+            self._imports = asyncio.ensure_future(asyncio.to_thread(import_modules))
+        await asyncio.shield(self._imports)
+        return importlib.import_module("ChatApi.trading_agent")
+
+    async def run(self):
+        try:
+            self.state = "importing"
+            started = time.perf_counter()
+            agent = await self.imports()
+            self.import_seconds = self._imports.result()
+            self.stages["imports"] = round(time.perf_counter() - started, 3)
+
+            # Build and preload the configured model pairs so the first request is not a cold start
+            self.state = "warming_models"
+            started = time.perf_counter()
+            from ChatApi.model_registry import warm_models, parse_model_pairs, WARM_MODEL_PAIRS
+            from ChatApi.scheduler import scheduler
+            from ChatApi.tool_selector import warm_subsets
+            pairs = parse_model_pairs(WARM_MODEL_PAIRS)
+            options = agent.model_options(scheduler.thread_budget)
+            # Requests bind a subset of the tools, warm the ones they pick so their entries are hits
+            tool_sets = warm_subsets(agent.tool_list)
+            self.models = await asyncio.to_thread(warm_models, pairs, tool_sets, options)
+            self.stages["models"] = round(time.perf_counter() - started, 3)
+            self.state = "ready"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"Warm-up failed: {e}")
+        self.stages["total"] = round(time.perf_counter() - self.created, 3)
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    def status(self) -> dict:
+        return {
+            "ready": self.state == "ready",
+            "state": self.state,
+            "error": self.error,
+            "stages": dict(self.stages),
+            "imports": dict(self.import_seconds),
+            "models": self.models
+        }